@@ -52,6 +52,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 ]
 
 INSTALLED_APPS += THIRD_PARTY_APPS
@@ -59,6 +60,8 @@ INSTALLED_APPS += SECURITY_THIRD_PARTY_APPS
 INSTALLED_APPS += MY_APPS
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
+    'core.instrumentation.RequestInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -66,6 +69,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.profiling.RequestProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'app.urls'
@@ -94,11 +98,12 @@ WSGI_APPLICATION = 'app.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.backends.postgresql',
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
-        'PASSWORD': os.environ.get('DB_PASS')
+        'PASSWORD': os.environ.get('DB_PASS'),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
     },
     'TEST': {
         'ENGINE': 'django.db.backends.sqlite3',
@@ -107,6 +112,27 @@ DATABASES = {
 }
 
 
+# Database connection pool of core.backends.postgresql
+# Persistent connections are kept by each thread for CONN_MAX_AGE seconds.
+# With DB_POOL_ENABLED, connections are instead shared by the threads of a
+# process: set DB_CONN_MAX_AGE=0 so they return to the pool after every
+# request. At most MAX_SIZE are open per process, requests wait up to
+# TIMEOUT seconds for one. Connections are closed after MAX_LIFETIME
+# seconds or MAX_IDLE idle seconds. With HEALTH_CHECKS, reused connections
+# idle for at least HEALTH_CHECK_IDLE seconds are checked before their first
+# query of a request, others only after errors.
+
+DATABASE_POOL = {
+    'ENABLED': os.environ.get('DB_POOL_ENABLED', 'false').lower() == 'true',
+    'MAX_SIZE': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+    'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+    'MAX_LIFETIME': float(os.environ.get('DB_POOL_MAX_LIFETIME', 1800)),
+    'MAX_IDLE': float(os.environ.get('DB_POOL_MAX_IDLE', 300)),
+    'HEALTH_CHECKS': os.environ.get('DB_HEALTH_CHECKS', 'true').lower() == 'true',
+    'HEALTH_CHECK_IDLE': float(os.environ.get('DB_HEALTH_CHECK_IDLE', 30)),
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -148,5 +174,135 @@ MEDIA_URL = '/media/'
 
 STATIC_ROOT = '/vol/web/static'
 MEDIA_ROOT = '/vol/web/media'
+# Uploads are spooled to temporary files created 0600, the web server
+# serving MEDIA_ROOT must still be able to read the stored copies
+FILE_UPLOAD_PERMISSIONS = 0o644
 
 AUTH_USER_MODEL = 'core.User'
+
+
+# Recipe API pagination and bulk limits
+
+RECIPE_API_PAGE_SIZE = int(os.environ.get('RECIPE_API_PAGE_SIZE', 50))
+RECIPE_API_MAX_PAGE_SIZE = int(os.environ.get('RECIPE_API_MAX_PAGE_SIZE', 500))
+RECIPE_API_MAX_BULK_SIZE = int(os.environ.get('RECIPE_API_MAX_BULK_SIZE', 500))
+# Render recipe lists from values() rows instead of RecipeSerializer
+RECIPE_API_FAST_LIST = os.environ.get('RECIPE_API_FAST_LIST', 'true').lower() == 'true'
+# Recipes read per query and server-side cursor fetch by exports
+RECIPE_EXPORT_CHUNK_SIZE = int(os.environ.get('RECIPE_EXPORT_CHUNK_SIZE', 1000))
+
+
+# Tag and ingredient name autocompletion
+# The names of the users autocompleting at least CACHE_MIN_REQUESTS times
+# are kept in memory, for the CACHE_USERS most recent such users and
+# models. Libraries of more than CACHE_MAX_NAMES names are queried
+# instead. An indexed name takes about 4 KB with its prefix tree nodes and
+# trigrams, so every process may hold up to CACHE_USERS * CACHE_MAX_NAMES
+# names: about 200 MB with the defaults.
+
+AUTOCOMPLETE = {
+    'MAX_LIMIT': 50,
+    'FUZZY_THRESHOLD': 0.3,
+    'CACHE_USERS': int(os.environ.get('AUTOCOMPLETE_CACHE_USERS', 50)),
+    'CACHE_MIN_REQUESTS': int(os.environ.get('AUTOCOMPLETE_CACHE_MIN_REQUESTS', 3)),
+    'CACHE_MAX_NAMES': int(os.environ.get('AUTOCOMPLETE_CACHE_MAX_NAMES', 1000)),
+}
+
+
+# Token authentication cache
+# Set TOKEN_AUTH_CACHE_ALIAS to one of CACHES to share the cache between
+# worker processes, otherwise every process keeps its own LRU cache and
+# only sees its own invalidations: other processes keep accepting revoked
+# tokens and deactivated users for up to TTL seconds, so keep it short.
+
+TOKEN_AUTH_CACHE = {
+    'MAX_SIZE': int(os.environ.get('TOKEN_AUTH_CACHE_MAX_SIZE', 10000)),
+    'TTL': int(os.environ.get('TOKEN_AUTH_CACHE_TTL', 10)),
+    'CACHE_ALIAS': os.environ.get('TOKEN_AUTH_CACHE_ALIAS'),
+}
+
+
+# Per-user data versions behind the ETags of the recipe API
+# Set DATA_VERSION_CACHE_ALIAS to one of CACHES shared by every worker
+# process to answer conditional requests without a database query.
+
+DATA_VERSION_CACHE = {
+    'CACHE_ALIAS': os.environ.get('DATA_VERSION_CACHE_ALIAS'),
+    'TTL': int(os.environ.get('DATA_VERSION_CACHE_TTL', 300)),
+}
+
+
+# Per-request instrumentation
+# SAMPLE_RATE is the share of requests whose queries and timings are logged
+# by core.instrumentation, and with SERVER_TIMING sent to the client in a
+# Server-Timing header, which reveals them to every client.
+
+REQUEST_INSTRUMENTATION = {
+    'SAMPLE_RATE': float(os.environ.get('REQUEST_INSTRUMENTATION_SAMPLE_RATE', 1.0)),
+    'SERVER_TIMING': os.environ.get('REQUEST_INSTRUMENTATION_SERVER_TIMING', 'false').lower() == 'true',
+    'LOG': os.environ.get('REQUEST_INSTRUMENTATION_LOG', 'true').lower() == 'true',
+}
+
+
+# Metrics exposed in the Prometheus format on /internal/metrics
+# Set METRICS_MULTIPROCESS_DIR to a directory shared by the worker processes
+# of a server, and empty it when the server starts, to expose the metrics
+# of every process instead of only the one answering the scrape. Only
+# clients of ALLOWED_NETWORKS may scrape: behind a reverse proxy every
+# client has the address of the proxy, so only add the scraper networks.
+
+METRICS = {
+    'ENABLED': os.environ.get('METRICS_ENABLED', 'true').lower() == 'true',
+    'MULTIPROCESS_DIR': os.environ.get('METRICS_MULTIPROCESS_DIR'),
+    'FLUSH_INTERVAL': float(os.environ.get('METRICS_FLUSH_INTERVAL', 1.0)),
+    'ALLOWED_NETWORKS': os.environ.get(
+        'METRICS_ALLOWED_NETWORKS',
+        '127.0.0.0/8,::1/128'
+    ).split(','),
+}
+
+
+# Slow query log
+# Queries slower than THRESHOLD_MS are logged by core.slow_queries with the
+# project code running them, 0 disables the log. With EXPLAIN, the plans of
+# slow SELECT queries are captured too. At most MAX_PER_MINUTE queries are
+# logged and EXPLAIN_PER_MINUTE explained by every process.
+
+SLOW_QUERY_LOG = {
+    'THRESHOLD_MS': float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 500)),
+    'EXPLAIN': os.environ.get('SLOW_QUERY_EXPLAIN', 'false').lower() == 'true',
+    'MAX_PER_MINUTE': int(os.environ.get('SLOW_QUERY_MAX_PER_MINUTE', 60)),
+    'EXPLAIN_PER_MINUTE': int(os.environ.get('SLOW_QUERY_EXPLAIN_PER_MINUTE', 10)),
+}
+
+
+# On-demand profiling of staff requests
+# Staff requests sending an X-Profile header or a profile query parameter,
+# set to cprofile, sample or any other value for PROFILER, are profiled by
+# core.profiling into DIRECTORY. The middleware is removed unless ENABLED.
+
+REQUEST_PROFILING = {
+    'ENABLED': os.environ.get('REQUEST_PROFILING_ENABLED', 'false').lower() == 'true',
+    'DIRECTORY': os.environ.get('REQUEST_PROFILING_DIR', '/vol/web/profiles'),
+    'PROFILER': os.environ.get('REQUEST_PROFILING_PROFILER', 'cprofile'),
+    'SAMPLE_INTERVAL': float(os.environ.get('REQUEST_PROFILING_SAMPLE_INTERVAL', 0.005)),
+    'HEADER': 'X-Profile',
+    'QUERY_PARAM': 'profile',
+}
+
+
+# Recipe images
+# Uploads are spooled to disk and validated from their header only.
+# Renditions are generated by a pool of RECIPE_IMAGE_WORKERS threads per
+# process after each upload, formats Pillow was built without are skipped.
+
+RECIPE_IMAGE_WORKERS = int(os.environ.get('RECIPE_IMAGE_WORKERS', 2))
+RECIPE_IMAGE_QUEUE_SIZE = int(os.environ.get('RECIPE_IMAGE_QUEUE_SIZE', 100))
+RECIPE_IMAGE_MAX_UPLOAD_SIZE = int(os.environ.get('RECIPE_IMAGE_MAX_UPLOAD_SIZE', 25 * 1024 * 1024))
+RECIPE_IMAGE_MAX_PIXELS = int(os.environ.get('RECIPE_IMAGE_MAX_PIXELS', 50000000))
+RECIPE_IMAGE_FORMATS = ['JPEG', 'PNG', 'WEBP']
+RECIPE_IMAGE_RENDITIONS = {
+    'thumbnail': {'size': (160, 160), 'format': 'JPEG', 'quality': 80},
+    'medium': {'size': (640, 640), 'format': 'JPEG', 'quality': 85},
+    'webp': {'size': (1280, 1280), 'format': 'WEBP', 'quality': 80},
+}
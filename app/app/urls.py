@@ -18,6 +18,8 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from core.views import metrics
+
 my_apps_urlpatterns = [
     path('api/users/', include('users.urls')),
     path('api/recipe/', include('recipe.urls')),
@@ -25,6 +27,7 @@ my_apps_urlpatterns = [
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('internal/metrics', metrics, name='metrics'),
 ]
 urlpatterns += my_apps_urlpatterns
 
@@ -0,0 +1,8 @@
+"""
+Benchmarks for the recipe API.
+
+Every module in this package exposing a `run()` function is a benchmark
+and can be executed against a throwaway database with:
+
+    python manage.py benchmark <module name> [options]
+"""
@@ -0,0 +1,103 @@
+"""
+Latency of autocompleting ingredient names, from the database and from
+memory
+"""
+import itertools
+import random
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import Ingredient
+from recipe.autocomplete import get_autocomplete_cache
+
+from .utils import measure
+
+
+WORDS = [
+    'salt', 'pepper', 'sugar', 'flour', 'butter', 'olive', 'oil', 'garlic',
+    'onion', 'tomato', 'basil', 'thyme', 'rosemary', 'chicken', 'beef', 'pork',
+    'salmon', 'rice', 'pasta', 'lemon', 'lime', 'ginger', 'honey', 'vinegar',
+    'mustard', 'cheese', 'cream', 'milk', 'egg', 'potato', 'carrot', 'celery',
+    'spinach',
+]
+
+
+def add_arguments(parser):
+    parser.add_argument(
+            '--names', default='1000,20000',
+            help='Comma separated numbers of ingredient names of the '
+                 'measured users, up to 30000'
+    )
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument(
+            '--p99-target-ms', type=float, default=20.0,
+            help='p99 latency every scenario is checked against'
+    )
+
+
+def create_names(user, count, rng):
+    """Create count distinct ingredient names of two to three words"""
+    names = set()
+    while len(names) < count:
+        names.add(' '.join(rng.sample(WORDS, rng.randint(2, 3))).capitalize())
+    Ingredient.objects.bulk_create(
+            [Ingredient(user=user, name=name) for name in names]
+    )
+
+    return sorted(names)
+
+
+def typed_queries(names, rng, fuzzy):
+    """
+    Yield endless keystroke queries: growing prefixes, or misspelled names
+    """
+    while True:
+        name = rng.choice(names)
+        if fuzzy:
+            position = rng.randrange(len(name))
+            yield name[:position] + name[position + 1:]
+        else:
+            for length in range(1, min(len(name), 8) + 1):
+                yield name[:length]
+
+
+def run(stdout, names, repeat, p99_target_ms, **options):
+    url = reverse('recipe:ingredient-autocomplete')
+    client = APIClient()
+    cache = get_autocomplete_cache()
+    rng = random.Random(0)
+    results = {}
+
+    for count in [int(count) for count in names.split(',')]:
+        stdout.write(f'Creating {count} ingredient names...')
+        user = get_user_model().objects.create_user(
+                f'autocomplete-{count}@example.com',
+                'password'
+        )
+        client.force_authenticate(user)
+        user_names = create_names(user, count, rng)
+
+        results[count] = {}
+        for fuzzy, hot in itertools.product((False, True), (False, True)):
+            queries = typed_queries(user_names, rng, fuzzy)
+
+            def request():
+                if not hot:
+                    cache.clear()
+                response = client.get(
+                        url,
+                        {'q': next(queries), 'fuzzy': fuzzy}
+                )
+                assert response.status_code == 200, response.data
+
+            scenario = '_'.join((
+                'fuzzy' if fuzzy else 'prefix',
+                'hot' if hot else 'cold',
+            ))
+            result = measure(request, repeat=repeat, warmup=5)
+            result['within_target'] = result['p99_ms'] <= p99_target_ms
+            results[count][scenario] = result
+
+    return results
@@ -0,0 +1,87 @@
+"""
+Latency of recipe list requests opening a new database connection each,
+reusing persistent connections and checking them out of the pool of
+core.backends.postgresql. Connections to in-memory sqlite databases are
+never closed, so only PostgreSQL runs tell the scenarios apart.
+"""
+import time
+
+from django.db import close_old_connections, connection
+from django.db.backends.signals import connection_created
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from .data import create_user_library
+from .utils import summarize
+
+
+POOL = {
+    'ENABLED': False,
+    'MAX_SIZE': 10,
+    'TIMEOUT': 10,
+    'MAX_LIFETIME': 1800,
+    'MAX_IDLE': 300,
+    'HEALTH_CHECKS': False,
+    # Check every reused connection, the worst case
+    'HEALTH_CHECK_IDLE': 0,
+}
+
+# CONN_MAX_AGE and DATABASE_POOL of every scenario
+SCENARIOS = {
+    'new_connection': (0, POOL),
+    'persistent': (600, POOL),
+    'persistent_health_checked': (600, dict(POOL, HEALTH_CHECKS=True)),
+    'pooled': (0, dict(POOL, ENABLED=True)),
+    'pooled_health_checked': (0, dict(POOL, ENABLED=True, HEALTH_CHECKS=True)),
+}
+
+
+def add_arguments(parser):
+    parser.add_argument('--recipes', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=200)
+
+
+def run(stdout, recipes, repeat, **options):
+    url = reverse('recipe:recipe-list')
+    client = APIClient()
+    client.force_authenticate(
+            create_user_library('connections@example.com', recipes=recipes)
+    )
+    opened = []
+
+    def count_connection(sender, **kwargs):
+        opened.append(sender)
+
+    def request():
+        # The request_started and request_finished handlers of Django,
+        # which the test client disconnects
+        close_old_connections()
+        response = client.get(url)
+        close_old_connections()
+        assert response.status_code == 200
+
+    results = {'vendor': connection.vendor}
+    max_age = connection.settings_dict['CONN_MAX_AGE']
+    connection_created.connect(count_connection)
+    try:
+        for name, (conn_max_age, pool) in SCENARIOS.items():
+            connection.close()
+            connection.settings_dict['CONN_MAX_AGE'] = conn_max_age
+            with override_settings(DATABASE_POOL=pool):
+                for _ in range(10):
+                    request()
+                del opened[:]
+                timings = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    request()
+                    timings.append((time.perf_counter() - start) * 1000)
+                connection.close()
+            results[name] = summarize(timings)
+            results[name]['connections_opened'] = len(opened)
+    finally:
+        connection_created.disconnect(count_connection)
+        connection.settings_dict['CONN_MAX_AGE'] = max_age
+
+    return results
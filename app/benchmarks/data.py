@@ -0,0 +1,200 @@
+import itertools
+import random
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+
+from core.models import DataVersion, Tag, Ingredient, Recipe
+
+
+DISHES = [
+    'soup', 'salad', 'stew', 'curry', 'pie', 'cake', 'risotto', 'pasta',
+    'tart', 'bread', 'omelette', 'gratin', 'skewers', 'burger', 'noodles',
+    'pancakes',
+]
+FOODS = [
+    'tomato', 'chicken', 'salmon', 'lentil', 'mushroom', 'spinach', 'lemon',
+    'chocolate', 'apple', 'beef', 'pumpkin', 'garlic', 'ginger', 'cheese',
+    'rice', 'potato', 'carrot', 'basil', 'coconut', 'honey', 'fish', 'pork',
+    'pepper',
+]
+
+
+def zipf_cum_weights(count, exponent):
+    """
+    Return the cumulative Zipf weights of count ranks, uniform for
+    exponent 0
+    """
+    return list(itertools.accumulate(
+        1 / rank ** exponent for rank in range(1, count + 1)
+    ))
+
+
+def weighted_sample(population, cum_weights, k, rng):
+    """Return up to k distinct items drawn with the given cumulative weights"""
+    k = min(k, len(population))
+    chosen = {}
+    while len(chosen) < k:
+        draws = rng.choices(
+                population,
+                cum_weights=cum_weights,
+                k=k - len(chosen)
+        )
+        for item in draws:
+            chosen.setdefault(item)
+
+    return list(chosen)
+
+
+def fan_out(mean, rng, skew):
+    """Return a number of related objects, always mean without skew"""
+    if not skew:
+        return mean
+
+    # Most recipes have few relations, a long tail has many
+    return round(rng.expovariate(1 / mean)) if mean else 0
+
+
+def create_library(user, recipes, tags, ingredients, tags_per_recipe,
+                   ingredients_per_recipe, rng, skew=0.0, batch_size=None):
+    """
+    Create the recipes, tags and ingredients of a user. With a skew, tag
+    and ingredient popularity follows Zipf's law of that exponent and the
+    number of relations per recipe an exponential distribution.
+    """
+    Tag.objects.bulk_create(
+            [Tag(user=user, name=f'Tag {i}') for i in range(tags)],
+            batch_size=batch_size
+    )
+    Ingredient.objects.bulk_create(
+            [
+                Ingredient(user=user, name=f'Ingredient {i}')
+                for i in range(ingredients)
+            ],
+            batch_size=batch_size
+    )
+    Recipe.objects.bulk_create(
+            [
+                Recipe(
+                    user=user,
+                    title=(
+                        f'{rng.choice(FOODS).capitalize()} '
+                        f'{rng.choice(DISHES)} {i}'
+                    ),
+                    time_minutes=rng.randint(5, 240),
+                    price=rng.randint(100, 99999) / 100,
+                )
+                for i in range(recipes)
+            ],
+            batch_size=batch_size
+    )
+
+    tag_ids = list(
+            Tag.objects.filter(user=user).order_by('id')
+            .values_list('id', flat=True)
+    )
+    ingredient_ids = list(
+            Ingredient.objects.filter(user=user).order_by('id')
+            .values_list('id', flat=True)
+    )
+    tag_weights = zipf_cum_weights(len(tag_ids), skew)
+    ingredient_weights = zipf_cum_weights(len(ingredient_ids), skew)
+    recipe_ids = (
+            Recipe.objects.filter(user=user).order_by('id')
+            .values_list('id', flat=True)
+    )
+
+    recipe_tags, recipe_ingredients = [], []
+    for recipe_id in recipe_ids.iterator():
+        recipe_tags.extend(
+            Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+            for tag_id in weighted_sample(
+                tag_ids, tag_weights, fan_out(tags_per_recipe, rng, skew), rng
+            )
+        )
+        recipe_ingredients.extend(
+            Recipe.ingredients.through(
+                recipe_id=recipe_id,
+                ingredient_id=ingredient_id
+            )
+            for ingredient_id in weighted_sample(
+                ingredient_ids,
+                ingredient_weights,
+                fan_out(ingredients_per_recipe, rng, skew),
+                rng
+            )
+        )
+    Recipe.tags.through.objects.bulk_create(
+            recipe_tags,
+            batch_size=batch_size
+    )
+    Recipe.ingredients.through.objects.bulk_create(
+            recipe_ingredients,
+            batch_size=batch_size
+    )
+
+
+def create_user_library(email, recipes=1000, tags=50, ingredients=200,
+                        tags_per_recipe=3, ingredients_per_recipe=8,
+                        seed=0, batch_size=None):
+    """Create a user owning a library of recipes with random relations"""
+    rng = random.Random(seed)
+    user = get_user_model().objects.create_user(
+            email=email,
+            password='password'
+    )
+    create_library(
+            user, recipes, tags, ingredients,
+            tags_per_recipe, ingredients_per_recipe,
+            rng, batch_size=batch_size
+    )
+
+    return user
+
+
+def seed_users(users=10, recipes=10000, tags=100, ingredients=1000,
+               tags_per_recipe=3, ingredients_per_recipe=8, skew=1.0, seed=0,
+               email='seed-{}@example.com', password='password',
+               batch_size=None):
+    """
+    Create users sharing a total number of recipes, deterministically for a
+    seed. With a skew, library sizes follow Zipf's law of that exponent so
+    that a few users own most recipes, like in production.
+    """
+    rng = random.Random(seed)
+    cum_weights = zipf_cum_weights(users, skew)
+    library_sizes = [
+        round(recipes * (weight - previous) / cum_weights[-1])
+        for previous, weight in zip([0] + cum_weights, cum_weights)
+    ]
+    library_sizes[0] += recipes - sum(library_sizes)
+
+    # Hashing one password for every user keeps seeding fast
+    password_hash = make_password(password)
+    get_user_model().objects.bulk_create([
+        get_user_model()(
+            email=email.format(i),
+            name=f'Seed user {i}',
+            password=password_hash
+        )
+        for i in range(users)
+    ], batch_size=batch_size)
+    seeded = list(get_user_model().objects.filter(
+            email__in=[email.format(i) for i in range(users)]
+    ).order_by('id'))
+    # bulk_create skips the signal creating the data versions of users
+    DataVersion.objects.bulk_create(
+            [DataVersion(user=user) for user in seeded]
+    )
+
+    for user, size in zip(seeded, library_sizes):
+        # Small libraries use fewer distinct tags and ingredients
+        create_library(
+                user, size,
+                min(tags, max(1, size // 10)),
+                min(ingredients, max(1, size // 2)),
+                tags_per_recipe, ingredients_per_recipe,
+                rng, skew=skew, batch_size=batch_size
+        )
+
+    return list(zip(seeded, library_sizes))
@@ -0,0 +1,333 @@
+"""
+Latency percentiles and query counts of every endpoint of the recipe and
+users APIs against seeded data. Save a baseline with `--output` and pass
+it back with `--baseline` to list the regressions of another commit.
+"""
+import io
+import itertools
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+
+from PIL import Image
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+
+from .data import seed_users
+from .utils import measure
+
+
+NAMESPACES = ('recipe', 'users')
+WARMUP = 2
+
+
+def add_arguments(parser):
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument(
+            '--recipes', type=int, default=20000,
+            help='Recipes of all users'
+    )
+    parser.add_argument('--skew', type=float, default=1.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument(
+            '--baseline',
+            help='Results of a previous run to compare with'
+    )
+    parser.add_argument(
+            '--tolerance', type=float, default=0.2,
+            help='Relative p50 slowdown reported as a regression'
+    )
+
+
+def url_names(namespaces=NAMESPACES):
+    """Return the `namespace:name` of every URL pattern of some namespaces"""
+    names = set()
+    for namespace in namespaces:
+        resolver = get_resolver().namespace_dict[namespace][1]
+        patterns = list(resolver.url_patterns)
+        while patterns:
+            pattern = patterns.pop()
+            if isinstance(pattern, URLResolver):
+                patterns.extend(pattern.url_patterns)
+            elif isinstance(pattern, URLPattern) and pattern.name:
+                names.add(f'{namespace}:{pattern.name}')
+
+    return names
+
+
+def image_file():
+    """Return a small JPEG upload"""
+    content = io.BytesIO()
+    Image.new('RGB', (64, 48), 'orange').save(content, format='JPEG')
+
+    return SimpleUploadedFile(
+            'photo.jpg',
+            content.getvalue(),
+            content_type='image/jpeg'
+    )
+
+
+def scenarios(user, recipe, tag, ingredient, deleted_ids, counter):
+    """
+    Return `{name: (url name, method, url args, request factory)}` for
+    every endpoint, factories return the data and options of a request.
+    Callable url args are called per request, deleted recipes are taken
+    from deleted_ids.
+    """
+    recipe_data = {
+        'title': 'Benchmark pie',
+        'time_minutes': 30,
+        'price': '7.50',
+        'tags': [tag.id],
+        'ingredients': [ingredient.id],
+    }
+
+    def bulk_names(prefix):
+        return [f'{prefix} {next(counter)}' for i in range(20)]
+
+    return {
+        'api_root': ('recipe:api-root', 'get', [], lambda: {}),
+        'tags_list': ('recipe:tag-list', 'get', [], lambda: {}),
+        'tags_list_counts': (
+            'recipe:tag-list', 'get', [],
+            lambda: {'data': {'with_counts': 1}}
+        ),
+        'tags_list_assigned': (
+            'recipe:tag-list', 'get', [],
+            lambda: {'data': {'assigned_only': 1}}
+        ),
+        'tags_create': (
+            'recipe:tag-list', 'post', [],
+            lambda: {'data': {'name': f'New tag {next(counter)}'}}
+        ),
+        'tags_bulk': (
+            'recipe:tag-bulk', 'post', [],
+            lambda: {
+                'data': {'names': bulk_names('Bulk tag')},
+                'format': 'json',
+            }
+        ),
+        'tags_autocomplete': (
+            'recipe:tag-autocomplete', 'get', [],
+            lambda: {'data': {'q': 'tag 1'}}
+        ),
+        'ingredients_list': ('recipe:ingredient-list', 'get', [], lambda: {}),
+        'ingredients_list_counts': (
+            'recipe:ingredient-list', 'get', [],
+            lambda: {'data': {'with_counts': 1}}
+        ),
+        'ingredients_create': (
+            'recipe:ingredient-list', 'post', [],
+            lambda: {'data': {'name': f'New ingredient {next(counter)}'}}
+        ),
+        'ingredients_bulk': (
+            'recipe:ingredient-bulk', 'post', [],
+            lambda: {
+                'data': {'names': bulk_names('Bulk ingredient')},
+                'format': 'json',
+            }
+        ),
+        'ingredients_autocomplete': (
+            'recipe:ingredient-autocomplete', 'get', [],
+            lambda: {'data': {'q': 'ingredent 1', 'fuzzy': 'true'}}
+        ),
+        'recipes_list': ('recipe:recipe-list', 'get', [], lambda: {}),
+        'recipes_list_max_page': (
+            'recipe:recipe-list', 'get', [],
+            lambda: {'data': {'page_size': 500}}
+        ),
+        'recipes_list_filtered': (
+            'recipe:recipe-list', 'get', [],
+            lambda: {'data': {'tags': tag.id, 'ingredients': ingredient.id}}
+        ),
+        'recipes_list_search': (
+            'recipe:recipe-list', 'get', [],
+            lambda: {'data': {'search': 'chicken soup'}}
+        ),
+        'recipes_list_expanded': (
+            'recipe:recipe-list', 'get', [],
+            lambda: {'data': {'expand': 'tags,ingredients'}}
+        ),
+        'recipes_list_sparse': (
+            'recipe:recipe-list', 'get', [],
+            lambda: {'data': {'fields': 'id,title'}}
+        ),
+        'recipes_create': (
+            'recipe:recipe-list', 'post', [],
+            lambda: {'data': recipe_data, 'format': 'json'}
+        ),
+        'recipes_bulk': (
+            'recipe:recipe-bulk', 'post', [],
+            lambda: {'data': [recipe_data] * 20, 'format': 'json'}
+        ),
+        'recipes_export': ('recipe:recipe-export', 'get', [], lambda: {}),
+        'recipe_detail': (
+            'recipe:recipe-detail', 'get', [recipe.id], lambda: {}
+        ),
+        'recipe_update': (
+            'recipe:recipe-detail', 'patch', [recipe.id],
+            lambda: {
+                'data': {'title': f'Updated {next(counter)}'},
+                'format': 'json',
+            }
+        ),
+        'recipe_delete': (
+            'recipe:recipe-detail', 'delete', [deleted_ids.pop], lambda: {}
+        ),
+        'recipe_upload_image': (
+            'recipe:recipe-upload-image', 'post', [recipe.id],
+            lambda: {'data': {'image': image_file()}, 'format': 'multipart'}
+        ),
+        'users_create': (
+            'users:create', 'post', [],
+            lambda: {'data': {
+                'email': f'new-{next(counter)}@example.com',
+                'password': 'BenchmarkPassword',
+                'name': 'New user',
+            }}
+        ),
+        'users_token': (
+            'users:token', 'post', [],
+            lambda: {'data': {'email': user.email, 'password': 'password'}}
+        ),
+        'users_me': ('users:me', 'get', [], lambda: {}),
+        'users_me_update': (
+            'users:me', 'patch', [],
+            lambda: {'data': {'name': f'Seed user {next(counter)}'}}
+        ),
+    }
+
+
+def request_function(client, url_name, method, args, factory):
+    """Return a function sending one request of a scenario"""
+    def request():
+        url = reverse(
+                url_name,
+                args=[arg() if callable(arg) else arg for arg in args]
+        )
+        response = getattr(client, method)(url, **factory())
+        assert response.status_code < 400, (url_name, response.status_code)
+        if response.streaming:
+            for line in response.streaming_content:
+                pass
+
+    return request
+
+
+def git_commit():
+    """Return the checked out commit, or None outside of a git checkout"""
+    try:
+        return subprocess.check_output(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+                stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline, endpoints, tolerance):
+    """
+    Return the endpoints slower or issuing more queries than in a baseline
+    """
+    regressions = {}
+    for name, result in endpoints.items():
+        previous = baseline.get('endpoints', {}).get(name)
+        if previous is None:
+            continue
+        slowdown = 0
+        if previous['p50_ms']:
+            slowdown = result['p50_ms'] / previous['p50_ms'] - 1
+        if slowdown > tolerance or result['queries'] > previous['queries']:
+            regressions[name] = {
+                'p50_ms': [previous['p50_ms'], result['p50_ms']],
+                'slowdown': round(slowdown, 3),
+                'queries': [previous['queries'], result['queries']],
+            }
+
+    return regressions
+
+
+def run(stdout, users, recipes, skew, seed, repeat, baseline, tolerance,
+        **options):
+    stdout.write(f'Seeding {users} users and {recipes} recipes...')
+    libraries = seed_users(
+            users=users,
+            recipes=recipes,
+            skew=skew,
+            seed=seed
+    )
+    # The largest library, where slow endpoints show first
+    user, library_size = max(libraries, key=lambda library: library[1])
+    client = APIClient()
+    token = Token.objects.create(user=user)
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    recipe = Recipe.objects.filter(user=user).order_by('id').first()
+    # The most popular tag and ingredient
+    tag = Tag.objects.filter(user=user).order_by('id').first()
+    ingredient = Ingredient.objects.filter(user=user).order_by('id').first()
+    media_root = tempfile.mkdtemp()
+
+    # Recipes deleted by the delete requests, created before measuring them
+    deleted_ids = [
+        Recipe.objects.create(
+            user=user,
+            title='Deleted',
+            time_minutes=1,
+            price=1
+        ).id
+        for i in range(repeat + WARMUP)
+    ]
+    endpoints_scenarios = scenarios(
+            user, recipe, tag, ingredient, deleted_ids, itertools.count()
+    )
+
+    endpoints = {}
+    try:
+        with override_settings(
+                MEDIA_ROOT=media_root,
+                RECIPE_IMAGE_RENDITIONS={}
+        ):
+            for name, scenario in endpoints_scenarios.items():
+                stdout.write(f'Measuring {name}...')
+                request = request_function(client, *scenario)
+                endpoints[name] = measure(
+                        request,
+                        repeat=repeat,
+                        warmup=WARMUP
+                )
+    finally:
+        shutil.rmtree(media_root)
+
+    measured = {scenario[0] for scenario in endpoints_scenarios.values()}
+    results = {
+        'meta': {
+            'commit': git_commit(),
+            'users': users,
+            'recipes': recipes,
+            'skew': skew,
+            'seed': seed,
+            'library_size': library_size,
+            'repeat': repeat,
+        },
+        'endpoints': endpoints,
+        'unmeasured': sorted(url_names() - measured),
+    }
+    if baseline:
+        with open(baseline) as baseline_file:
+            results['regressions'] = compare(
+                    json.load(baseline_file),
+                    endpoints,
+                    tolerance
+            )
+
+    return results
@@ -0,0 +1,96 @@
+"""
+Latency and peak memory of uploading recipe images of growing sizes. The
+test client builds the request body in memory, so the peak includes the
+file size once; `decode_rss_mb` is what decoding the image would cost.
+"""
+import os
+import tempfile
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+
+from .utils import measure, measure_peak_rss
+
+
+def add_arguments(parser):
+    parser.add_argument(
+            '--megapixels', default='1,12,48',
+            help='Comma separated sizes of the uploaded images in megapixels'
+    )
+    parser.add_argument('--repeat', type=int, default=5)
+
+
+def sample_image_file(megapixels):
+    """Return a temporary JPEG file of about the given number of megapixels"""
+    width = int((megapixels * 1000000 * 4 / 3) ** 0.5)
+    height = width * 3 // 4
+    # Noise does not compress, so that file sizes are close to phone photos
+    tile = Image.frombytes('RGB', (256, 256), os.urandom(256 * 256 * 3))
+    image = Image.new('RGB', (width, height))
+    for left in range(0, width, 256):
+        for top in range(0, height, 256):
+            image.paste(tile, (left, top))
+
+    image_file = tempfile.NamedTemporaryFile(suffix='.jpg')
+    image.save(image_file, format='JPEG', quality=90)
+    image_file.seek(0)
+
+    return image_file
+
+
+def decode(body):
+    """Fully decode an image, as validating it used to"""
+    with tempfile.TemporaryFile() as image_file:
+        image_file.write(body)
+        image_file.seek(0)
+        with Image.open(image_file) as image:
+            image.load()
+
+
+@override_settings(RECIPE_IMAGE_RENDITIONS={})
+def run(stdout, megapixels, repeat, **options):
+    user = get_user_model().objects.create_user(
+            'uploads@example.com',
+            'BenchmarkPassword'
+    )
+    recipe = Recipe.objects.create(
+            user=user,
+            title='Upload',
+            time_minutes=5,
+            price=5
+    )
+    url = reverse('recipe:recipe-upload-image', args=[recipe.id])
+    client = APIClient()
+    client.force_authenticate(user)
+    results = {}
+
+    for size in [float(size) for size in megapixels.split(',')]:
+        stdout.write(f'Uploading {size} megapixel images...')
+        with sample_image_file(size) as image_file:
+            body = image_file.read()
+
+        def upload():
+            response = client.post(
+                    url,
+                    {'image': SimpleUploadedFile('photo.jpg', body)},
+                    format='multipart'
+            )
+            assert response.status_code == 200, response.data
+            Recipe.objects.get(pk=recipe.pk).image.delete()
+
+        result = measure(upload, repeat=repeat, warmup=1)
+        result['file_mb'] = round(len(body) / 1024 / 1024, 3)
+        result['peak_rss_mb'] = max(
+                measure_peak_rss(upload) for _ in range(repeat)
+        )
+        result['decode_rss_mb'] = measure_peak_rss(lambda: decode(body))
+        results[size] = result
+
+    return results
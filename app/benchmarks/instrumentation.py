@@ -0,0 +1,47 @@
+"""Overhead of the request instrumentation middleware on recipe lists"""
+from django.conf import settings
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from .data import create_user_library
+from .utils import measure
+
+
+def add_arguments(parser):
+    parser.add_argument('--recipes', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=200)
+
+
+def run(stdout, recipes, repeat, **options):
+    url = reverse('recipe:recipe-list')
+    client = APIClient()
+    client.force_authenticate(
+            create_user_library('instrumentation@example.com', recipes=recipes)
+    )
+
+    def request():
+        response = client.get(url)
+        assert response.status_code == 200
+
+    scenarios = {
+        'disabled': {
+            'SAMPLE_RATE': 0.0, 'SERVER_TIMING': False, 'LOG': False,
+        },
+        'server_timing': {
+            'SAMPLE_RATE': 1.0, 'SERVER_TIMING': True, 'LOG': False,
+        },
+        'server_timing_and_log': {
+            'SAMPLE_RATE': 1.0, 'SERVER_TIMING': True, 'LOG': True,
+        },
+    }
+    results = {}
+    for name, options in scenarios.items():
+        # Without core.metrics, which also measures every request
+        with override_settings(
+                REQUEST_INSTRUMENTATION=options,
+                METRICS=dict(settings.METRICS, ENABLED=False)
+        ):
+            results[name] = measure(request, repeat=repeat, warmup=10)
+
+    return results
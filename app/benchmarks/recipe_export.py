@@ -0,0 +1,62 @@
+"""
+Time to first byte, total time and peak memory of exporting recipe
+libraries, compared with rendering them as one unpaginated list
+"""
+import time
+
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from .data import create_user_library
+from .utils import measure, measure_peak_rss, summarize
+
+
+def add_arguments(parser):
+    parser.add_argument(
+            '--sizes', default='1000,10000,50000',
+            help='Comma separated numbers of recipes in the measured libraries'
+    )
+    parser.add_argument('--repeat', type=int, default=5)
+
+
+def run(stdout, sizes, repeat, **options):
+    export_url = reverse('recipe:recipe-export')
+    list_url = reverse('recipe:recipe-list')
+    client = APIClient()
+    results = {}
+
+    for size in [int(size) for size in sizes.split(',')]:
+        stdout.write(f'Creating a library of {size} recipes...')
+        user = create_user_library(f'export-{size}@example.com', recipes=size)
+        client.force_authenticate(user)
+
+        results[size] = {}
+        for export_type in ('ndjson', 'csv'):
+            def export():
+                response = client.get(export_url, {'type': export_type})
+                assert response.status_code == 200
+                for line in response.streaming_content:
+                    pass
+
+            first_bytes_ms = []
+            for i in range(repeat):
+                start = time.perf_counter()
+                response = client.get(export_url, {'type': export_type})
+                next(iter(response.streaming_content))
+                first_bytes_ms.append((time.perf_counter() - start) * 1000)
+                response.close()
+
+            result = measure(export, repeat=repeat, warmup=1)
+            result['first_byte'] = summarize(first_bytes_ms)
+            result['peak_rss_mb'] = measure_peak_rss(export)
+            results[size][f'export_{export_type}'] = result
+
+        def unpaginated_list():
+            response = client.get(list_url, {'paginate': 'false'})
+            assert response.status_code == 200
+
+        result = measure(unpaginated_list, repeat=repeat, warmup=1)
+        result['peak_rss_mb'] = measure_peak_rss(unpaginated_list)
+        results[size]['unpaginated_list'] = result
+
+    return results
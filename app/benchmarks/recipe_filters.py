@@ -0,0 +1,46 @@
+"""Latency of filtering recipes by tags and ingredients as libraries grow"""
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import Tag, Ingredient
+
+from .data import create_user_library
+from .utils import measure
+
+
+def add_arguments(parser):
+    parser.add_argument(
+            '--sizes', default='1000,10000,100000',
+            help='Comma separated numbers of recipes in the measured libraries'
+    )
+    parser.add_argument('--repeat', type=int, default=20)
+
+
+def run(stdout, sizes, repeat, **options):
+    url = reverse('recipe:recipe-list')
+    client = APIClient()
+    results = {}
+
+    for size in [int(size) for size in sizes.split(',')]:
+        stdout.write(f'Creating a library of {size} recipes...')
+        user = create_user_library(f'filters-{size}@example.com', recipes=size)
+        client.force_authenticate(user)
+        tag_ids = Tag.objects.filter(user=user).values_list('id', flat=True)
+        tags = ','.join(str(pk) for pk in tag_ids[:2])
+        ingredient = str(
+                Ingredient.objects.filter(user=user)
+                .values_list('id', flat=True)[0]
+        )
+
+        scenarios = {
+            'unfiltered': {},
+            'tags_any': {'tags': tags},
+            'tags_all': {'tags': tags, 'match': 'all'},
+            'tags_and_ingredients': {'tags': tags, 'ingredients': ingredient},
+        }
+        results[size] = {
+            name: measure(lambda: client.get(url, params), repeat=repeat)
+            for name, params in scenarios.items()
+        }
+
+    return results
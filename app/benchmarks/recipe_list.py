@@ -0,0 +1,48 @@
+"""
+Latency and peak memory of listing recipes through RecipeSerializer and
+through the values() fast path enabled by `RECIPE_API_FAST_LIST`
+"""
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from .data import create_user_library
+from .utils import measure, measure_peak_rss
+
+
+def add_arguments(parser):
+    parser.add_argument(
+            '--sizes', default='1000,10000',
+            help='Comma separated numbers of recipes in the measured libraries'
+    )
+    parser.add_argument('--repeat', type=int, default=20)
+
+
+def run(stdout, sizes, repeat, **options):
+    url = reverse('recipe:recipe-list')
+    client = APIClient()
+    scenarios = {
+        'default_page': {},
+        'max_page': {'page_size': 500},
+        'unpaginated': {'paginate': 'false'},
+    }
+    results = {}
+
+    for size in [int(size) for size in sizes.split(',')]:
+        stdout.write(f'Creating a library of {size} recipes...')
+        user = create_user_library(f'list-{size}@example.com', recipes=size)
+        client.force_authenticate(user)
+
+        results[size] = {}
+        for name, params in scenarios.items():
+            def request():
+                response = client.get(url, params)
+                assert response.status_code == 200, response.data
+
+            for path, fast_list in (('serializer', False), ('values', True)):
+                with override_settings(RECIPE_API_FAST_LIST=fast_list):
+                    result = measure(request, repeat=repeat)
+                    result['peak_rss_mb'] = measure_peak_rss(request)
+                results[size][f'{name}_{path}'] = result
+
+    return results
@@ -0,0 +1,108 @@
+import math
+import resource
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import (
+    CaptureQueriesContext,
+    setup_test_environment,
+    teardown_test_environment,
+)
+
+
+@contextmanager
+def benchmark_database(keepdb=False):
+    """Run the enclosed block against a throwaway test database"""
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(
+            verbosity=0,
+            autoclobber=True,
+            keepdb=keepdb
+    )
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(
+                old_name,
+                verbosity=0,
+                keepdb=keepdb
+        )
+        teardown_test_environment()
+
+
+def percentile(ordered, percent):
+    """Return the nearest-rank percentile of an ordered list"""
+    rank = max(1, math.ceil(percent / 100 * len(ordered)))
+
+    return ordered[rank - 1]
+
+
+def summarize(timings_ms):
+    """Summarize a list of timings in milliseconds"""
+    ordered = sorted(timings_ms)
+
+    return {
+        'runs': len(ordered),
+        'min_ms': round(ordered[0], 3),
+        'p50_ms': round(percentile(ordered, 50), 3),
+        'p95_ms': round(percentile(ordered, 95), 3),
+        'p99_ms': round(percentile(ordered, 99), 3),
+        'max_ms': round(ordered[-1], 3),
+    }
+
+
+def measure(func, repeat=20, warmup=2):
+    """Call func repeatedly and return its latency summary and query count"""
+    for _ in range(warmup):
+        func()
+
+    timings = []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+
+    result = summarize(timings)
+    result['queries'] = len(queries)
+
+    return result
+
+
+def _read_status_kb(field):
+    """Return a memory field of /proc/self/status in kilobytes, or None"""
+    try:
+        with open('/proc/self/status') as status_file:
+            for line in status_file:
+                if line.startswith(f'{field}:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+
+    return None
+
+
+def _max_rss_kb():
+    """Return the peak resident set size of the process in kilobytes"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure_peak_rss(func):
+    """
+    Call func and return how far it raised the peak resident set size of
+    the process, in megabytes. Linux lets the peak be reset before each
+    call, elsewhere only calls raising the peak of the process register.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+    except OSError:
+        pass
+
+    before = _read_status_kb('VmRSS') or _max_rss_kb()
+    func()
+    peak = _read_status_kb('VmHWM') or _max_rss_kb()
+
+    return round(max(peak - before, 0) / 1024, 3)
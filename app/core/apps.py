@@ -1,5 +1,27 @@
 from django.apps import AppConfig
+from django.contrib.auth import get_user_model
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from rest_framework.authtoken.models import Token
+
+        from .authentication import invalidate_token, invalidate_user_token
+        from .models import Recipe, Tag, Ingredient
+        from .slow_queries import install
+        from .versions import create_data_version, data_changed
+
+        post_delete.connect(invalidate_token, sender=Token)
+        post_save.connect(invalidate_user_token, sender=get_user_model())
+        post_delete.connect(invalidate_user_token, sender=get_user_model())
+
+        post_save.connect(create_data_version, sender=get_user_model())
+        for model in (Recipe, Tag, Ingredient):
+            post_save.connect(data_changed, sender=model)
+            post_delete.connect(data_changed, sender=model)
+
+        connection_created.connect(install)
@@ -0,0 +1,313 @@
+import abc
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework.authentication import TokenAuthentication
+
+from .metrics import registry
+
+
+TOKEN_CACHE_LOOKUPS = registry.counter(
+        'token_auth_cache_lookups_total',
+        'Token cache lookups by result, hit or miss.',
+        ['result']
+)
+TOKEN_CACHE_INVALIDATIONS = registry.counter(
+        'token_auth_cache_invalidations_total',
+        'Cached tokens dropped because the token or its user changed.'
+)
+TOKEN_CACHE_EVICTIONS = registry.counter(
+        'token_auth_cache_evictions_total',
+        'Cached tokens evicted from full in-process caches.'
+)
+
+
+class BaseTokenCache(abc.ABC):
+    """
+    Caches `(user, token)` pairs by token key and records hit rates.
+
+    Every invalidation bumps a generation, and entries looked up in the
+    database are only cached when no invalidation happened meanwhile, so
+    a concurrent lookup cannot cache a token revoked during its query.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._stats_lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached `(user, token)` pair of a key or None"""
+        entry = self._get(key)
+        with self._stats_lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        TOKEN_CACHE_LOOKUPS.inc(result='miss' if entry is None else 'hit')
+
+        return entry
+
+    def _invalidated(self):
+        with self._stats_lock:
+            self.invalidations += 1
+        TOKEN_CACHE_INVALIDATIONS.inc()
+
+    @abc.abstractmethod
+    def generation(self):
+        """Return the generation to pass to `set` before a database lookup"""
+
+    @abc.abstractmethod
+    def set(self, key, entry, generation):
+        """
+        Cache the `(user, token)` pair of a key, unless the cache was
+        invalidated since `generation` was read
+        """
+
+    @abc.abstractmethod
+    def invalidate(self, key):
+        """Drop the cached entry of a token key"""
+
+    @abc.abstractmethod
+    def invalidate_user(self, user_id):
+        """Drop the cached entry of the token owned by a user"""
+
+    @abc.abstractmethod
+    def clear(self):
+        """Drop every cached entry"""
+
+    @abc.abstractmethod
+    def _get(self, key):
+        """Return the cached entry of a key or None"""
+
+    def stats(self):
+        """Return the cache counters and hit rate"""
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+class LocalTokenCache(BaseTokenCache):
+    """
+    In-process LRU token cache with a bounded size and a time to live.
+    Invalidations only reach the cache of the process making them, so
+    keep the time to live short.
+    """
+
+    def __init__(self, ttl, max_size):
+        super().__init__(ttl)
+        self.max_size = max_size
+        self.evictions = 0
+        self._generation = 0
+        self._entries = OrderedDict()
+        self._user_keys = {}
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is None:
+                return None
+            entry, expires_at = cached
+            if expires_at <= time.monotonic():
+                self._discard(key)
+                return None
+            self._entries.move_to_end(key)
+
+        # Requests must not share (and mutate) the same user instance
+        user, token = entry
+        return copy.copy(user), token
+
+    def generation(self):
+        with self._lock:
+            return self._generation
+
+    def set(self, key, entry, generation):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[key] = (entry, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            self._user_keys[entry[0].pk] = key
+            while len(self._entries) > self.max_size:
+                oldest_key = next(iter(self._entries))
+                self._discard(oldest_key)
+                self.evictions += 1
+                TOKEN_CACHE_EVICTIONS.inc()
+
+    def invalidate(self, key):
+        with self._lock:
+            self._generation += 1
+            discarded = self._discard(key)
+        if discarded:
+            self._invalidated()
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            self._generation += 1
+            key = self._user_keys.get(user_id)
+            discarded = key is not None and self._discard(key)
+        if discarded:
+            self._invalidated()
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._user_keys.clear()
+
+    def _discard(self, key):
+        """Remove a key, the caller must hold the lock"""
+        cached = self._entries.pop(key, None)
+        if cached is None:
+            return False
+        user_id = cached[0][0].pk
+        if self._user_keys.get(user_id) == key:
+            del self._user_keys[user_id]
+
+        return True
+
+    def stats(self):
+        stats = super().stats()
+        stats.update({'size': len(self._entries), 'evictions': self.evictions})
+
+        return stats
+
+
+class SharedTokenCache(BaseTokenCache):
+    """
+    Token cache stored in one of the Django caches, so that every worker
+    process sees the same entries and invalidations.
+    """
+    key_prefix = 'token-auth'
+
+    def __init__(self, ttl, alias):
+        super().__init__(ttl)
+        self.cache = caches[alias]
+
+    def _key(self, key):
+        return f'{self.key_prefix}:key:{key}'
+
+    def _user_key(self, user_id):
+        return f'{self.key_prefix}:user:{user_id}'
+
+    @property
+    def _generation_key(self):
+        return f'{self.key_prefix}:generation'
+
+    def _get(self, key):
+        return self.cache.get(self._key(key))
+
+    def generation(self):
+        return self.cache.get(self._generation_key, 0)
+
+    def set(self, key, entry, generation):
+        if generation != self.generation():
+            return
+        self.cache.set_many({
+            self._key(key): entry,
+            self._user_key(entry[0].pk): key,
+        }, timeout=self.ttl)
+
+    def _next_generation(self):
+        # The generation never expires, so that it never goes back to 0
+        self.cache.add(self._generation_key, 0, timeout=None)
+        try:
+            self.cache.incr(self._generation_key)
+        except ValueError:
+            # Evicted between add and incr, any new value will do
+            self.cache.set(
+                    self._generation_key,
+                    int(time.time() * 1000000),
+                    timeout=None
+            )
+
+    def invalidate(self, key):
+        self._next_generation()
+        self.cache.delete(self._key(key))
+        self._invalidated()
+
+    def invalidate_user(self, user_id):
+        self._next_generation()
+        key = self.cache.get(self._user_key(user_id))
+        if key is not None:
+            self.cache.delete_many([self._key(key), self._user_key(user_id)])
+            self._invalidated()
+
+    def clear(self):
+        # Other entries may live in the same cache, let them expire
+        self._next_generation()
+
+
+_token_cache = None
+_token_cache_lock = threading.Lock()
+
+
+def get_token_cache():
+    """Return the token cache configured by `TOKEN_AUTH_CACHE`"""
+    global _token_cache
+    if _token_cache is None:
+        with _token_cache_lock:
+            if _token_cache is None:
+                options = settings.TOKEN_AUTH_CACHE
+                if options.get('CACHE_ALIAS'):
+                    _token_cache = SharedTokenCache(
+                            options['TTL'], options['CACHE_ALIAS']
+                    )
+                else:
+                    _token_cache = LocalTokenCache(
+                            options['TTL'], options['MAX_SIZE']
+                    )
+
+    return _token_cache
+
+
+@receiver(setting_changed)
+def reset_token_cache(setting, **kwargs):
+    """Rebuild the token cache when its settings change"""
+    global _token_cache
+    if setting in ('TOKEN_AUTH_CACHE', 'CACHES'):
+        _token_cache = None
+
+
+def invalidate_token(sender, instance, **kwargs):
+    """Drop a deleted token from the cache"""
+    get_token_cache().invalidate(instance.key)
+
+
+def invalidate_user_token(sender, instance, **kwargs):
+    """
+    Drop the token of a saved user from the cache, so that password and
+    `is_active` changes take effect on the next request
+    """
+    get_token_cache().invalidate_user(instance.pk)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication caching the token and user lookup, which is
+    otherwise executed on every authenticated request.
+    """
+
+    def authenticate_credentials(self, key):
+        token_cache = get_token_cache()
+        entry = token_cache.get(key)
+        if entry is None:
+            generation = token_cache.generation()
+            entry = super().authenticate_credentials(key)
+            token_cache.set(key, entry, generation)
+
+        return entry
@@ -0,0 +1,131 @@
+import time
+
+from django.conf import settings
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.creation import (
+        DatabaseCreation as PostgresDatabaseCreation
+)
+from psycopg2 import extensions
+
+from core.pool import PoolTimeout, close_pools, get_pool
+
+
+def reset(connection):
+    """
+    Roll back the transaction left open on a raw connection, return
+    whether it can be reused
+    """
+    if connection.closed:
+        return False
+    try:
+        status = connection.get_transaction_status()
+        if status != extensions.TRANSACTION_STATUS_IDLE:
+            connection.rollback()
+    except base.Database.Error:
+        return False
+
+    return True
+
+
+def is_usable(connection):
+    """Return whether a raw connection answers queries"""
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except base.Database.Error:
+        return False
+
+    return reset(connection)
+
+
+class DatabaseCreation(PostgresDatabaseCreation):
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Idle pooled connections to the test database would prevent
+        # dropping it
+        close_pools()
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    PostgreSQL backend checking out its connections from a pool shared by
+    the threads of the process when `DATABASE_POOL` is ENABLED, released
+    when Django closes them, e.g. at the end of requests with CONN_MAX_AGE
+    0. With HEALTH_CHECKS, pooled and persistent connections idle for at
+    least HEALTH_CHECK_IDLE seconds are checked before their first use by
+    a request. Connections are also checked after errors, by Django for
+    persistent ones and on checkin for pooled ones.
+    """
+    creation_class = DatabaseCreation
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = None
+        self.health_check_done = False
+        self.idle_since = None
+
+    def get_new_connection(self, conn_params):
+        options = settings.DATABASE_POOL
+        if not options['ENABLED']:
+            return super().get_new_connection(conn_params)
+
+        isolation_level = self.settings_dict['OPTIONS'].get('isolation_level')
+        pool = get_pool(
+                self.alias,
+                repr((sorted(conn_params.items()), isolation_level))
+        )
+        connect = super().get_new_connection
+        try:
+            connection = pool.checkout(
+                    lambda: connect(conn_params),
+                    is_usable if options['HEALTH_CHECKS'] else None,
+                    options['HEALTH_CHECK_IDLE']
+            )
+        except PoolTimeout as exc:
+            raise base.Database.OperationalError(str(exc)) from exc
+        self.pool = pool
+        if isolation_level is None:
+            isolation_level = connection.isolation_level
+        self.isolation_level = isolation_level
+
+        return connection
+
+    def connect(self):
+        super().connect()
+        self.health_check_done = True
+        self.idle_since = time.monotonic()
+
+    def close_if_unusable_or_obsolete(self):
+        # Called when requests start and finish, the connection is idle in
+        # between and only needs a check when it was idle for long
+        super().close_if_unusable_or_obsolete()
+        now = time.monotonic()
+        if self.idle_since is not None:
+            check_idle = settings.DATABASE_POOL['HEALTH_CHECK_IDLE']
+            self.health_check_done = now - self.idle_since < check_idle
+        self.idle_since = now
+
+    def _cursor(self, name=None):
+        if self.connection is not None and not self.health_check_done \
+                and not self.in_atomic_block \
+                and settings.DATABASE_POOL['HEALTH_CHECKS']:
+            self.health_check_done = True
+            if not self.is_usable():
+                self.close()
+
+        return super()._cursor(name)
+
+    def _close(self):
+        if self.pool is None:
+            return super()._close()
+
+        pool, self.pool = self.pool, None
+        # Connections closed within a transaction stay referenced until it
+        # ends, so they must not be handed to another thread
+        reusable = (
+            not self.in_atomic_block
+            and reset(self.connection)
+            and (not self.errors_occurred or is_usable(self.connection))
+        )
+        pool.checkin(self.connection, reusable)
@@ -0,0 +1,64 @@
+from django.db import transaction
+from django.db.models import Count, Min
+from django.db.models.functions import Upper
+
+from .versions import bump_versions, deferred_bumps
+
+
+def merge_duplicate_names(model, recipe_model, relation, batch_size=1000):
+    """
+    Merge the objects of a user owned model whose names differ only by
+    case into the oldest one, moving their recipe links over to it and
+    bumping the data versions of their users. Duplicates are merged
+    `batch_size` names per transaction and the number of removed objects
+    is returned.
+    """
+    field = recipe_model._meta.get_field(relation)
+    through = field.remote_field.through
+    recipe_column = f'{field.m2m_field_name()}_id'
+    related_column = f'{field.m2m_reverse_field_name()}_id'
+    removed = 0
+
+    while True:
+        # One version bump per user and batch, not per removed object
+        with transaction.atomic(), deferred_bumps():
+            groups = list(
+                model.objects.annotate(name_key=Upper('name'))
+                .values('user_id', 'name_key')
+                .annotate(keep_id=Min('id'), count=Count('id'))
+                .filter(count__gt=1)
+                .order_by()[:batch_size]
+            )
+            if not groups:
+                return removed
+
+            keep_ids = {
+                (group['user_id'], group['name_key']): group['keep_id']
+                for group in groups
+            }
+            candidates = model.objects.annotate(name_key=Upper('name')).filter(
+                    user_id__in={group['user_id'] for group in groups},
+                    name_key__in={group['name_key'] for group in groups}
+            ).values_list('id', 'user_id', 'name_key')
+            replacements = {}
+            user_ids = set()
+            for pk, user_id, key in candidates:
+                keep_id = keep_ids.get((user_id, key))
+                if keep_id is not None and keep_id != pk:
+                    replacements[pk] = keep_id
+                    user_ids.add(user_id)
+
+            links = through.objects.filter(
+                    **{f'{related_column}__in': list(replacements)}
+            ).values_list(recipe_column, related_column)
+            through.objects.bulk_create([
+                through(**{
+                    recipe_column: recipe_id,
+                    related_column: replacements[related_id],
+                })
+                for recipe_id, related_id in links
+            ], ignore_conflicts=True)
+            deleted = model.objects.filter(id__in=list(replacements)).delete()
+            removed += deleted[1].get(model._meta.label, 0)
+            for user_id in user_ids:
+                bump_versions(user_id, relation, 'recipes')
@@ -0,0 +1,191 @@
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMetrics:
+    """
+    Query count and time spent in the database, the view, serializing
+    and rendering by one request. Installed as an `execute_wrapper` of the
+    connections, the view time includes the serialization time.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.view = None
+        self.action = None
+        self.view_start = None
+        self.view_end = None
+        self.serialize_time = 0.0
+        self.render_time = 0.0
+        self.total_time = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+    def set_view(self, view_func, method):
+        """Record the view handling the request and its DRF action"""
+        view_class = getattr(view_func, 'cls', None)
+        if view_class:
+            self.view = view_class.__name__
+        else:
+            self.view = getattr(view_func, '__name__', None)
+        # Viewsets map HTTP methods to actions, other views handle methods
+        actions = getattr(view_func, 'actions', None) or {}
+        self.action = actions.get(method.lower(), method.lower())
+        self.view_start = time.perf_counter()
+
+    def time_serialization(self, to_representation):
+        """Wrap the `to_representation` method of a serializer to time it"""
+        def timed(instance):
+            start = time.perf_counter()
+            try:
+                return to_representation(instance)
+            finally:
+                self.serialize_time += time.perf_counter() - start
+
+        return timed
+
+    def start_render(self, response):
+        """Time the rendering of a template or DRF response"""
+        self.view_end = render_start = time.perf_counter()
+
+        def stop_render(response):
+            self.render_time += time.perf_counter() - render_start
+
+        response.add_post_render_callback(stop_render)
+
+    def finish(self):
+        self.total_time = time.perf_counter() - self.start
+        if self.view_start is not None and self.view_end is None:
+            self.view_end = self.start + self.total_time
+
+    @property
+    def view_time(self):
+        if self.view_start is None:
+            return 0.0
+
+        return self.view_end - self.view_start
+
+    def durations_ms(self):
+        """Return the measured durations in milliseconds"""
+        return {
+            'db': self.db_time * 1000,
+            'view': self.view_time * 1000,
+            'serialize': self.serialize_time * 1000,
+            'render': self.render_time * 1000,
+            'total': self.total_time * 1000,
+        }
+
+    def server_timing(self):
+        """Return the value of the `Server-Timing` header"""
+        durations = self.durations_ms()
+        metrics = [
+            f'db;dur={durations["db"]:.2f};desc="{self.queries} queries"'
+        ]
+        metrics.extend(
+            f'{name};dur={durations[name]:.2f}'
+            for name in ('view', 'serialize', 'render', 'total')
+        )
+
+        return ', '.join(metrics)
+
+
+class SerializationTimingMixin:
+    """
+    Times the serializers of a view rendering their data, e.g. on
+    `serializer.data`, in the RequestMetrics of the request
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        metrics = getattr(self.request, 'request_metrics', None)
+        if metrics is not None:
+            serializer.to_representation = metrics.time_serialization(
+                    serializer.to_representation
+            )
+
+        return serializer
+
+
+class RequestInstrumentationMiddleware:
+    """
+    Measures a sample of the requests, see `REQUEST_INSTRUMENTATION`: their
+    queries, database, view, rendering and total times are sent in a
+    `Server-Timing` header and logged as one line per request. Every
+    request is measured for core.metrics when `METRICS` are ENABLED.
+    Queries run while streaming a response body are not included.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        options = settings.REQUEST_INSTRUMENTATION
+        sample_rate = options['SAMPLE_RATE']
+        sampled = sample_rate >= 1 or (
+                sample_rate > 0 and random.random() < sample_rate
+        )
+        if not sampled and not settings.METRICS['ENABLED']:
+            return self.get_response(request)
+
+        metrics = request.request_metrics = RequestMetrics()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(metrics))
+            response = self.get_response(request)
+        metrics.finish()
+        if not sampled:
+            return response
+
+        if options['SERVER_TIMING']:
+            response['Server-Timing'] = metrics.server_timing()
+        if options['LOG']:
+            self.log(request, response, metrics)
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = getattr(request, 'request_metrics', None)
+        if metrics is not None:
+            metrics.set_view(view_func, request.method)
+
+    def process_template_response(self, request, response):
+        metrics = getattr(request, 'request_metrics', None)
+        if metrics is not None:
+            metrics.start_render(response)
+
+        return response
+
+    def log(self, request, response, metrics):
+        fields = {
+            'method': request.method,
+            'path': request.path,
+            'view': metrics.view,
+            'action': metrics.action,
+            'status': response.status_code,
+            'queries': metrics.queries,
+            **{
+                f'{name}_ms': round(duration, 2)
+                for name, duration in metrics.durations_ms().items()
+            },
+        }
+        logger.info(
+                ' '.join(f'{name}=%s' for name in fields),
+                *fields.values(),
+                extra={'request_metrics': fields}
+        )
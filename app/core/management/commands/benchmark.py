@@ -0,0 +1,56 @@
+import importlib
+import json
+import pkgutil
+
+from django.core.management.base import BaseCommand
+
+import benchmarks
+from benchmarks.utils import benchmark_database
+
+
+class Command(BaseCommand):
+    """Django command to run a benchmark against a throwaway database"""
+
+    help = (
+        "Run a benchmark from the benchmarks package and print its results "
+        "as JSON"
+    )
+
+    def add_arguments(self, parser):
+        subparsers = parser.add_subparsers(
+                dest='benchmark',
+                title='benchmarks'
+        )
+        subparsers.required = True
+        for module_info in pkgutil.iter_modules(benchmarks.__path__):
+            module = importlib.import_module(
+                    f'benchmarks.{module_info.name}'
+            )
+            if not hasattr(module, 'run'):
+                continue
+            subparser = subparsers.add_parser(
+                    module_info.name,
+                    help=module.__doc__
+            )
+            subparser.add_argument(
+                    '--output',
+                    help='Also write the JSON results to this file'
+            )
+            subparser.add_argument(
+                    '--keepdb', action='store_true',
+                    help='Reuse the benchmark database between runs'
+            )
+            if hasattr(module, 'add_arguments'):
+                module.add_arguments(subparser)
+
+    def handle(self, *args, **options):
+        module = importlib.import_module(f"benchmarks.{options['benchmark']}")
+        with benchmark_database(keepdb=options['keepdb']):
+            results = module.run(stdout=self.stdout, **options)
+
+        output = json.dumps(results, indent=2)
+        self.stdout.write(output)
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                output_file.write(output)
+        self.stdout.write(self.style.SUCCESS("Benchmark finished!"))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from core.deduplication import merge_duplicate_names
+from core.models import Tag, Ingredient, Recipe
+
+
+class Command(BaseCommand):
+    """
+    Django command to merge the tags and ingredients of a user whose names
+    differ only by case. Run it before migrating to
+    0015_case_insensitive_names on large databases: it merges in batches
+    of short transactions while the application is serving, and leaves no
+    duplicates for the migration to merge while it holds its locks.
+    Duplicates cannot be created once the migration is applied.
+    """
+
+    help = (
+        "Merge the tags and ingredients of each user whose names differ "
+        "only by case into the oldest one, before migrating to "
+        "case-insensitive names"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+                '--batch-size', type=int, default=1000,
+                help='Number of duplicate names merged per transaction'
+        )
+
+    def handle(self, *args, **options):
+        for model, relation in ((Tag, 'tags'), (Ingredient, 'ingredients')):
+            removed = merge_duplicate_names(
+                    model, Recipe, relation,
+                    batch_size=options['batch_size']
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f"Removed {removed} duplicate "
+                f"{model._meta.verbose_name_plural}"
+            ))
@@ -0,0 +1,95 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from benchmarks.data import seed_users
+
+
+class Command(BaseCommand):
+    """Django command to fill the database with synthetic users and recipes"""
+
+    help = (
+        "Create users with tags, ingredients and recipes shaped like "
+        "production data, the same data for the same options and seed"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument(
+                '--recipes', type=int, default=10000,
+                help='Recipes of all users'
+        )
+        parser.add_argument(
+                '--tags', type=int, default=100,
+                help='Maximum tags per user'
+        )
+        parser.add_argument(
+                '--ingredients', type=int, default=1000,
+                help='Maximum ingredients per user'
+        )
+        parser.add_argument(
+                '--tags-per-recipe', type=int, default=3,
+                help='Mean tags per recipe'
+        )
+        parser.add_argument(
+                '--ingredients-per-recipe', type=int, default=8,
+                help='Mean ingredients per recipe'
+        )
+        parser.add_argument(
+                '--skew', type=float, default=1.0,
+                help='Zipf exponent of library sizes and tag and ingredient '
+                     'popularity, 0 for uniform data'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+                '--email', default='seed-{}@example.com',
+                help='Email pattern of the users, {} is replaced by their '
+                     'number'
+        )
+        parser.add_argument('--password', default='password')
+        parser.add_argument(
+                '--replace', action='store_true',
+                help='Delete the users matching the email pattern first'
+        )
+        parser.add_argument(
+                '--batch-size', type=int,
+                help='Rows inserted per query, the most the database '
+                     'accepts by default'
+        )
+
+    def handle(self, *args, **options):
+        if '{}' not in options['email']:
+            raise CommandError("--email must contain {}")
+        emails = [options['email'].format(i) for i in range(options['users'])]
+        existing = get_user_model().objects.filter(email__in=emails)
+        if existing.exists() and not options['replace']:
+            raise CommandError(
+                    "Seed users already exist, use --replace to recreate them"
+            )
+
+        start = time.monotonic()
+        with transaction.atomic():
+            existing.delete()
+            libraries = seed_users(
+                    users=options['users'],
+                    recipes=options['recipes'],
+                    tags=options['tags'],
+                    ingredients=options['ingredients'],
+                    tags_per_recipe=options['tags_per_recipe'],
+                    ingredients_per_recipe=options['ingredients_per_recipe'],
+                    skew=options['skew'],
+                    seed=options['seed'],
+                    email=options['email'],
+                    password=options['password'],
+                    batch_size=options['batch_size'],
+            )
+
+        for user, size in libraries[:5]:
+            self.stdout.write(f"{user.email}: {size} recipes")
+        self.stdout.write(self.style.SUCCESS(
+                f"Seeded {len(libraries)} users and "
+                f"{sum(size for user, size in libraries)} recipes in "
+                f"{time.monotonic() - start:.1f}s"
+        ))
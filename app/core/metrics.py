@@ -0,0 +1,329 @@
+import atexit
+import bisect
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+
+class Metric:
+    """Base class of labelled metrics, safe to update from any thread"""
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                    f'{self.name} expects the labels {self.labelnames}'
+            )
+
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def state(self):
+        """Return a copy of the values of the metric by label values"""
+        with self._lock:
+            return {
+                key: self._copy(value) for key, value in self._values.items()
+            }
+
+    def _copy(self, value):
+        return value
+
+    def merge(self, values, other):
+        """Add the values of another process into values"""
+        for key, value in other.items():
+            values[key] = values.get(key, 0) + value
+
+    def samples(self, values):
+        """Yield `(name suffix, labels, value)` of values"""
+        for key, value in sorted(values.items()):
+            yield '', dict(zip(self.labelnames, key)), value
+
+
+class Counter(Metric):
+    """Monotonic count, e.g. of requests"""
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """Value going up and down, summed over the live processes"""
+    type = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    """Observations counted in fixed buckets, with their count and sum"""
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=()):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = sorted(float(bucket) for bucket in buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            # Counts per bucket, the last one is +Inf, then the sum
+            values = self._values.get(key)
+            if values is None:
+                values = [0] * (len(self.buckets) + 1) + [0.0]
+                self._values[key] = values
+            values[index] += 1
+            values[-1] += value
+
+    def _copy(self, value):
+        return list(value)
+
+    def merge(self, values, other):
+        for key, value in other.items():
+            if key in values:
+                values[key] = [
+                    mine + theirs for mine, theirs in zip(values[key], value)
+                ]
+            else:
+                values[key] = list(value)
+
+    def samples(self, values):
+        for key, counts in sorted(values.items()):
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + [math.inf], counts):
+                cumulative += count
+                bucket_labels = dict(labels, le=format_value(bound))
+                yield '_bucket', bucket_labels, cumulative
+            yield '_count', labels, cumulative
+            yield '_sum', labels, counts[-1]
+
+
+def format_value(value):
+    """Format a sample value or bucket bound in the Prometheus text format"""
+    if value == math.inf:
+        return '+Inf'
+    elif float(value).is_integer():
+        return str(int(value))
+
+    return repr(float(value))
+
+
+def escape_label(value):
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+class Registry:
+    """
+    Metrics of this process. With `METRICS['MULTIPROCESS_DIR']` set, every
+    process also writes its values to `<pid>.json` in that directory at
+    most every `FLUSH_INTERVAL` seconds, and the exposition sums the files
+    of every process: counters and histograms of exited processes are
+    kept, gauges only count for live processes. Empty the directory when
+    the whole server restarts.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+
+    def register(self, metric):
+        """
+        Register a metric, or return the one already registered by its
+        name
+        """
+        with self._lock:
+            return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=()):
+        return self.register(
+                Histogram(name, documentation, labelnames, buckets)
+        )
+
+    def state(self):
+        """Return the values of every metric of this process"""
+        return {name: metric.state() for name, metric in self.metrics.items()}
+
+    def multiprocess_dir(self):
+        return settings.METRICS['MULTIPROCESS_DIR']
+
+    def flush(self):
+        """Write the values of this process to the multiprocess directory"""
+        directory = self.multiprocess_dir()
+        if not directory:
+            return
+
+        self._last_flush = time.monotonic()
+        state = {
+            name: [[list(key), value] for key, value in values.items()]
+            for name, values in self.state().items()
+        }
+        with tempfile.NamedTemporaryFile(
+                'w', dir=directory, suffix='.tmp', delete=False
+        ) as output:
+            json.dump(state, output)
+        os.replace(output.name, os.path.join(directory, f'{os.getpid()}.json'))
+
+    def maybe_flush(self):
+        """Flush when the last flush is older than `FLUSH_INTERVAL`"""
+        elapsed = time.monotonic() - self._last_flush
+        if elapsed >= settings.METRICS['FLUSH_INTERVAL']:
+            self.flush()
+
+    def collect(self):
+        """Return the values of every metric summed over the processes"""
+        values = self.state()
+        directory = self.multiprocess_dir()
+        if not directory:
+            return values
+
+        for file_name in os.listdir(directory):
+            pid, extension = os.path.splitext(file_name)
+            if extension != '.json' or not pid.isdigit() \
+                    or int(pid) == os.getpid():
+                continue
+            try:
+                with open(os.path.join(directory, file_name)) as state_file:
+                    state = json.load(state_file)
+            except (OSError, ValueError):
+                continue
+            alive = process_alive(int(pid))
+            for name, items in state.items():
+                metric = self.metrics.get(name)
+                if metric is None or (metric.type == 'gauge' and not alive):
+                    continue
+                metric.merge(
+                        values.setdefault(name, {}),
+                        {tuple(key): value for key, value in items}
+                )
+
+        return values
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format"""
+        lines = []
+        for name, values in sorted(self.collect().items()):
+            metric = self.metrics[name]
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.type}')
+            for suffix, labels, value in metric.samples(values):
+                label_text = ','.join(
+                    f'{label}="{escape_label(label_value)}"'
+                    for label, label_value in labels.items()
+                )
+                if label_text:
+                    sample_name = f'{name}{suffix}{{{label_text}}}'
+                else:
+                    sample_name = f'{name}{suffix}'
+                lines.append(f'{sample_name} {format_value(value)}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def process_alive(pid):
+    """Return whether a process is running"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+    return True
+
+
+registry = Registry()
+atexit.register(registry.flush)
+
+REQUESTS = registry.counter(
+        'http_requests_total',
+        'Requests by route, method and status code.',
+        ['route', 'method', 'status']
+)
+REQUEST_DURATION = registry.histogram(
+        'http_request_duration_seconds',
+        'Request latency by route and method.',
+        ['route', 'method'],
+        buckets=[0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+)
+REQUEST_QUERIES = registry.histogram(
+        'http_request_queries',
+        'Database queries per request by route and method.',
+        ['route', 'method'],
+        buckets=[0, 1, 2, 3, 5, 8, 13, 21, 50, 100]
+)
+REQUESTS_IN_PROGRESS = registry.gauge(
+        'http_requests_in_progress',
+        'Requests being handled.',
+)
+
+
+# Any other request method is labelled `other`, clients choose the method
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+
+class MetricsMiddleware:
+    """
+    Records the latency, status code and query count of every request in
+    the metrics registry, labelled by route, e.g. `recipe:recipe-list`.
+    Queries are counted by the RequestMetrics of core.instrumentation.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.METRICS['ENABLED']:
+            return self.get_response(request)
+
+        REQUESTS_IN_PROGRESS.inc()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            REQUESTS_IN_PROGRESS.dec()
+        duration = time.perf_counter() - start
+
+        match = request.resolver_match
+        route = match.view_name if match else 'unmatched'
+        method = request.method if request.method in METHODS else 'other'
+        REQUESTS.inc(route=route, method=method, status=response.status_code)
+        REQUEST_DURATION.observe(duration, route=route, method=method)
+        metrics = getattr(request, 'request_metrics', None)
+        if metrics is not None:
+            REQUEST_QUERIES.observe(
+                    metrics.queries, route=route, method=method
+            )
+        registry.maybe_flush()
+
+        return response
@@ -0,0 +1,64 @@
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_names(model, recipe_model, relation, batch_size=1000):
+    """
+    Merge the objects sharing a `(user, name)` pair into the oldest one,
+    moving their recipe links over to it, `batch_size` names at a time
+    """
+    field = recipe_model._meta.get_field(relation)
+    through = field.remote_field.through
+    recipe_column = f'{field.m2m_field_name()}_id'
+    related_column = f'{field.m2m_reverse_field_name()}_id'
+
+    while True:
+        groups = list(
+            model.objects.values('user_id', 'name')
+            .annotate(keep_id=Min('id'), count=Count('id'))
+            .filter(count__gt=1)
+            .order_by()[:batch_size]
+        )
+        if not groups:
+            return
+
+        keep_ids = {(group['user_id'], group['name']): group['keep_id'] for group in groups}
+        candidates = model.objects.filter(
+                user_id__in={group['user_id'] for group in groups},
+                name__in={group['name'] for group in groups}
+        ).values_list('id', 'user_id', 'name')
+        replacements = {}
+        for pk, user_id, name in candidates:
+            keep_id = keep_ids.get((user_id, name))
+            if keep_id is not None and keep_id != pk:
+                replacements[pk] = keep_id
+
+        links = through.objects.filter(
+                **{f'{related_column}__in': list(replacements)}
+        ).values_list(recipe_column, related_column)
+        through.objects.bulk_create([
+            through(**{recipe_column: recipe_id, related_column: replacements[related_id]})
+            for recipe_id, related_id in links
+        ], ignore_conflicts=True)
+        model.objects.filter(id__in=list(replacements)).delete()
+
+
+def merge_duplicates(apps, schema_editor):
+    """Merge the existing duplicates the unique constraints would reject"""
+    Recipe = apps.get_model('core', 'Recipe')
+    merge_duplicate_names(apps.get_model('core', 'Tag'), Recipe, 'tags')
+    merge_duplicate_names(apps.get_model('core', 'Ingredient'), Recipe, 'ingredients')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_user_indexes'),
+    ]
+
+    # A migration of its own: PostgreSQL refuses to alter or index the
+    # recipe link tables while checks of their deferred foreign keys to
+    # the deleted rows are pending in the same transaction
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 2.2.28 on 2026-10-17 06:06
+
+import core.models
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_unique_user_names'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeImageRendition',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=32)),
+                ('image', models.ImageField(height_field='height', upload_to=core.models.recipe_rendition_file_path, width_field='width')),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='renditions', to='core.Recipe')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='recipeimagerendition',
+            constraint=models.UniqueConstraint(fields=('recipe', 'name'), name='core_recipeimagerendition_unique_recipe_name'),
+        ),
+    ]
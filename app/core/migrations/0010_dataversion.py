@@ -0,0 +1,24 @@
+# Generated by Django 2.2.28 on 2026-10-17 06:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_recipeimagerendition'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersion',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='data_version', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('recipes', models.PositiveIntegerField(default=0)),
+                ('tags', models.PositiveIntegerField(default=0)),
+                ('ingredients', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
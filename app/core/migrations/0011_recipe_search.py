@@ -0,0 +1,63 @@
+from django.db import migrations
+
+
+# Full-text search structures kept up to date by the database itself, so
+# that every write path (saves, bulk inserts, imports) maintains them.
+SEARCH_SQL = {
+    'postgresql': {
+        'install': [
+            'ALTER TABLE core_recipe ADD COLUMN search_vector tsvector',
+            "UPDATE core_recipe SET search_vector = to_tsvector('pg_catalog.english', title)",
+            'CREATE INDEX core_recipe_search_vector_idx ON core_recipe USING gin (search_vector)',
+            'CREATE TRIGGER core_recipe_search_vector_update '
+            'BEFORE INSERT OR UPDATE OF title ON core_recipe FOR EACH ROW '
+            "EXECUTE PROCEDURE tsvector_update_trigger(search_vector, 'pg_catalog.english', title)",
+        ],
+        'uninstall': [
+            'DROP TRIGGER core_recipe_search_vector_update ON core_recipe',
+            'ALTER TABLE core_recipe DROP COLUMN search_vector',
+        ],
+    },
+    'sqlite': {
+        'install': [
+            "CREATE VIRTUAL TABLE core_recipe_search USING fts5("
+            "title, content='core_recipe', content_rowid='id', tokenize='porter unicode61')",
+            "INSERT INTO core_recipe_search (core_recipe_search) VALUES ('rebuild')",
+            'CREATE TRIGGER core_recipe_search_insert AFTER INSERT ON core_recipe BEGIN '
+            'INSERT INTO core_recipe_search (rowid, title) VALUES (new.id, new.title); END',
+            'CREATE TRIGGER core_recipe_search_delete AFTER DELETE ON core_recipe BEGIN '
+            "INSERT INTO core_recipe_search (core_recipe_search, rowid, title) "
+            "VALUES ('delete', old.id, old.title); END",
+            'CREATE TRIGGER core_recipe_search_update AFTER UPDATE OF title ON core_recipe BEGIN '
+            "INSERT INTO core_recipe_search (core_recipe_search, rowid, title) "
+            "VALUES ('delete', old.id, old.title); "
+            'INSERT INTO core_recipe_search (rowid, title) VALUES (new.id, new.title); END',
+        ],
+        'uninstall': [
+            'DROP TRIGGER core_recipe_search_insert',
+            'DROP TRIGGER core_recipe_search_delete',
+            'DROP TRIGGER core_recipe_search_update',
+            'DROP TABLE core_recipe_search',
+        ],
+    },
+}
+
+
+def run_search_sql(step):
+    def run(apps, schema_editor):
+        """Run the search SQL of the database backend, if it has any"""
+        for statement in SEARCH_SQL.get(schema_editor.connection.vendor, {}).get(step, []):
+            schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_dataversion'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_search_sql('install'), run_search_sql('uninstall')),
+    ]
@@ -0,0 +1,58 @@
+from django.db import migrations
+
+
+# Indexes serving case-insensitive prefix matches of the names of a user
+# and, on PostgreSQL, trigram similarity matches
+AUTOCOMPLETE_SQL = {
+    'postgresql': {
+        'install': [
+            'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+            'CREATE INDEX core_tag_user_upper_name_idx '
+            'ON core_tag (user_id, UPPER(name::text) text_pattern_ops)',
+            'CREATE INDEX core_ingredient_user_upper_name_idx '
+            'ON core_ingredient (user_id, UPPER(name::text) text_pattern_ops)',
+            'CREATE INDEX core_tag_name_trgm_idx ON core_tag USING gin (name gin_trgm_ops)',
+            'CREATE INDEX core_ingredient_name_trgm_idx '
+            'ON core_ingredient USING gin (name gin_trgm_ops)',
+        ],
+        'uninstall': [
+            'DROP INDEX core_tag_user_upper_name_idx',
+            'DROP INDEX core_ingredient_user_upper_name_idx',
+            'DROP INDEX core_tag_name_trgm_idx',
+            'DROP INDEX core_ingredient_name_trgm_idx',
+        ],
+    },
+    'sqlite': {
+        # LIKE is case-insensitive on SQLite and uses NOCASE indexes
+        'install': [
+            'CREATE INDEX core_tag_user_nocase_name_idx '
+            'ON core_tag (user_id, name COLLATE NOCASE)',
+            'CREATE INDEX core_ingredient_user_nocase_name_idx '
+            'ON core_ingredient (user_id, name COLLATE NOCASE)',
+        ],
+        'uninstall': [
+            'DROP INDEX core_tag_user_nocase_name_idx',
+            'DROP INDEX core_ingredient_user_nocase_name_idx',
+        ],
+    },
+}
+
+
+def run_autocomplete_sql(step):
+    def run(apps, schema_editor):
+        """Run the autocomplete SQL of the database backend, if it has any"""
+        for statement in AUTOCOMPLETE_SQL.get(schema_editor.connection.vendor, {}).get(step, []):
+            schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_recipe_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_autocomplete_sql('install'), run_autocomplete_sql('uninstall')),
+    ]
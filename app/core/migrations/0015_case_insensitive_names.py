@@ -0,0 +1,63 @@
+from django.db import migrations
+
+
+# The indexes of the names of a user ignoring their case, created for
+# autocompletion by 0012, also enforce their uniqueness
+UNIQUE_NAMES_SQL = {
+    'postgresql': {
+        'install': [
+            'DROP INDEX core_tag_user_upper_name_idx',
+            'CREATE UNIQUE INDEX core_tag_user_upper_name_idx '
+            'ON core_tag (user_id, UPPER(name::text) text_pattern_ops)',
+            'DROP INDEX core_ingredient_user_upper_name_idx',
+            'CREATE UNIQUE INDEX core_ingredient_user_upper_name_idx '
+            'ON core_ingredient (user_id, UPPER(name::text) text_pattern_ops)',
+        ],
+        'uninstall': [
+            'DROP INDEX core_tag_user_upper_name_idx',
+            'CREATE INDEX core_tag_user_upper_name_idx '
+            'ON core_tag (user_id, UPPER(name::text) text_pattern_ops)',
+            'DROP INDEX core_ingredient_user_upper_name_idx',
+            'CREATE INDEX core_ingredient_user_upper_name_idx '
+            'ON core_ingredient (user_id, UPPER(name::text) text_pattern_ops)',
+        ],
+    },
+    'sqlite': {
+        'install': [
+            'DROP INDEX core_tag_user_nocase_name_idx',
+            'CREATE UNIQUE INDEX core_tag_user_nocase_name_idx '
+            'ON core_tag (user_id, name COLLATE NOCASE)',
+            'DROP INDEX core_ingredient_user_nocase_name_idx',
+            'CREATE UNIQUE INDEX core_ingredient_user_nocase_name_idx '
+            'ON core_ingredient (user_id, name COLLATE NOCASE)',
+        ],
+        'uninstall': [
+            'DROP INDEX core_tag_user_nocase_name_idx',
+            'CREATE INDEX core_tag_user_nocase_name_idx '
+            'ON core_tag (user_id, name COLLATE NOCASE)',
+            'DROP INDEX core_ingredient_user_nocase_name_idx',
+            'CREATE INDEX core_ingredient_user_nocase_name_idx '
+            'ON core_ingredient (user_id, name COLLATE NOCASE)',
+        ],
+    },
+}
+
+
+def run_unique_names_sql(step):
+    def run(apps, schema_editor):
+        """Run the unique names SQL of the database backend, if it has any"""
+        for statement in UNIQUE_NAMES_SQL.get(schema_editor.connection.vendor, {}).get(step, []):
+            schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_merge_case_insensitive_names'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_unique_names_sql('install'), run_unique_names_sql('uninstall')),
+    ]
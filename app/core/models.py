@@ -18,6 +18,14 @@ def recipe_image_file_path(instance, filename):
     return os.path.join('uploads/recipe/', new_filename)
 
 
+def recipe_rendition_file_path(instance, filename):
+    """Generate file path for new recipe image rendition"""
+    image_extension = filename.split('.')[-1]
+    new_filename = f'{uuid.uuid4()}.{image_extension}'
+
+    return os.path.join('uploads/recipe/renditions/', new_filename)
+
+
 class UserManager(BaseUserManager):
     """Default manager for User model"""
 
@@ -64,6 +72,14 @@ class Tag(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     name = models.CharField(max_length=255)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                    fields=['user', 'name'],
+                    name='core_tag_unique_user_name'
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -73,6 +89,14 @@ class Ingredient(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     name = models.CharField(max_length=255)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='core_ingredient_unique_user_name'
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -88,5 +112,77 @@ class Recipe(models.Model):
     link = models.CharField(max_length=255, blank=True)
     image = models.ImageField(null=True, upload_to=recipe_image_file_path)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                    fields=['user', 'id'],
+                    name='core_recipe_user_id_idx'
+            ),
+        ]
+
     def __str__(self):
         return self.title
+
+
+class RecipeImageRendition(models.Model):
+    """Resized and re-encoded copy of a recipe image"""
+    recipe = models.ForeignKey(
+            'Recipe',
+            on_delete=models.CASCADE,
+            related_name='renditions'
+    )
+    name = models.CharField(max_length=32)
+    image = models.ImageField(
+            upload_to=recipe_rendition_file_path,
+            width_field='width',
+            height_field='height'
+    )
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'name'],
+                name='core_recipeimagerendition_unique_recipe_name'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe_id} {self.name}'
+
+
+class DataVersion(models.Model):
+    """Counters bumped on every change to the recipe data of a user"""
+    user = models.OneToOneField(
+            settings.AUTH_USER_MODEL,
+            on_delete=models.CASCADE,
+            primary_key=True,
+            related_name='data_version'
+    )
+    recipes = models.PositiveIntegerField(default=0)
+    tags = models.PositiveIntegerField(default=0)
+    ingredients = models.PositiveIntegerField(default=0)
+
+
+class RecipeImport(models.Model):
+    """Progress of the import of a recipe dump, to resume it if interrupted"""
+    user = models.ForeignKey(
+            settings.AUTH_USER_MODEL,
+            on_delete=models.CASCADE
+    )
+    source = models.CharField(max_length=255)
+    records_read = models.BigIntegerField(default=0)
+    recipes_created = models.BigIntegerField(default=0)
+    finished = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'source'],
+                name='core_recipeimport_unique_user_source'
+            ),
+        ]
+
+    def __str__(self):
+        return self.source
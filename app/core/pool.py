@@ -0,0 +1,235 @@
+import os
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .metrics import registry
+
+
+CHECKOUT_DURATION = registry.histogram(
+        'db_pool_checkout_seconds',
+        'Time waited for a pooled database connection by alias.',
+        ['alias'],
+        buckets=[0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5]
+)
+CHECKOUT_TIMEOUTS = registry.counter(
+        'db_pool_checkout_timeouts_total',
+        'Checkouts failing after waiting TIMEOUT seconds by alias.',
+        ['alias']
+)
+CONNECTIONS = registry.gauge(
+        'db_pool_connections',
+        'Open pooled database connections by alias and state.',
+        ['alias', 'state']
+)
+CONNECTIONS_OPENED = registry.counter(
+        'db_pool_connections_opened_total',
+        'Database connections opened by the pools by alias.',
+        ['alias']
+)
+CONNECTIONS_CLOSED = registry.counter(
+        'db_pool_connections_closed_total',
+        'Pooled database connections closed by alias and reason.',
+        ['alias', 'reason']
+)
+
+Entry = namedtuple('Entry', ['connection', 'created_at', 'released_at'])
+
+
+class PoolTimeout(Exception):
+    """No connection of a full pool was released in time"""
+
+
+class ConnectionPool:
+    """
+    Database connections shared by the threads of a process. At most
+    `max_size` connections are open, checkouts wait up to `timeout` seconds
+    for one to be released. Connections older than `max_lifetime` or idle
+    for longer than `max_idle` seconds are closed, and idle ones failing
+    `is_usable` are replaced on checkout.
+    """
+
+    def __init__(self, alias, max_size, timeout, max_lifetime, max_idle):
+        self.alias = alias
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.size = 0
+        # Most recently released last, so the others are left to go idle
+        self._idle = []
+        self._in_use = {}
+        self._condition = threading.Condition()
+
+    def checkout(self, connect, is_usable=None, check_idle=0):
+        """
+        Return an idle connection, or a new one from `connect()` below
+        `max_size`, otherwise wait for one to be released. Only connections
+        idle for at least `check_idle` seconds are checked with `is_usable`.
+        """
+        start = time.monotonic()
+        while True:
+            entry, expired = self._take(start + self.timeout)
+            self._close(expired)
+            if entry is None or is_usable is None \
+                    or time.monotonic() - entry.released_at < check_idle \
+                    or is_usable(entry.connection):
+                break
+            with self._condition:
+                self.size -= 1
+                self._condition.notify()
+            self._close([(entry, 'unusable')])
+
+        if entry is None:
+            try:
+                entry = Entry(connect(), time.monotonic(), None)
+            except BaseException:
+                with self._condition:
+                    self.size -= 1
+                    self._condition.notify()
+                raise
+            CONNECTIONS_OPENED.inc(alias=self.alias)
+        else:
+            CONNECTIONS.dec(alias=self.alias, state='idle')
+        CONNECTIONS.inc(alias=self.alias, state='in_use')
+        CHECKOUT_DURATION.observe(time.monotonic() - start, alias=self.alias)
+
+        with self._condition:
+            self._in_use[id(entry.connection)] = entry
+
+        return entry.connection
+
+    def _take(self, deadline):
+        """
+        Return an idle entry, or None after reserving room for a new
+        connection, and the expired idle entries to close
+        """
+        with self._condition:
+            while True:
+                expired = self._expire()
+                if self._idle:
+                    return self._idle.pop(), expired
+                if self.size < self.max_size:
+                    self.size += 1
+                    return None, expired
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    CHECKOUT_TIMEOUTS.inc(alias=self.alias)
+                    raise PoolTimeout(
+                            f'No {self.alias} database connection was '
+                            f'released within {self.timeout} seconds, '
+                            f'{self.max_size} are in use'
+                    )
+                self._condition.wait(remaining)
+
+    def _expire(self):
+        """
+        Remove the idle entries over their lifetime or idle time and
+        return them
+        """
+        now = time.monotonic()
+        expired = []
+        for entry in list(self._idle):
+            if now - entry.created_at >= self.max_lifetime:
+                expired.append((entry, 'lifetime'))
+            elif now - entry.released_at >= self.max_idle:
+                expired.append((entry, 'idle'))
+            else:
+                continue
+            self._idle.remove(entry)
+        self.size -= len(expired)
+        if expired:
+            self._condition.notify(len(expired))
+
+        return expired
+
+    def checkin(self, connection, reusable=True):
+        """Release a checked out connection, closing it unless reusable"""
+        now = time.monotonic()
+        with self._condition:
+            entry = self._in_use.pop(id(connection))
+            if not reusable:
+                reason = 'unusable'
+            elif now - entry.created_at >= self.max_lifetime:
+                reason = 'lifetime'
+            else:
+                reason = None
+                self._idle.append(entry._replace(released_at=now))
+            if reason is not None:
+                self.size -= 1
+            self._condition.notify()
+
+        CONNECTIONS.dec(alias=self.alias, state='in_use')
+        if reason is None:
+            CONNECTIONS.inc(alias=self.alias, state='idle')
+        else:
+            self._close([(entry, reason)], idle=False)
+
+    def close_idle(self):
+        """Close every idle connection, e.g. before dropping the database"""
+        with self._condition:
+            idle, self._idle = self._idle, []
+            self.size -= len(idle)
+            self._condition.notify(len(idle))
+        self._close([(entry, 'closed') for entry in idle])
+
+    def _close(self, entries, idle=True):
+        for entry, reason in entries:
+            if idle:
+                CONNECTIONS.dec(alias=self.alias, state='idle')
+            CONNECTIONS_CLOSED.inc(alias=self.alias, reason=reason)
+            try:
+                entry.connection.close()
+            except Exception:
+                pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+_pools_pid = None
+
+
+def get_pool(alias, key):
+    """
+    Return the pool of this process for the connections of a database
+    alias with the connection parameters identified by key
+    """
+    global _pools_pid
+    with _pools_lock:
+        # Connections must not be shared with forked processes
+        if _pools_pid != os.getpid():
+            _pools.clear()
+            _pools_pid = os.getpid()
+        pool = _pools.get((alias, key))
+        if pool is None:
+            options = settings.DATABASE_POOL
+            pool = _pools[alias, key] = ConnectionPool(
+                    alias,
+                    max_size=options['MAX_SIZE'],
+                    timeout=options['TIMEOUT'],
+                    max_lifetime=options['MAX_LIFETIME'],
+                    max_idle=options['MAX_IDLE'],
+            )
+
+    return pool
+
+
+def close_pools():
+    """Close the idle connections of every pool of this process"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close_idle()
+
+
+@receiver(setting_changed)
+def reset_pools(setting, **kwargs):
+    """Close the pools when their settings change"""
+    if setting == 'DATABASE_POOL':
+        close_pools()
+        with _pools_lock:
+            _pools.clear()
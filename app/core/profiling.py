@@ -0,0 +1,172 @@
+import cProfile
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from rest_framework.exceptions import APIException
+
+from .authentication import CachedTokenAuthentication
+
+
+logger = logging.getLogger(__name__)
+
+# Profile one request at a time per process, profilers cannot be nested
+_profiling = threading.Lock()
+
+
+class CProfiler(cProfile.Profile):
+    """Deterministic profiler, saved in the pstats format"""
+    extension = 'prof'
+
+    def dump(self, path):
+        self.dump_stats(path)
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of the profiled thread every `SAMPLE_INTERVAL` seconds
+    from a background thread. Saved as folded stacks, `outer;...;inner
+    count` lines read by flamegraph.pl or speedscope.
+    """
+    extension = 'folded'
+
+    def __init__(self):
+        self.interval = settings.REQUEST_PROFILING['SAMPLE_INTERVAL']
+        self.stacks = Counter()
+        self._thread_id = None
+        self._sampler = None
+        self._stopped = threading.Event()
+
+    def enable(self):
+        self._thread_id = threading.get_ident()
+        self._sampler = threading.Thread(
+                target=self._sample,
+                name='request-profiler',
+                daemon=True
+        )
+        self._sampler.start()
+
+    def disable(self):
+        self._stopped.set()
+        self._sampler.join()
+
+    def _sample(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is not None:
+                self.stacks[folded_stack(frame)] += 1
+
+    def dump(self, path):
+        with open(path, 'w') as output:
+            for stack, count in self.stacks.most_common():
+                output.write(f'{stack} {count}\n')
+
+
+PROFILERS = {
+    'cprofile': CProfiler,
+    'sample': SamplingProfiler,
+}
+
+
+def folded_stack(frame):
+    """
+    Return the stack of a frame as `module:function:line` names, outermost
+    first
+    """
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        module = frame.f_globals.get('__name__', '?')
+        names.append(f'{module}:{code.co_name}:{code.co_firstlineno}')
+        frame = frame.f_back
+
+    return ';'.join(reversed(names))
+
+
+def requested_profiler(request):
+    """
+    Return the profiler asked for by the trigger header or query
+    parameter, or None
+    """
+    options = settings.REQUEST_PROFILING
+    header = 'HTTP_' + options['HEADER'].upper().replace('-', '_')
+    value = request.META.get(header) or request.GET.get(options['QUERY_PARAM'])
+    if not value:
+        return None
+
+    return value if value in PROFILERS else options['PROFILER']
+
+
+def is_staff(request):
+    """Return whether the session or token user of a request is staff"""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_staff:
+        return True
+    try:
+        authenticated = CachedTokenAuthentication().authenticate(request)
+    except APIException:
+        return False
+
+    return authenticated is not None and authenticated[0].is_staff
+
+
+class RequestProfilingMiddleware:
+    """
+    Profiles the requests of staff users sending the `REQUEST_PROFILING`
+    HEADER, or QUERY_PARAM, set to a profiler name or any other value for
+    the default PROFILER. The profile is saved in DIRECTORY and its ID is
+    returned in an `X-Profile-Id` header. Streamed response bodies are not
+    profiled. Removed from the middleware chain unless ENABLED.
+    """
+
+    def __init__(self, get_response):
+        options = settings.REQUEST_PROFILING
+        if not options['ENABLED']:
+            raise MiddlewareNotUsed
+        os.makedirs(options['DIRECTORY'], exist_ok=True)
+        self.get_response = get_response
+
+    def __call__(self, request):
+        kind = requested_profiler(request)
+        if kind is None or not is_staff(request):
+            return self.get_response(request)
+        if not _profiling.acquire(blocking=False):
+            logger.info(
+                    "Not profiling %s, another request is being profiled",
+                    request.path
+            )
+            return self.get_response(request)
+
+        try:
+            profiler = PROFILERS[kind]()
+            start = time.perf_counter()
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+            duration_ms = (time.perf_counter() - start) * 1000
+        finally:
+            _profiling.release()
+
+        profile_id = uuid.uuid4().hex
+        path = os.path.join(
+                settings.REQUEST_PROFILING['DIRECTORY'],
+                f'{profile_id}.{profiler.extension}'
+        )
+        profiler.dump(path)
+        logger.info(
+                'profile_id=%s profiler=%s method=%s path=%s status=%s '
+                'duration_ms=%.2f file=%s',
+                profile_id, kind, request.method, request.path,
+                response.status_code, duration_ms, path
+        )
+        response['X-Profile-Id'] = profile_id
+
+        return response
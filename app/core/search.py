@@ -0,0 +1,81 @@
+from django.db import connection
+from django.db.models import FloatField, IntegerField, Q, Value
+from django.db.models.expressions import RawSQL
+
+
+# Per backend SQL matching recipe ids and ranking a recipe, both taking
+# the search query as their only parameter. The structures they read are
+# created by the `0011_recipe_search` migration.
+SEARCH_SQL = {
+    'postgresql': {
+        'match': (
+            'SELECT id FROM core_recipe '
+            "WHERE search_vector @@ plainto_tsquery('pg_catalog.english', %s)"
+        ),
+        'rank': (
+            'ts_rank(core_recipe.search_vector, '
+            "plainto_tsquery('pg_catalog.english', %s))::float8"
+        ),
+    },
+    'sqlite': {
+        'match': (
+            'SELECT rowid FROM core_recipe_search '
+            'WHERE core_recipe_search MATCH %s'
+        ),
+        # bm25() is lower for better matches
+        'rank': (
+            'SELECT -bm25(core_recipe_search) FROM core_recipe_search '
+            'WHERE core_recipe_search MATCH %s AND rowid = core_recipe.id'
+        ),
+    },
+}
+
+
+class RawSubquery(RawSQL):
+    """
+    Raw SQL subquery for the right hand side of `__in` lookups, which
+    parenthesize it themselves: parenthesized twice, the databases would
+    read it as a scalar subquery
+    """
+
+    def as_sql(self, compiler, connection):
+        return self.sql, self.params
+
+
+def search_terms(query):
+    """Split a search query into its words"""
+    return query.split()
+
+
+def fts5_query(terms):
+    """Quote every term so that FTS5 reads none of them as an operator"""
+    return ' '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+
+
+def search_recipes(queryset, query):
+    """
+    Filter recipes to the ones matching every word of a search query and
+    annotate them with a `search_rank`, higher for better matches
+    """
+    terms = search_terms(query)
+    if not terms:
+        return queryset.none()
+
+    sql = SEARCH_SQL.get(connection.vendor)
+    if sql is None:
+        # No full-text index on this backend, scan the titles
+        condition = Q()
+        for term in terms:
+            condition &= Q(title__icontains=term)
+        return queryset.filter(condition).annotate(
+                search_rank=Value(0.0, output_field=FloatField())
+        )
+
+    if connection.vendor == 'sqlite':
+        param = fts5_query(terms)
+    else:
+        param = ' '.join(terms)
+    matches = RawSubquery(sql['match'], [param], output_field=IntegerField())
+    return queryset.filter(id__in=matches).annotate(
+            search_rank=RawSQL(sql['rank'], [param], output_field=FloatField())
+    )
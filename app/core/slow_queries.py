@@ -0,0 +1,187 @@
+import hashlib
+import logging
+import os
+import re
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import DatabaseError, transaction
+from django.dispatch import receiver
+
+from .metrics import registry
+
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERIES = registry.counter(
+        'db_slow_queries_total',
+        'Queries slower than SLOW_QUERY_LOG THRESHOLD_MS by database alias.',
+        ['alias']
+)
+
+IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+EXPLAINABLE = ('SELECT', 'WITH')
+
+
+class RateLimiter:
+    """Token bucket allowing a number of events per minute"""
+
+    def __init__(self, per_minute):
+        self.per_minute = per_minute
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+        self.suppressed = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Take a token if one is left, otherwise count a suppressed event"""
+        with self._lock:
+            now = time.monotonic()
+            refill = (now - self.updated) * self.per_minute / 60
+            self.tokens = min(self.per_minute, self.tokens + refill)
+            self.updated = now
+            if self.tokens < 1:
+                self.suppressed += 1
+                return False
+            self.tokens -= 1
+
+            return True
+
+    def take_suppressed(self):
+        """Return and reset the number of suppressed events"""
+        with self._lock:
+            suppressed, self.suppressed = self.suppressed, 0
+
+        return suppressed
+
+
+_limiters = None
+_limiters_lock = threading.Lock()
+_explaining = threading.local()
+
+
+def get_limiters():
+    """Return the `(log, explain)` rate limiters of `SLOW_QUERY_LOG`"""
+    global _limiters
+    if _limiters is None:
+        with _limiters_lock:
+            if _limiters is None:
+                options = settings.SLOW_QUERY_LOG
+                _limiters = (
+                    RateLimiter(options['MAX_PER_MINUTE']),
+                    RateLimiter(options['EXPLAIN_PER_MINUTE']),
+                )
+
+    return _limiters
+
+
+@receiver(setting_changed)
+def reset_limiters(setting, **kwargs):
+    """Rebuild the rate limiters when their settings change"""
+    global _limiters
+    if setting == 'SLOW_QUERY_LOG':
+        _limiters = None
+
+
+def fingerprint(value):
+    return hashlib.md5(value.encode()).hexdigest()[:12]
+
+
+def sql_fingerprint(sql):
+    """
+    Return a fingerprint of a query shared by its variants, e.g. IN lists
+    of any length
+    """
+    return fingerprint(IN_LIST.sub('IN (...)', ' '.join(sql.split())))
+
+
+def app_frames(limit=5):
+    """Return `path:line function` of the innermost frames of project code"""
+    base_dir = settings.BASE_DIR + os.sep
+    frames = []
+    frame = sys._getframe(1)
+    while frame is not None and len(frames) < limit:
+        path = frame.f_code.co_filename
+        if path.startswith(base_dir) and path != __file__ \
+                and 'site-packages' not in path:
+            frames.append(
+                    f'{os.path.relpath(path, base_dir)}:{frame.f_lineno} '
+                    f'{frame.f_code.co_name}'
+            )
+        frame = frame.f_back
+
+    return frames
+
+
+def explain(connection, sql, params):
+    """Return the plan of a query, or None when it cannot be explained"""
+    _explaining.active = True
+    try:
+        # A failed EXPLAIN must not abort the transaction of the caller
+        with transaction.atomic(using=connection.alias, savepoint=True):
+            with connection.cursor() as cursor:
+                prefix = connection.ops.explain_query_prefix()
+                cursor.execute(f'{prefix} {sql}', params)
+                return '\n'.join(
+                        ' '.join(str(column) for column in row)
+                        for row in cursor.fetchall()
+                )
+    except DatabaseError:
+        logger.debug("Could not explain a slow query", exc_info=True)
+        return None
+    finally:
+        _explaining.active = False
+
+
+def log_slow_queries(execute, sql, params, many, context):
+    """
+    `execute_wrapper` logging the queries slower than `SLOW_QUERY_LOG`
+    THRESHOLD_MS with the project code running them, rate limited
+    """
+    start = time.perf_counter()
+    result = execute(sql, params, many, context)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    options = settings.SLOW_QUERY_LOG
+    if not options['THRESHOLD_MS'] or elapsed_ms < options['THRESHOLD_MS'] \
+            or getattr(_explaining, 'active', False):
+        return result
+
+    connection = context['connection']
+    SLOW_QUERIES.inc(alias=connection.alias)
+    log_limiter, explain_limiter = get_limiters()
+    if not log_limiter.allow():
+        return result
+
+    frames = app_frames()
+    fields = {
+        'alias': connection.alias,
+        'elapsed_ms': round(elapsed_ms, 2),
+        'sql_fingerprint': sql_fingerprint(sql),
+        'params_fingerprint': fingerprint(repr(params)),
+        'origin': frames[0] if frames else None,
+        'suppressed': log_limiter.take_suppressed(),
+    }
+    message = ' '.join(f'{name}=%s' for name in fields) + '\n%s'
+    args = [*fields.values(), sql]
+    fields.update(sql=sql, stack=frames)
+
+    explainable = sql.lstrip().upper().startswith(EXPLAINABLE) and not many
+    if options['EXPLAIN'] and explainable and explain_limiter.allow():
+        fields['plan'] = explain(connection, sql, params)
+        if fields['plan']:
+            message += '\n%s'
+            args.append(fields['plan'])
+
+    logger.warning(message, *args, extra={'slow_query': fields})
+
+    return result
+
+
+def install(sender, connection, **kwargs):
+    """Add the slow query log to new database connections"""
+    if log_slow_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(log_slow_queries)
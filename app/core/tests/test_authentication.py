@@ -0,0 +1,193 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from ..authentication import (
+        TOKEN_CACHE_LOOKUPS, LocalTokenCache, SharedTokenCache, get_token_cache
+)
+
+
+ME_URL = reverse('users:me')
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test authenticating requests through the token cache"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+                email='tester@example.com',
+                password='TestPassword',
+                name='Tester'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        get_token_cache().clear()
+
+    def test_cached_token_skips_database(self):
+        """Test only the first request looks the token up"""
+        with self.assertNumQueries(1):
+            self.client.get(ME_URL)
+        with self.assertNumQueries(0):
+            response = self.client.get(ME_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['email'], self.user.email)
+
+    def test_invalid_token_rejected(self):
+        """Test unknown tokens are neither accepted nor cached"""
+        self.client.credentials(HTTP_AUTHORIZATION='Token unknown')
+
+        for _ in range(2):
+            response = self.client.get(ME_URL)
+            self.assertEqual(
+                    response.status_code,
+                    status.HTTP_401_UNAUTHORIZED
+            )
+
+    def test_deleted_token_invalidated(self):
+        """Test a deleted token stops authenticating immediately"""
+        self.client.get(ME_URL)
+        self.token.delete()
+
+        response = self.client.get(ME_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_invalidated(self):
+        """Test a deactivated user stops authenticating immediately"""
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        response = self.client.get(ME_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_profile_update_invalidated(self):
+        """Test a password change through the API refreshes the cached user"""
+        self.client.get(ME_URL)
+        self.client.patch(
+                ME_URL,
+                {'name': 'New Name', 'password': 'New Password'}
+        )
+
+        with self.assertNumQueries(1):
+            response = self.client.get(ME_URL)
+
+        self.assertEqual(response.data['name'], 'New Name')
+
+    def test_hit_rate_recorded(self):
+        """Test the cache records hits and misses, also as metrics"""
+        lookups = TOKEN_CACHE_LOOKUPS.state()
+        token_cache = LocalTokenCache(ttl=60, max_size=10)
+        with patch(
+                'core.authentication.get_token_cache',
+                return_value=token_cache
+        ):
+            for _ in range(4):
+                self.client.get(ME_URL)
+
+        stats = token_cache.stats()
+
+        self.assertEqual(stats['hits'], 3)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hit_rate'], 0.75)
+        exported = TOKEN_CACHE_LOOKUPS.state()
+        for result, count in (('hit', 3), ('miss', 1)):
+            exported_count = exported[(result,)] - lookups.get((result,), 0)
+            self.assertEqual(exported_count, count)
+
+    @override_settings(
+        CACHES=LOCMEM_CACHES,
+        TOKEN_AUTH_CACHE={'MAX_SIZE': 10, 'TTL': 60, 'CACHE_ALIAS': 'default'}
+    )
+    def test_shared_cache_backend(self):
+        """Test tokens can be cached in one of the Django caches"""
+        with self.assertNumQueries(1):
+            self.client.get(ME_URL)
+        with self.assertNumQueries(0):
+            self.client.get(ME_URL)
+        self.token.delete()
+
+        response = self.client.get(ME_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class LocalTokenCacheTests(TestCase):
+    """Test the in-process LRU token cache"""
+
+    def setUp(self):
+        self.users = [
+            get_user_model().objects.create_user(
+                    email=f'tester{i}@example.com'
+            )
+            for i in range(3)
+        ]
+
+    def test_least_recently_used_evicted(self):
+        """Test the cache never grows past its maximum size"""
+        token_cache = LocalTokenCache(ttl=60, max_size=2)
+        token_cache.set('a', (self.users[0], None), 0)
+        token_cache.set('b', (self.users[1], None), 0)
+        token_cache.get('a')
+        token_cache.set('c', (self.users[2], None), 0)
+
+        self.assertIsNone(token_cache.get('b'))
+        self.assertEqual(token_cache.get('a')[0], self.users[0])
+        self.assertEqual(token_cache.stats()['evictions'], 1)
+
+    @patch('time.monotonic')
+    def test_expired_entries_dropped(self, monotonic):
+        """Test entries expire after their time to live"""
+        token_cache = LocalTokenCache(ttl=60, max_size=2)
+        monotonic.return_value = 100
+        token_cache.set('a', (self.users[0], None), 0)
+
+        monotonic.return_value = 159
+        self.assertIsNotNone(token_cache.get('a'))
+        monotonic.return_value = 160
+        self.assertIsNone(token_cache.get('a'))
+
+    def test_stale_lookup_not_cached(self):
+        """Test a lookup racing an invalidation does not cache its result"""
+        token_cache = LocalTokenCache(ttl=60, max_size=2)
+        generation = token_cache.generation()
+
+        token_cache.invalidate_user(self.users[0].pk)
+        token_cache.set('a', (self.users[0], None), generation)
+
+        self.assertIsNone(token_cache.get('a'))
+        token_cache.set('a', (self.users[0], None), token_cache.generation())
+        self.assertIsNotNone(token_cache.get('a'))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SharedTokenCacheTests(TestCase):
+    """Test the token cache stored in one of the Django caches"""
+
+    def test_stale_lookup_not_cached(self):
+        """
+        Test an invalidation by any process rejects lookups started before
+        it
+        """
+        user = get_user_model().objects.create_user(email='tester@example.com')
+        token_cache = SharedTokenCache(ttl=60, alias='default')
+        generation = token_cache.generation()
+
+        SharedTokenCache(ttl=60, alias='default').invalidate_user(user.pk)
+        token_cache.set('a', (user, None), generation)
+
+        self.assertIsNone(token_cache.get('a'))
+        token_cache.set('a', (user, None), token_cache.generation())
+        self.assertEqual(token_cache.get('a')[0], user)
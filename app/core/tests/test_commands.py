@@ -1,7 +1,14 @@
+from io import StringIO
 from unittest.mock import patch
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
 from django.db.utils import OperationalError
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase
+
+from core.models import DataVersion, Tag, Recipe
 
 
 class CommandTests(TestCase):
@@ -22,3 +29,140 @@ class CommandTests(TestCase):
             call_command('wait_for_db')
 
             self.assertEqual(gi.call_count, 6)
+
+    def seed(self, *args):
+        """Seed benchmark data and return the recipes per seeded user"""
+        call_command(
+                'seed_benchmark_data', '--users', '4', '--recipes', '200',
+                *args, stdout=StringIO()
+        )
+
+        return [
+            Recipe.objects.filter(user__email=f'seed-{i}@example.com').count()
+            for i in range(4)
+        ]
+
+    def test_seed_benchmark_data(self):
+        """Test seeded libraries are skewed and reproducible"""
+        sizes = self.seed()
+        titles = list(
+                Recipe.objects.order_by('id').values_list('title', flat=True)
+        )
+
+        self.assertEqual(sum(sizes), 200)
+        self.assertEqual(sizes, sorted(sizes, reverse=True))
+        self.assertGreater(sizes[0], 2 * sizes[-1])
+        user = get_user_model().objects.get(email='seed-0@example.com')
+        self.assertTrue(user.check_password('password'))
+        self.assertTrue(
+                Recipe.tags.through.objects.filter(recipe__user=user).exists()
+        )
+
+        with self.assertRaises(CommandError):
+            self.seed()
+        self.assertEqual(self.seed('--replace'), sizes)
+        self.assertEqual(list(
+                Recipe.objects.order_by('id').values_list('title', flat=True)
+        ), titles)
+
+    def test_seed_uniform_benchmark_data(self):
+        """Test seeding without skew spreads recipes evenly"""
+        self.assertEqual(self.seed('--skew', '0'), [50, 50, 50, 50])
+
+
+class MergeDuplicatesTestCase(TransactionTestCase):
+    """
+    Base class of the tests merging duplicate tags and ingredients. The
+    unique indexes of the latest migration forbid duplicates, so the
+    schema is migrated back to `migrate_from` and the duplicates are
+    created with its historical models, whose signals are not connected.
+    """
+    migrate_from = None
+    names = ()
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate([self.migrate_from])
+        self.apps = executor.loader.project_state([self.migrate_from]).apps
+        User = self.apps.get_model('core', 'User')
+        Tag = self.apps.get_model('core', 'Tag')
+        Recipe = self.apps.get_model('core', 'Recipe')
+
+        self.user = User.objects.create(email='tester@example.com')
+        Tag.objects.bulk_create([
+            Tag(user=self.user, name=name) for name in self.names
+        ])
+        self.tag_ids = list(
+                Tag.objects.order_by('id').values_list('id', flat=True)
+        )
+        self.recipes = [
+            Recipe.objects.create(
+                    user=self.user,
+                    title=f'Recipe{i}',
+                    time_minutes=5,
+                    price=5.00
+            )
+            for i in range(2)
+        ]
+        self.recipes[0].tags.add(*self.tag_ids[:2])
+        self.recipes[1].tags.add(self.tag_ids[2])
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def assertMerged(self):
+        """Assert every recipe now uses the oldest tag only"""
+        self.assertEqual(
+                list(Tag.objects.values_list('id', flat=True)),
+                self.tag_ids[:1]
+        )
+        for recipe in self.recipes:
+            tags = Recipe.objects.get(id=recipe.id).tags
+            self.assertEqual(
+                    list(tags.values_list('id', flat=True)),
+                    self.tag_ids[:1]
+            )
+
+
+class MergeDuplicateNamesTests(MergeDuplicatesTestCase):
+    """Test merging tags whose names differ only by case"""
+    migrate_from = ('core', '0013_recipeimport')
+    names = ('Vegan', 'vegan', 'VEGAN')
+
+    def setUp(self):
+        super().setUp()
+        DataVersion = self.apps.get_model('core', 'DataVersion')
+        DataVersion.objects.create(user_id=self.user.id)
+
+    def test_merge_duplicate_names_command(self):
+        """Test the command merges duplicates and bumps the data versions"""
+        call_command('merge_duplicate_names', batch_size=1, stdout=StringIO())
+
+        self.assertMerged()
+        versions = DataVersion.objects.get(user_id=self.user.id)
+        self.assertEqual((versions.tags, versions.recipes), (1, 1))
+
+    def test_case_insensitive_names_migration_merges_duplicates(self):
+        """
+        Test the migration adding the case-insensitive unique indexes
+        merges duplicates first
+        """
+        executor = MigrationExecutor(connection)
+        executor.migrate([('core', '0015_case_insensitive_names')])
+
+        self.assertMerged()
+        self.assertEqual(DataVersion.objects.get(user_id=self.user.id).tags, 1)
+
+
+class UniqueNamesMigrationTests(MergeDuplicatesTestCase):
+    """Test the migration adding unique names"""
+    migrate_from = ('core', '0006_user_indexes')
+    names = ('Vegan', 'Vegan', 'Vegan')
+
+    def test_unique_names_migration_merges_duplicates(self):
+        """Test the migration adding unique names merges duplicates first"""
+        executor = MigrationExecutor(connection)
+        executor.migrate([('core', '0008_unique_user_names')])
+
+        self.assertMerged()
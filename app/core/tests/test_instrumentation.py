@@ -0,0 +1,93 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+ME_URL = reverse('users:me')
+
+INSTRUMENTATION = {'SAMPLE_RATE': 1.0, 'SERVER_TIMING': True, 'LOG': True}
+SERVER_TIMING = re.compile(
+        r'(?P<name>\w+);dur=(?P<dur>[\d.]+)(?:;desc="(?P<desc>[^"]*)")?'
+)
+
+
+@override_settings(REQUEST_INSTRUMENTATION=INSTRUMENTATION)
+class RequestInstrumentationTests(TestCase):
+    """Test the per-request query and timing instrumentation"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+                'tester@example.com',
+                'TestPassword'
+        )
+        self.client.force_authenticate(self.user)
+        Recipe.objects.create(
+                user=self.user,
+                title='Soup',
+                time_minutes=5,
+                price=5
+        )
+
+    def server_timing(self, response):
+        """
+        Return the `{name: (duration, description)}` of a Server-Timing
+        header
+        """
+        return {
+            match.group('name'): (
+                float(match.group('dur')), match.group('desc')
+            )
+            for match in SERVER_TIMING.finditer(response['Server-Timing'])
+        }
+
+    def test_server_timing(self):
+        """Test the Server-Timing header counts the queries of the request"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(RECIPES_URL)
+
+        timings = self.server_timing(response)
+        self.assertEqual(
+                set(timings),
+                {'db', 'view', 'serialize', 'render', 'total'}
+        )
+        self.assertEqual(timings['db'][1], f'{len(queries)} queries')
+        self.assertLessEqual(timings['db'][0], timings['total'][0])
+        self.assertLessEqual(timings['render'][0], timings['total'][0])
+        self.assertGreater(timings['serialize'][0], 0)
+        self.assertLessEqual(timings['serialize'][0], timings['view'][0])
+
+    def test_request_log(self):
+        """Test one line is logged per request with its view and action"""
+        with self.assertLogs('core.instrumentation', level='INFO') as logs:
+            self.client.get(RECIPES_URL)
+            self.client.patch(ME_URL, {'name': 'New name'})
+
+        recipes, me = [record.request_metrics for record in logs.records]
+        self.assertEqual(
+                (recipes['view'], recipes['action'], recipes['status']),
+                ('RecipeViewSet', 'list', 200)
+        )
+        self.assertEqual(
+                (me['view'], me['action']),
+                ('ManageUserView', 'patch')
+        )
+        self.assertIn('action=list', logs.output[0])
+
+    @override_settings(
+        REQUEST_INSTRUMENTATION=dict(INSTRUMENTATION, SAMPLE_RATE=0)
+    )
+    def test_sampling_disabled(self):
+        """Test requests are not instrumented without sampling"""
+        response = self.client.get(RECIPES_URL)
+
+        self.assertFalse(response.has_header('Server-Timing'))
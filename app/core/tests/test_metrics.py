@@ -0,0 +1,153 @@
+import json
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.metrics import Registry
+
+
+METRICS_URL = reverse('metrics')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+METRICS = {
+    'ENABLED': True,
+    'MULTIPROCESS_DIR': None,
+    'FLUSH_INTERVAL': 1.0,
+    'ALLOWED_NETWORKS': ['127.0.0.0/8'],
+}
+
+
+def sample_value(exposition, sample):
+    """Return the value of a sample line of an exposition, or None"""
+    for line in exposition.splitlines():
+        if line.startswith(sample + ' '):
+            return float(line.split(' ')[-1])
+
+    return None
+
+
+def sample_increase(before, after, sample):
+    """Return how much a sample grew from one exposition to the next"""
+    return sample_value(after, sample) - (sample_value(before, sample) or 0)
+
+
+@override_settings(METRICS=METRICS)
+class MetricsEndpointTests(TestCase):
+    """Test recording request metrics and exposing them to Prometheus"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+                'tester@example.com',
+                'TestPassword'
+        )
+        self.client.force_authenticate(self.user)
+
+    def scrape(self):
+        response = self.client.get(METRICS_URL)
+        self.assertEqual(response.status_code, 200)
+        content_type = response['Content-Type']
+        self.assertTrue(content_type.startswith('text/plain; version=0.0.4'))
+
+        return response.content.decode()
+
+    def test_requests_recorded_per_route(self):
+        """Test requests are counted and timed by route, method and status"""
+        before = self.scrape()
+        labels = 'route="recipe:recipe-list",method="GET"'
+        for _ in range(2):
+            self.client.get(RECIPES_URL)
+        self.client.get(RECIPES_URL, {'tags': 'x'})
+
+        exposition = self.scrape()
+        for status, count in (('200', 2), ('400', 1)):
+            sample = f'http_requests_total{{{labels},status="{status}"}}'
+            self.assertEqual(
+                    sample_increase(before, exposition, sample),
+                    count
+            )
+        count = f'http_request_duration_seconds_count{{{labels}}}'
+        bucket = f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}}'
+        self.assertEqual(sample_increase(before, exposition, count), 3)
+        self.assertEqual(
+                sample_value(exposition, bucket),
+                sample_value(exposition, count)
+        )
+        self.assertIn('# TYPE http_request_queries histogram', exposition)
+
+    def test_unknown_methods_grouped(self):
+        """Test requests of unknown methods share the `other` method label"""
+        self.client.generic('PROPFIND', RECIPES_URL)
+
+        exposition = self.scrape()
+        self.assertNotIn('PROPFIND', exposition)
+        self.assertIsNotNone(sample_value(
+                exposition,
+                'http_requests_total{route="recipe:recipe-list",'
+                'method="other",status="405"}'
+        ))
+
+    @override_settings(METRICS=dict(METRICS, ALLOWED_NETWORKS=['10.0.0.0/8']))
+    def test_metrics_internal_only(self):
+        """Test clients outside of the allowed networks cannot scrape"""
+        response = self.client.get(METRICS_URL)
+
+        self.assertEqual(response.status_code, 404)
+
+
+class RegistryTests(SimpleTestCase):
+    """Test the metrics registry"""
+
+    def test_histogram_buckets(self):
+        """Test histogram buckets are cumulative and include their bound"""
+        registry = Registry()
+        histogram = registry.histogram(
+                'latency_seconds', 'Latency.', buckets=[0.1, 1]
+        )
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(value)
+
+        exposition = registry.render()
+
+        for bound, count in (('0.1', 2), ('1', 3), ('+Inf', 4)):
+            self.assertEqual(sample_value(
+                    exposition, f'latency_seconds_bucket{{le="{bound}"}}'
+            ), count)
+        self.assertEqual(sample_value(exposition, 'latency_seconds_count'), 4)
+        self.assertAlmostEqual(
+                sample_value(exposition, 'latency_seconds_sum'),
+                3.65
+        )
+
+    def test_multiprocess_aggregation(self):
+        """
+        Test the values of other processes are summed, gauges of live ones
+        only
+        """
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+                METRICS=dict(METRICS, MULTIPROCESS_DIR=directory)
+        ):
+            registry = Registry()
+            counter = registry.counter('jobs_total', 'Jobs.', ['kind'])
+            gauge = registry.gauge('busy', 'Busy workers.')
+            counter.inc(kind='a')
+            gauge.set(1)
+            registry.flush()
+            # A live process (the parent of the tests) and an exited one
+            for pid in (os.getppid(), 2 ** 22 + 1):
+                path = os.path.join(directory, f'{pid}.json')
+                with open(path, 'w') as state_file:
+                    json.dump(
+                            {'jobs_total': [[['a'], 2]], 'busy': [[[], 1]]},
+                            state_file
+                    )
+
+            exposition = registry.render()
+
+        self.assertEqual(sample_value(exposition, 'jobs_total{kind="a"}'), 5)
+        self.assertEqual(sample_value(exposition, 'busy'), 2)
@@ -0,0 +1,117 @@
+import sqlite3
+import threading
+
+from django.test import SimpleTestCase
+
+from core.pool import (
+        CHECKOUT_DURATION, CONNECTIONS, ConnectionPool, PoolTimeout
+)
+
+
+def connect():
+    return sqlite3.connect(':memory:', check_same_thread=False)
+
+
+def is_closed(connection):
+    try:
+        connection.execute('SELECT 1')
+    except sqlite3.ProgrammingError:
+        return True
+
+    return False
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Test sharing database connections between threads"""
+
+    def create_pool(self, alias, **options):
+        options = {
+            'max_size': 2,
+            'timeout': 1,
+            'max_lifetime': 60,
+            'max_idle': 60,
+            **options,
+        }
+
+        return ConnectionPool(alias, **options)
+
+    def test_connections_reused(self):
+        """Test released connections are checked out again"""
+        pool = self.create_pool('reuse')
+
+        first = pool.checkout(connect)
+        pool.checkin(first)
+        second = pool.checkout(connect)
+
+        self.assertIs(first, second)
+        self.assertEqual(pool.size, 1)
+        self.assertEqual(CONNECTIONS.state()[('reuse', 'in_use')], 1)
+        # Counts per bucket, then the sum of the durations
+        self.assertEqual(sum(CHECKOUT_DURATION.state()[('reuse',)][:-1]), 2)
+
+    def test_size_limited(self):
+        """Test checkouts of a full pool wait for a release, then time out"""
+        pool = self.create_pool('limit', max_size=1, timeout=0.05)
+        connection = pool.checkout(connect)
+
+        with self.assertRaises(PoolTimeout):
+            pool.checkout(connect)
+
+        release = threading.Timer(0.01, pool.checkin, [connection])
+        release.start()
+        pool.timeout = 5
+        self.assertIs(pool.checkout(connect), connection)
+        release.join()
+
+    def test_unusable_connections_replaced(self):
+        """Test idle connections failing the liveness check are replaced"""
+        pool = self.create_pool('unusable')
+        first = pool.checkout(connect)
+        pool.checkin(first)
+
+        second = pool.checkout(connect, is_usable=lambda connection: False)
+
+        self.assertIsNot(first, second)
+        self.assertTrue(is_closed(first))
+        self.assertEqual(pool.size, 1)
+
+    def test_recently_used_not_checked(self):
+        """Test only connections idle for long enough are checked"""
+        pool = self.create_pool('recent')
+        checked = []
+
+        def is_usable(connection):
+            checked.append(connection)
+            return True
+
+        first = pool.checkout(connect)
+        pool.checkin(first)
+        self.assertIs(pool.checkout(connect, is_usable, check_idle=60), first)
+        pool.checkin(first)
+        self.assertIs(pool.checkout(connect, is_usable, check_idle=0), first)
+
+        self.assertEqual(checked, [first])
+
+    def test_connections_recycled(self):
+        """Test connections are closed past their lifetime or idle time"""
+        pool = self.create_pool('recycle', max_idle=0)
+        idle = pool.checkout(connect)
+        pool.checkin(idle)
+        pool.checkout(connect)
+        self.assertTrue(is_closed(idle))
+
+        pool = self.create_pool('recycle', max_lifetime=0)
+        old = pool.checkout(connect)
+        pool.checkin(old)
+        self.assertTrue(is_closed(old))
+        self.assertEqual(pool.size, 0)
+
+    def test_unusable_checkin_closed(self):
+        """Test connections released as not reusable are closed"""
+        pool = self.create_pool('broken')
+        connection = pool.checkout(connect)
+
+        pool.checkin(connection, reusable=False)
+
+        self.assertTrue(is_closed(connection))
+        self.assertIsNot(pool.checkout(connect), connection)
@@ -0,0 +1,121 @@
+import os
+import pstats
+import shutil
+import tempfile
+import time
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from core.profiling import SamplingProfiler
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def busy_loop(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class RequestProfilingTests(TestCase):
+    """Test profiling the requests of staff users"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.override(ENABLED=True)
+
+        self.user = get_user_model().objects.create_user(
+                'tester@example.com',
+                'TestPassword',
+                is_staff=True
+        )
+        Recipe.objects.create(
+                user=self.user,
+                title='Soup',
+                time_minutes=5,
+                price=5
+        )
+        token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def override(self, **options):
+        settings_override = override_settings(REQUEST_PROFILING={
+            'ENABLED': False,
+            'DIRECTORY': self.directory,
+            'PROFILER': 'cprofile',
+            'SAMPLE_INTERVAL': 0.0005,
+            'HEADER': 'X-Profile',
+            'QUERY_PARAM': 'profile',
+            **options,
+        })
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_cprofile(self):
+        """Test requests sending the header are profiled with cProfile"""
+        response = self.client.get(RECIPES_URL, HTTP_X_PROFILE='1')
+
+        self.assertEqual(response.status_code, 200)
+        path = os.path.join(self.directory, f'{response["X-Profile-Id"]}.prof')
+        stats = pstats.Stats(path)
+        self.assertIn('list', {function for _, _, function in stats.stats})
+
+    def test_sampling_profiler(self):
+        """Test the sampling profiler is picked by the query parameter"""
+        response = self.client.get(RECIPES_URL, {'profile': 'sample'})
+
+        self.assertEqual(response.status_code, 200)
+        path = os.path.join(
+                self.directory,
+                f'{response["X-Profile-Id"]}.folded'
+        )
+        self.assertTrue(os.path.exists(path))
+
+    def test_staff_only(self):
+        """Test the requests of other users are not profiled"""
+        self.user.is_staff = False
+        self.user.save()
+
+        response = self.client.get(RECIPES_URL, HTTP_X_PROFILE='1')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('X-Profile-Id'))
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_disabled(self):
+        """Test nothing is profiled when profiling is disabled"""
+        self.override(ENABLED=False)
+
+        response = self.client.get(RECIPES_URL, HTTP_X_PROFILE='1')
+
+        self.assertFalse(response.has_header('X-Profile-Id'))
+        self.assertEqual(os.listdir(self.directory), [])
+
+
+@override_settings(REQUEST_PROFILING={'SAMPLE_INTERVAL': 0.001})
+class SamplingProfilerTests(TestCase):
+    """Test the sampling profiler"""
+
+    def test_folded_stacks(self):
+        """
+        Test the stacks of the profiled thread are counted outermost first
+        """
+        profiler = SamplingProfiler()
+        profiler.enable()
+        busy_loop(0.1)
+        profiler.disable()
+
+        stack, count = profiler.stacks.most_common(1)[0]
+        line = busy_loop.__code__.co_firstlineno
+        self.assertTrue(stack.endswith(f'{__name__}:busy_loop:{line}'))
+        self.assertIn('test_folded_stacks', stack)
+        self.assertGreater(count, 1)
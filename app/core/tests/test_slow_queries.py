@@ -0,0 +1,107 @@
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from core.slow_queries import explain, sql_fingerprint
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+# Every query is slower than a nanosecond
+SLOW_QUERY_LOG = {
+    'THRESHOLD_MS': 0.000001,
+    'EXPLAIN': False,
+    'MAX_PER_MINUTE': 60,
+    'EXPLAIN_PER_MINUTE': 10,
+}
+
+
+class SlowQueryLogTests(TestCase):
+    """Test logging the queries slower than the threshold"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+                'tester@example.com',
+                'TestPassword'
+        )
+        self.client.force_authenticate(self.user)
+        Recipe.objects.create(
+                user=self.user,
+                title='Soup',
+                time_minutes=5,
+                price=5
+        )
+
+    def test_slow_query_attributed(self):
+        """Test slow queries are logged with the project code running them"""
+        with self.assertLogs('core.slow_queries', level='WARNING') as logs, \
+                override_settings(SLOW_QUERY_LOG=SLOW_QUERY_LOG):
+            self.client.get(RECIPES_URL)
+
+        records = [record.slow_query for record in logs.records]
+        recipes = next(
+                record for record in records if 'core_recipe' in record['sql']
+        )
+        self.assertTrue(recipes['origin'].startswith('recipe/'))
+        self.assertTrue(recipes['stack'])
+        self.assertEqual(
+                recipes['sql_fingerprint'],
+                sql_fingerprint(recipes['sql'])
+        )
+        self.assertNotIn('plan', recipes)
+        self.assertIn('elapsed_ms=', logs.output[0])
+
+    def test_explain_captured(self):
+        """Test the plans of slow SELECT queries are captured"""
+        with self.assertLogs('core.slow_queries', level='WARNING') as logs, \
+                override_settings(
+                    SLOW_QUERY_LOG=dict(SLOW_QUERY_LOG, EXPLAIN=True)
+                ):
+            list(Recipe.objects.filter(user=self.user))
+
+        query, = [record.slow_query for record in logs.records]
+        self.assertTrue(query['plan'])
+        self.assertTrue(
+                query['origin'].startswith('core/tests/test_slow_queries.py')
+        )
+
+    def test_rate_limited(self):
+        """Test slow queries over the rate limit are counted, not logged"""
+        with self.assertLogs('core.slow_queries', level='WARNING') as logs, \
+                override_settings(
+                    SLOW_QUERY_LOG=dict(SLOW_QUERY_LOG, MAX_PER_MINUTE=2)
+                ):
+            for _ in range(5):
+                Recipe.objects.count()
+
+        self.assertEqual(len(logs.records), 2)
+
+    def test_failed_explain_isolated(self):
+        """
+        Test a failing EXPLAIN leaves the transaction of the caller usable
+        """
+        with transaction.atomic():
+            plan = explain(connection, 'SELECT missing FROM core_missing', [])
+            recipes = Recipe.objects.count()
+
+        self.assertIsNone(plan)
+        self.assertEqual(recipes, 1)
+
+    def test_sql_fingerprint(self):
+        """
+        Test queries differing by the length of IN lists share a
+        fingerprint
+        """
+        self.assertEqual(
+                sql_fingerprint('SELECT * FROM t WHERE id IN (%s, %s)'),
+                sql_fingerprint('SELECT *  FROM t\nWHERE id IN (%s)')
+        )
+        self.assertNotEqual(
+                sql_fingerprint('SELECT * FROM t WHERE id IN (%s)'),
+                sql_fingerprint('SELECT * FROM u WHERE id IN (%s)')
+        )
@@ -0,0 +1,121 @@
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import DataVersion
+
+
+VERSION_FIELDS = ('recipes', 'tags', 'ingredients')
+
+# Model name -> version counter bumped when its objects change
+MODEL_VERSIONS = {
+    'recipe': 'recipes',
+    'tag': 'tags',
+    'ingredient': 'ingredients',
+}
+
+_deferred = threading.local()
+
+
+def _cache():
+    """Return the cache shared by the workers for versions, or None"""
+    alias = settings.DATA_VERSION_CACHE.get('CACHE_ALIAS')
+
+    return caches[alias] if alias else None
+
+
+def _cache_key(user_id):
+    return f'data-version:{user_id}'
+
+
+def get_versions(user_id):
+    """Return the data version counters of a user by name"""
+    cache = _cache()
+    if cache is not None:
+        versions = cache.get(_cache_key(user_id))
+        if versions is not None:
+            return versions
+
+    versions = (
+        DataVersion.objects.filter(user_id=user_id)
+        .values(*VERSION_FIELDS).first()
+    )
+    if versions is None:
+        # Users created without signals get their row lazily
+        try:
+            with transaction.atomic():
+                DataVersion.objects.create(user_id=user_id)
+        except IntegrityError:
+            return get_versions(user_id)
+        versions = dict.fromkeys(VERSION_FIELDS, 0)
+
+    if cache is not None:
+        cache.set(
+                _cache_key(user_id),
+                versions,
+                timeout=settings.DATA_VERSION_CACHE['TTL']
+        )
+
+    return versions
+
+
+def bump_versions(user_id, *names):
+    """
+    Bump some data version counters of a user, in the transaction of the
+    change so that the new data and versions become visible together
+    """
+    pending = getattr(_deferred, 'pending', None)
+    if pending is not None:
+        pending.setdefault(user_id, set()).update(names)
+        return
+
+    DataVersion.objects.filter(user_id=user_id).update(**{
+        name: F(name) + 1 for name in names
+    })
+
+    cache = _cache()
+    if cache is not None:
+        key = _cache_key(user_id)
+        cache.delete(key)
+        # Readers may cache the old versions again until the commit
+        transaction.on_commit(lambda: cache.delete(key))
+
+
+@contextmanager
+def deferred_bumps():
+    """
+    Merge the version bumps of the enclosed block into one update per
+    user, made when the block exits without error
+    """
+    if getattr(_deferred, 'pending', None) is not None:
+        yield
+        return
+
+    _deferred.pending = pending = {}
+    try:
+        yield
+    finally:
+        _deferred.pending = None
+
+    for user_id, names in pending.items():
+        bump_versions(user_id, *names)
+
+
+def create_data_version(sender, instance, created, raw=False, **kwargs):
+    """Create the data versions of a new user"""
+    if created and not raw:
+        DataVersion.objects.create(user=instance)
+
+
+def data_changed(sender, instance, **kwargs):
+    """
+    Bump the version of a saved or deleted recipe, tag or ingredient.
+    Recipe relations are changed along with a save of the recipe, no
+    `m2m_changed` receiver is connected as it would disable the fast
+    deletion of the through rows.
+    """
+    bump_versions(instance.user_id, MODEL_VERSIONS[sender._meta.model_name])
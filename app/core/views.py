@@ -0,0 +1,33 @@
+import ipaddress
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.views.decorators.http import require_GET
+
+from .metrics import registry
+
+
+def client_allowed(request):
+    """Return whether the client address is in `METRICS['ALLOWED_NETWORKS']`"""
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+
+    return any(
+        address in ipaddress.ip_network(network, strict=False)
+        for network in settings.METRICS['ALLOWED_NETWORKS']
+    )
+
+
+@require_GET
+def metrics(request):
+    """Expose the metrics of every worker process to Prometheus"""
+    if not client_allowed(request):
+        # The endpoint is internal, do not reveal it
+        raise Http404
+
+    return HttpResponse(
+            registry.render(),
+            content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -0,0 +1,224 @@
+import threading
+from collections import OrderedDict
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.postgres.search import TrigramSimilarity
+from django.core.signals import setting_changed
+from django.db import connection
+from django.db.models.functions import Lower
+from django.dispatch import receiver
+
+from core.versions import get_versions
+
+
+def trigrams(text):
+    """Return the trigrams of the words of a text the way pg_trgm does"""
+    words = ''.join(
+            char if char.isalnum() else ' ' for char in text.lower()
+    ).split()
+    result = set()
+    for word in words:
+        padded = f'  {word} '
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+
+    return result
+
+
+def similarity(query_trigrams, name_trigrams):
+    """Return the share of trigrams two texts have in common"""
+    if not query_trigrams or not name_trigrams:
+        return 0.0
+
+    common = len(query_trigrams & name_trigrams)
+    return common / (len(query_trigrams) + len(name_trigrams) - common)
+
+
+def most_similar(entry_trigrams, query, limit, threshold):
+    """Return the `(id, name)` entries most similar to query, best first"""
+    query_trigrams = trigrams(query)
+    scored = []
+    for entry, name_trigrams in entry_trigrams:
+        score = similarity(query_trigrams, name_trigrams)
+        if score >= threshold:
+            scored.append((-score, sort_key(entry), entry))
+    scored.sort()
+
+    return [entry for score, key, entry in scored[:limit]]
+
+
+def sort_key(entry):
+    """Order `(id, name)` entries by case-insensitive name, then id"""
+    pk, name = entry
+    return name.lower(), pk
+
+
+class NameIndex:
+    """
+    Case-insensitive prefix tree of the `(id, name)` entries of a user,
+    also keeping their trigrams to answer fuzzy queries without the
+    database
+    """
+
+    def __init__(self, entries):
+        entries = sorted(entries, key=sort_key)
+        root = {}
+        for entry in entries:
+            node = root
+            for char in entry[1].lower():
+                node = node.setdefault(char, {})
+            # The empty key sorts first, so shorter names come first
+            node.setdefault('', []).append(entry)
+        self.root = self._freeze(root)
+        self.trigrams = [(entry, trigrams(entry[1])) for entry in entries]
+
+    def _freeze(self, node):
+        """Turn a node into `(entries, sorted [(char, child)])`"""
+        return (
+            node.pop('', []),
+            [
+                (char, self._freeze(child))
+                for char, child in sorted(node.items())
+            ],
+        )
+
+    def _walk(self, node):
+        entries, children = node
+        yield from entries
+        for char, child in children:
+            yield from self._walk(child)
+
+    def complete(self, prefix, limit):
+        """Return the first entries starting with prefix alphabetically"""
+        node = self.root
+        for char in prefix.lower():
+            node = next((child for key, child in node[1] if key == char), None)
+            if node is None:
+                return []
+
+        return list(islice(self._walk(node), limit))
+
+    def fuzzy(self, query, limit, threshold):
+        """Return the entries most similar to query"""
+        return most_similar(self.trigrams, query, limit, threshold)
+
+
+class AutocompleteCache:
+    """
+    Keeps the name indexes of the users autocompleting the most. A user
+    is admitted after `min_requests` requests, the least recently used
+    user is evicted past `max_users` and an index is rebuilt when the
+    data version of its model changes.
+    """
+
+    def __init__(self, max_users, min_requests, max_names):
+        self.max_users = max_users
+        self.min_requests = min_requests
+        self.max_names = max_names
+        self._indexes = OrderedDict()
+        self._requests = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, queryset, user_id, version_name):
+        """
+        Return the name index of the user objects of a queryset, or None
+        while the user is not one of the hottest ones
+        """
+        key = (queryset.model._meta.label, user_id)
+        with self._lock:
+            cached = self._indexes.get(key)
+            if cached is None:
+                requests = self._requests.pop(key, 0) + 1
+                if requests < self.min_requests:
+                    self._requests[key] = requests
+                    while len(self._requests) > self.max_users * 10:
+                        self._requests.popitem(last=False)
+                    return None
+            else:
+                self._indexes.move_to_end(key)
+
+        version = get_versions(user_id)[version_name]
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        entries = list(queryset.values_list('id', 'name')[:self.max_names + 1])
+        # Libraries too large to index keep being queried
+        index = NameIndex(entries) if len(entries) <= self.max_names else None
+        with self._lock:
+            self._indexes[key] = (version, index)
+            self._indexes.move_to_end(key)
+            while len(self._indexes) > self.max_users:
+                self._indexes.popitem(last=False)
+
+        return index
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+            self._requests.clear()
+
+
+_autocomplete_cache = None
+_autocomplete_cache_lock = threading.Lock()
+
+
+def get_autocomplete_cache():
+    """Return the autocomplete cache configured by `AUTOCOMPLETE`"""
+    global _autocomplete_cache
+    if _autocomplete_cache is None:
+        with _autocomplete_cache_lock:
+            if _autocomplete_cache is None:
+                options = settings.AUTOCOMPLETE
+                _autocomplete_cache = AutocompleteCache(
+                        options['CACHE_USERS'],
+                        options['CACHE_MIN_REQUESTS'],
+                        options['CACHE_MAX_NAMES']
+                )
+
+    return _autocomplete_cache
+
+
+@receiver(setting_changed)
+def reset_autocomplete_cache(setting, **kwargs):
+    """Rebuild the autocomplete cache when its settings change"""
+    global _autocomplete_cache
+    if setting == 'AUTOCOMPLETE':
+        _autocomplete_cache = None
+
+
+def autocomplete(queryset, user_id, version_name, query, limit, fuzzy=False):
+    """
+    Return the `(id, name)` pairs of the user objects of a queryset
+    starting with query, or similar to it when fuzzy, best first. Hot
+    users are answered from memory, the others with an indexed query.
+    """
+    threshold = settings.AUTOCOMPLETE['FUZZY_THRESHOLD']
+    index = get_autocomplete_cache().get(queryset, user_id, version_name)
+    if index is not None:
+        if fuzzy:
+            return index.fuzzy(query, limit, threshold)
+        return index.complete(query, limit)
+
+    if not fuzzy:
+        return list(
+            queryset.filter(name__istartswith=query)
+            .order_by(Lower('name'), 'id')
+            .values_list('id', 'name')[:limit]
+        )
+    if connection.vendor == 'postgresql':
+        # `trigram_similar` is the pg_trgm `%` operator served by the
+        # trigram index, it applies `pg_trgm.similarity_threshold` (0.3)
+        # first
+        return list(
+            queryset.filter(name__trigram_similar=query)
+            .annotate(similarity=TrigramSimilarity('name', query))
+            .filter(similarity__gte=threshold)
+            .order_by('-similarity', Lower('name'), 'id')
+            .values_list('id', 'name')[:limit]
+        )
+
+    entries = queryset.values_list('id', 'name').iterator()
+    return most_similar(
+            ((entry, trigrams(entry[1])) for entry in entries),
+            query, limit, threshold
+    )
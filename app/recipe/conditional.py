@@ -0,0 +1,71 @@
+import hashlib
+
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+from core.versions import get_versions
+
+
+class NotModified(APIException):
+    """Raised to answer a conditional request with 304 Not Modified"""
+    status_code = status.HTTP_304_NOT_MODIFIED
+
+
+class ConditionalGetMixin:
+    """
+    Tags list and retrieve responses with an ETag derived from the data
+    versions of the user. `initial` computes the ETag once the request is
+    authenticated and raises `NotModified` when it matches the
+    `If-None-Match` header, answering 304 before the handler queries or
+    serializes anything. `finalize_response` adds the ETag to successful
+    responses.
+    """
+    # Data versions the responses of the view depend on
+    etag_versions = ()
+    conditional_actions = ('list', 'retrieve')
+
+    def get_etag(self, request):
+        """Return the ETag of the current representation of the request"""
+        versions = get_versions(request.user.pk)
+        key = ':'.join([
+            str(request.user.pk),
+            *(str(versions[name]) for name in self.etag_versions),
+            request.get_full_path(),
+            request.accepted_media_type,
+        ])
+
+        return quote_etag(hashlib.md5(key.encode()).hexdigest())
+
+    def initial(self, request, *args, **kwargs):
+        """Answer 304 before the handler runs when the client is up to date"""
+        super().initial(request, *args, **kwargs)
+        self.etag = None
+        if self.action in self.conditional_actions:
+            self.etag = self.get_etag(request)
+            client_etags = [
+                client_etag.replace('W/', '', 1) for client_etag in
+                parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+            ]
+            if self.etag in client_etags:
+                raise NotModified()
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return Response(
+                    status=status.HTTP_304_NOT_MODIFIED,
+                    headers={'ETag': self.etag}
+            )
+
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+                request, response, *args, **kwargs
+        )
+        if getattr(self, 'etag', None) \
+                and response.status_code == status.HTTP_200_OK:
+            response['ETag'] = self.etag
+
+        return response
@@ -0,0 +1,96 @@
+import csv
+import itertools
+import json
+
+from core.models import Recipe
+
+from .serializers import RECIPE_RELATIONS
+
+
+EXPORT_COLUMNS = ('id', 'title', 'time_minutes', 'price', 'link')
+EXPORT_FIELDS = EXPORT_COLUMNS + RECIPE_RELATIONS
+
+
+def chunks(iterable, size):
+    """Yield lists of up to size items of an iterable"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def related_names(recipe_ids, name):
+    """Return `{recipe id: [names]}` of one relation of some recipes"""
+    field = Recipe._meta.get_field(name)
+    rows = field.remote_field.through.objects.filter(**{
+        f'{field.m2m_field_name()}__in': recipe_ids,
+    }).order_by(f'{field.m2m_reverse_field_name()}_id').values_list(
+        f'{field.m2m_field_name()}_id',
+        f'{field.m2m_reverse_field_name()}__name'
+    )
+
+    names = {}
+    for recipe_id, related_name in rows:
+        names.setdefault(recipe_id, []).append(related_name)
+
+    return names
+
+
+def export_records(queryset, chunk_size):
+    """
+    Yield a dict per recipe of a queryset with the names of its tags and
+    ingredients. Recipes are read through a server-side cursor where the
+    database has them and the relations with one query per relation and
+    chunk, so memory use does not grow with the number of recipes.
+    """
+    rows = queryset.values_list(*EXPORT_COLUMNS).iterator(
+            chunk_size=chunk_size
+    )
+    for chunk in chunks(rows, chunk_size):
+        recipe_ids = [row[0] for row in chunk]
+        related = {
+            name: related_names(recipe_ids, name) for name in RECIPE_RELATIONS
+        }
+        for row in chunk:
+            record = dict(zip(EXPORT_COLUMNS, row))
+            record['price'] = '{:f}'.format(record['price'])
+            for name in RECIPE_RELATIONS:
+                record[name] = related[name].get(record['id'], [])
+            yield record
+
+
+def ndjson_lines(records):
+    """Yield one JSON document per line and record"""
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+class Echo:
+    """File-like object returning what is written, for `csv.writer`"""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(records):
+    """
+    Yield a header row then one CSV row per record, tag and ingredient
+    names are JSON arrays so that any name survives a round trip
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for record in records:
+        yield writer.writerow([
+            json.dumps(record[name], ensure_ascii=False)
+            if name in RECIPE_RELATIONS else record[name]
+            for name in EXPORT_FIELDS
+        ])
+
+
+# Export format -> (line generator, content type, file extension)
+EXPORT_FORMATS = {
+    'ndjson': (ndjson_lines, 'application/x-ndjson', 'ndjson'),
+    'csv': (csv_lines, 'text/csv; charset=utf-8', 'csv'),
+}
@@ -0,0 +1,86 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import ValidationError
+
+
+class SparseFieldsetMixin:
+    """
+    Lets clients of list and retrieve actions pick the fields they need
+    with `?fields=a,b` or drop some with `?exclude=c`. The selection is
+    passed to the serializer as `sparse_fields`, views use
+    `sparse_columns()` and `wants_field()` to load no more than needed.
+    """
+    sparse_actions = ('list', 'retrieve')
+
+    def get_sparse_fields(self):
+        """
+        Return the names of the selected serializer fields, or None when
+        every field is
+        """
+        if not hasattr(self, '_sparse_fields'):
+            self._sparse_fields = self._parse_sparse_fields()
+
+        return self._sparse_fields
+
+    def _parse_sparse_fields(self):
+        params = self.request.query_params
+        if self.action not in self.sparse_actions or not (
+                'fields' in params or 'exclude' in params):
+            return None
+
+        available = list(self.get_serializer_class()().fields)
+        selected = set(available)
+        for param in ('fields', 'exclude'):
+            if param not in params:
+                continue
+            names = {
+                name.strip() for name in params[param].split(',')
+                if name.strip()
+            }
+            unknown = names - set(available)
+            if unknown:
+                raise ValidationError({param: [
+                    _(
+                        'Unknown fields: {unknown}. '
+                        'Expected some of {available}.'
+                    ).format(
+                        unknown=', '.join(sorted(unknown)),
+                        available=', '.join(available)
+                    )
+                ]})
+            if param == 'fields':
+                selected = selected & names
+            else:
+                selected = selected - names
+
+        return selected
+
+    def wants_field(self, name):
+        """Return whether the serializer renders a field"""
+        sparse_fields = self.get_sparse_fields()
+
+        return sparse_fields is None or name in sparse_fields
+
+    def sparse_columns(self, queryset, required=()):
+        """
+        Return the model columns of the selected fields plus the required
+        ones, e.g. the ordering, or None when every field is selected
+        """
+        sparse_fields = self.get_sparse_fields()
+        if sparse_fields is None:
+            return None
+
+        model_fields = {
+            field.name for field in queryset.model._meta.concrete_fields
+            if not field.many_to_many
+        }
+        # The primary key always keeps instances (and cursors) usable
+        columns = {queryset.model._meta.pk.name, *required}
+        columns |= sparse_fields & model_fields
+
+        return sorted(columns)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['sparse_fields'] = self.get_sparse_fields()
+
+        return context
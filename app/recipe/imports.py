@@ -0,0 +1,286 @@
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.db import connection
+from django.db.models.functions import Upper
+
+from core.models import Recipe
+from core.versions import bump_versions
+
+from .serializers import (
+    RECIPE_RELATIONS, database_name_keys, filter_names, normalize_name,
+    unique_names,
+)
+
+
+class InvalidRecord(ValueError):
+    """Raised for a record which cannot be imported"""
+
+
+def ndjson_rows(stream):
+    """Yield the non blank lines of an NDJSON stream"""
+    for line in stream:
+        if line.strip():
+            yield line
+
+
+def decode_ndjson(line):
+    """Return the record of an NDJSON line"""
+    try:
+        record = json.loads(line)
+    except ValueError as error:
+        raise InvalidRecord(f'invalid JSON: {error}')
+    if not isinstance(record, dict):
+        raise InvalidRecord('expected a JSON object')
+
+    return record
+
+
+def csv_rows(stream):
+    """Yield the rows of a CSV stream as dicts keyed by its header"""
+    return csv.DictReader(stream)
+
+
+def decode_csv(row):
+    """Return the record of a CSV row, whose relations are JSON arrays"""
+    record = dict(row)
+    for name in RECIPE_RELATIONS:
+        if record.get(name):
+            try:
+                record[name] = json.loads(record[name])
+            except ValueError:
+                raise InvalidRecord(f'{name} must be a JSON array of names')
+
+    return record
+
+
+# Import format -> (row reader, row decoder), exports are valid inputs
+IMPORT_FORMATS = {
+    'ndjson': (ndjson_rows, decode_ndjson),
+    'csv': (csv_rows, decode_csv),
+}
+
+
+def clean_record(record):
+    """Return the validated recipe fields and relation names of a record"""
+    title = record.get('title')
+    if not isinstance(title, str) or not title.strip() or len(title) > 255:
+        raise InvalidRecord(
+                'title must be a non blank string of at most 255 characters'
+        )
+
+    try:
+        time_minutes = int(record.get('time_minutes'))
+    except (TypeError, ValueError):
+        raise InvalidRecord('time_minutes must be an integer')
+
+    try:
+        price = Decimal(str(record.get('price'))).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise InvalidRecord('price must be a decimal number')
+    if not price.is_finite() or abs(price) >= 1000:
+        raise InvalidRecord('price must be lower than 1000')
+
+    link = record.get('link') or ''
+    if not isinstance(link, str) or len(link) > 255:
+        raise InvalidRecord('link must be a string of at most 255 characters')
+
+    cleaned = {
+        'title': title,
+        'time_minutes': time_minutes,
+        'price': price,
+        'link': link,
+    }
+    for name in RECIPE_RELATIONS:
+        related = record.get(name) or []
+        if not isinstance(related, list) \
+                or not all(isinstance(item, str) for item in related):
+            raise InvalidRecord(f'{name} must be a list of names')
+        names = [normalize_name(item) for item in related]
+        if not all(0 < len(item) <= 255 for item in names):
+            raise InvalidRecord(
+                    f'{name} must be non blank names of at most 255 characters'
+            )
+        cleaned[name] = unique_names(names)
+
+    return cleaned
+
+
+class RecipeImporter:
+    """
+    Inserts batches of cleaned records into the recipes of a user. Tag
+    and ingredient names are resolved from an in-memory map of the names
+    of the user, recipes and their relations are inserted with one
+    `COPY` (PostgreSQL) or `bulk_create` per table and batch.
+    """
+    # Names looked up per query, below the SQLite variables limit
+    lookup_size = 500
+
+    def __init__(self, user, use_copy=None):
+        self.user = user
+        if use_copy is None:
+            use_copy = connection.vendor == 'postgresql'
+        self.use_copy = use_copy
+        self.name_ids = {}
+
+    def related_model(self, name):
+        return Recipe._meta.get_field(name).remote_field.model
+
+    def resolve_names(self, name, names):
+        """Return the ids of names of a relation, creating the missing ones"""
+        model = self.related_model(name)
+        # Keyed the way the database compares names, see database_name_keys
+        if name not in self.name_ids:
+            rows = model.objects.filter(user=self.user).annotate(
+                    name_key=Upper('name')
+            ).values_list('name_key', 'id')
+            self.name_ids[name] = dict(rows.iterator())
+        name_ids = self.name_ids[name]
+        keys = database_name_keys(names)
+
+        missing = {}
+        for item, key in keys.items():
+            if key not in name_ids:
+                missing.setdefault(key, item)
+        missing = list(missing.values())
+        if missing:
+            model.objects.bulk_create(
+                    [model(user=self.user, name=item) for item in missing],
+                    ignore_conflicts=True
+            )
+            for start in range(0, len(missing), self.lookup_size):
+                found = filter_names(
+                        model.objects.filter(user=self.user),
+                        missing[start:start + self.lookup_size]
+                ).annotate(name_key=Upper('name'))
+                name_ids.update(found.values_list('name_key', 'id'))
+
+        return [name_ids[keys[item]] for item in names]
+
+    def allocate_ids(self, count):
+        """
+        Return count unused recipe ids reserved from the sequence of the
+        table, or None on backends without one, the caller must be in a
+        transaction
+        """
+        table, column = Recipe._meta.db_table, Recipe._meta.pk.column
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(
+                        'SELECT nextval(pg_get_serial_sequence(%s, %s)) '
+                        'FROM generate_series(1, %s)',
+                        [table, column, count]
+                )
+                return [row[0] for row in cursor.fetchall()]
+            elif connection.vendor == 'sqlite':
+                # AUTOINCREMENT tables never reuse ids up to their sequence
+                cursor.execute(
+                        'SELECT seq FROM sqlite_sequence WHERE name = %s',
+                        [table]
+                )
+                row = cursor.fetchone()
+                last_id = row[0] if row else 0
+                cursor.execute(
+                        'UPDATE sqlite_sequence SET seq = %s WHERE name = %s'
+                        if row else
+                        'INSERT INTO sqlite_sequence (seq, name) '
+                        'VALUES (%s, %s)',
+                        [last_id + count, table]
+                )
+                return list(range(last_id + 1, last_id + 1 + count))
+
+        return None
+
+    def copy_statement(self, model, fields, rows):
+        """
+        Return the PostgreSQL `COPY` statement inserting rows of field
+        values into the table of a model and its CSV input
+        """
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        quote_name = connection.ops.quote_name
+        fields = [model._meta.get_field(field) for field in fields]
+        # Unquoted empty values are NULL in CSV, unless forced not to be
+        not_null = [
+            quote_name(field.column) for field in fields
+            if field.empty_strings_allowed and not field.null
+        ]
+        options = 'FORMAT csv'
+        if not_null:
+            options += ', FORCE_NOT_NULL ({})'.format(', '.join(not_null))
+        sql = 'COPY {} ({}) FROM STDIN WITH ({})'.format(
+                quote_name(model._meta.db_table),
+                ', '.join(quote_name(field.column) for field in fields),
+                options
+        )
+
+        return sql, buffer
+
+    def insert_rows(self, model, fields, rows):
+        """Insert rows of field values into the table of a model"""
+        if self.use_copy:
+            sql, buffer = self.copy_statement(model, fields, rows)
+            with connection.cursor() as cursor:
+                cursor.cursor.copy_expert(sql, buffer)
+        else:
+            model.objects.bulk_create(
+                    [model(**dict(zip(fields, row))) for row in rows]
+            )
+
+    def import_batch(self, records):
+        """
+        Insert a batch of cleaned records and return the number of created
+        recipes, the caller must be in a transaction
+        """
+        if not records:
+            return 0
+
+        related_ids = {
+            name: iter(self.resolve_names(
+                    name,
+                    [item for record in records for item in record[name]]
+            ))
+            for name in RECIPE_RELATIONS
+        }
+        fields = ['title', 'time_minutes', 'price', 'link']
+        recipe_ids = self.allocate_ids(len(records))
+        if recipe_ids is None:
+            # Without a sequence to reserve ids from, save recipes one by one
+            recipe_ids = [
+                Recipe.objects.create(
+                        user=self.user,
+                        **{field: record[field] for field in fields}
+                ).pk
+                for record in records
+            ]
+        else:
+            self.insert_rows(
+                    Recipe,
+                    ['id', 'user_id', *fields],
+                    [
+                        (recipe_id, self.user.pk,
+                         *(record[field] for field in fields))
+                        for recipe_id, record in zip(recipe_ids, records)
+                    ]
+            )
+        for name in RECIPE_RELATIONS:
+            field = Recipe._meta.get_field(name)
+            self.insert_rows(
+                    field.remote_field.through,
+                    [
+                        f'{field.m2m_field_name()}_id',
+                        f'{field.m2m_reverse_field_name()}_id',
+                    ],
+                    [
+                        (recipe_id, next(related_ids[name]))
+                        for recipe_id, record in zip(recipe_ids, records)
+                        for item in record[name]
+                    ]
+            )
+
+        bump_versions(self.user.pk, 'recipes', *RECIPE_RELATIONS)
+
+        return len(records)
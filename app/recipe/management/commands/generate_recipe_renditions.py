@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from core.models import Recipe
+
+from recipe.renditions import generate_renditions
+
+
+class Command(BaseCommand):
+    """Django command to generate missing recipe image renditions"""
+
+    help = "Generate the renditions of recipe images missing some of them"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+                '--all', action='store_true',
+                help='Regenerate the renditions of every recipe image'
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='').exclude(image__isnull=True)
+        if not options['all']:
+            recipes = recipes.annotate(
+                    rendition_count=Count('renditions')
+            ).filter(rendition_count__lt=len(settings.RECIPE_IMAGE_RENDITIONS))
+
+        generated = 0
+        for recipe_id in recipes.values_list('id', flat=True).iterator():
+            generated += len(generate_renditions(recipe_id))
+
+        self.stdout.write(
+                self.style.SUCCESS(f"Generated {generated} renditions")
+        )
@@ -0,0 +1,166 @@
+import gzip
+import itertools
+import os
+import sys
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.models import RecipeImport
+
+from recipe.export import chunks
+from recipe.imports import (
+        IMPORT_FORMATS, InvalidRecord, RecipeImporter, clean_record
+)
+
+
+class Command(BaseCommand):
+    """Django command to import a dump of recipes into the library of a user"""
+
+    help = (
+        "Import recipes with their tags and ingredients from an NDJSON or CSV "
+        "dump, e.g. an export of the recipe API, into the library of a user"
+    )
+
+    report_interval = 10
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+                'path',
+                help='Dump to import, optionally gzipped, or - for stdin'
+        )
+        parser.add_argument(
+                '--user', required=True,
+                help='Email of the owner of the recipes'
+        )
+        parser.add_argument(
+                '--format', choices=list(IMPORT_FORMATS),
+                help='Format of the dump, guessed from its extension by '
+                     'default'
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        group = parser.add_mutually_exclusive_group()
+        group.add_argument(
+                '--resume', action='store_true',
+                help='Continue an interrupted import of the same dump'
+        )
+        group.add_argument(
+                '--restart', action='store_true',
+                help='Import the dump again from its first record'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(email=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"Unknown user {options['user']}")
+
+        path = options['path']
+        import_format = options['format'] or self.guess_format(path)
+        source = path if path == '-' else os.path.abspath(path)
+        progress, created = RecipeImport.objects.get_or_create(
+                user=user,
+                source=source
+        )
+        if options['restart'] or created:
+            progress.records_read = progress.recipes_created = 0
+            progress.finished = False
+        elif progress.finished:
+            raise CommandError(
+                    f"{source} was already imported, use --restart to import "
+                    f"it again"
+            )
+        elif not options['resume']:
+            raise CommandError(
+                    f"{source} was partially imported "
+                    f"({progress.records_read} records), use --resume to "
+                    f"continue or --restart to start over"
+            )
+
+        read_rows, decode = IMPORT_FORMATS[import_format]
+        importer = RecipeImporter(user)
+        invalid = 0
+        self.verbosity = options['verbosity']
+        start = self.last_report = time.monotonic()
+        with self.open(path) as stream:
+            rows = read_rows(stream)
+            # Records of the committed batches of an interrupted import
+            skipped = sum(
+                    1 for row in itertools.islice(rows, progress.records_read)
+            )
+            numbered_rows = enumerate(rows, start=skipped + 1)
+            for batch in chunks(numbered_rows, options['batch_size']):
+                records = []
+                for number, row in batch:
+                    try:
+                        records.append(clean_record(decode(row)))
+                    except InvalidRecord as error:
+                        invalid += 1
+                        self.stderr.write(f"Record {number}: {error}")
+
+                with transaction.atomic():
+                    progress.recipes_created += importer.import_batch(records)
+                    progress.records_read += len(batch)
+                    progress.save()
+                self.report(progress, progress.records_read - skipped, start)
+
+        progress.finished = True
+        progress.save()
+
+        elapsed = time.monotonic() - start
+        rate = self.rate(progress.records_read - skipped, elapsed)
+        self.stdout.write(self.style.SUCCESS(
+                f"Imported {progress.recipes_created} recipes from "
+                f"{progress.records_read} records in {elapsed:.1f}s ({rate}), "
+                f"skipped {invalid} invalid records"
+        ))
+
+    def guess_format(self, path):
+        """Return the format of a dump from its file extension"""
+        if path.endswith('.gz'):
+            path = path[:-3]
+        extension = os.path.splitext(path)[1]
+        formats = {'.ndjson': 'ndjson', '.jsonl': 'ndjson', '.csv': 'csv'}
+        if extension not in formats:
+            raise CommandError(
+                    "Cannot guess the format of the dump, use --format"
+            )
+
+        return formats[extension]
+
+    def open(self, path):
+        """Open a dump as text"""
+        if path == '-':
+            return open(
+                    sys.stdin.fileno(),
+                    encoding='utf-8',
+                    newline='',
+                    closefd=False
+            )
+        elif path.endswith('.gz'):
+            return gzip.open(path, 'rt', encoding='utf-8', newline='')
+
+        return open(path, encoding='utf-8', newline='')
+
+    def rate(self, records, elapsed):
+        if not elapsed:
+            return "- records/s"
+
+        return f"{records / elapsed:.0f} records/s"
+
+    def report(self, progress, records, start):
+        """
+        Report the progress every `report_interval` seconds, or every
+        batch with -v 2
+        """
+        now = time.monotonic()
+        due = now - self.last_report >= self.report_interval
+        if self.verbosity >= 2 or (self.verbosity and due):
+            self.last_report = now
+            self.stdout.write(
+                    f"{progress.records_read} records read, "
+                    f"{progress.recipes_created} recipes created "
+                    f"({self.rate(records, now - start)})"
+            )
@@ -0,0 +1,48 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class BaseCursorPagination(CursorPagination):
+    """
+    Keyset pagination over a stable, indexed sort key.
+
+    Every page is fetched with a `WHERE key < cursor LIMIT n` query, so
+    page N costs the same as the first one. Clients may pick a page size
+    up to `RECIPE_API_MAX_PAGE_SIZE` with `?page_size=` and small clients
+    can opt out of pagination altogether with `?paginate=false`.
+    """
+    page_size_query_param = 'page_size'
+    disable_query_param = 'paginate'
+
+    def get_page_size(self, request):
+        """Return the requested page size capped by the configured maximum"""
+        self.page_size = settings.RECIPE_API_PAGE_SIZE
+        self.max_page_size = settings.RECIPE_API_MAX_PAGE_SIZE
+
+        return super().get_page_size(request)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Return None when the client opted out of pagination"""
+        disabled = request.query_params.get(self.disable_query_param, '')
+        if disabled.lower() in ('0', 'false'):
+            return None
+
+        return super().paginate_queryset(queryset, request, view)
+
+
+class RecipeAttrCursorPagination(BaseCursorPagination):
+    """Paginate tags and ingredients by name descending, oldest id first"""
+    ordering = ('-name', 'id')
+
+
+class RecipeCursorPagination(BaseCursorPagination):
+    """Paginate recipes by id, newest first, and searches by relevance"""
+    ordering = '-id'
+    search_ordering = ('-search_rank', '-id')
+
+    def get_ordering(self, request, queryset, view):
+        """Return the relevance ordering for queries ranked by a search"""
+        if 'search_rank' in queryset.query.annotations:
+            return self.search_ordering
+
+        return super().get_ordering(request, queryset, view)
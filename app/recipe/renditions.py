@@ -0,0 +1,166 @@
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps, features
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+
+from core.models import Recipe, RecipeImageRendition
+from core.versions import bump_versions
+
+
+logger = logging.getLogger(__name__)
+
+# Pillow format name -> (file extension, Pillow feature it depends on)
+FORMATS = {
+    'JPEG': ('jpg', 'jpg'),
+    'PNG': ('png', 'zlib'),
+    'WEBP': ('webp', 'webp'),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = None
+
+
+def get_executor():
+    """Return the worker pool generating renditions off the request path"""
+    global _executor, _slots
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _slots = threading.BoundedSemaphore(
+                        settings.RECIPE_IMAGE_QUEUE_SIZE
+                )
+                _executor = ThreadPoolExecutor(
+                        max_workers=settings.RECIPE_IMAGE_WORKERS,
+                        thread_name_prefix='recipe-renditions'
+                )
+
+    return _executor
+
+
+def submit_renditions(recipe_id, image_name):
+    """
+    Queue the generation of the renditions of a recipe image. Returns
+    False when the queue is full, the `generate_recipe_renditions`
+    command then picks the image up later.
+    """
+    executor = get_executor()
+    if not _slots.acquire(blocking=False):
+        logger.warning("Rendition queue full, skipping recipe %s", recipe_id)
+        return False
+
+    future = executor.submit(_generate_in_worker, recipe_id, image_name)
+    future.add_done_callback(lambda future: _slots.release())
+
+    return True
+
+
+def _generate_in_worker(recipe_id, image_name):
+    try:
+        generate_renditions(recipe_id, image_name)
+    except Exception:
+        logger.exception(
+                "Could not generate the renditions of recipe %s",
+                recipe_id
+        )
+    finally:
+        # Worker threads open their own connections, never reused by requests
+        connection.close()
+
+
+def schedule_renditions(recipe):
+    """
+    Drop the renditions of the previous image of a recipe and queue the
+    generation of the new ones once the upload is committed
+    """
+    delete_renditions(recipe)
+    if recipe.image:
+        image_name = recipe.image.name
+        transaction.on_commit(lambda: submit_renditions(recipe.pk, image_name))
+
+
+def delete_renditions(recipe):
+    """Delete the rendition files and rows of a recipe"""
+    for rendition in RecipeImageRendition.objects.filter(recipe=recipe):
+        rendition.image.delete(save=False)
+        rendition.delete()
+
+
+def render(original, size, image_format, quality):
+    """Return the encoded bytes of an image resized to fit in size"""
+    image = ImageOps.exif_transpose(original)
+    if image.mode not in ('RGB', 'RGBA') \
+            or (image_format == 'JPEG' and image.mode != 'RGB'):
+        image = image.convert('RGB')
+    image.thumbnail(size, Image.LANCZOS)
+
+    output = io.BytesIO()
+    image.save(output, format=image_format, quality=quality, optimize=True)
+
+    return output.getvalue()
+
+
+def generate_renditions(recipe_id, image_name=None):
+    """
+    Generate every configured rendition of a recipe image and return
+    them. Nothing is generated when the recipe was deleted or its image
+    replaced since `image_name` was queued.
+    """
+    try:
+        recipe = Recipe.objects.only('id', 'user', 'image').get(pk=recipe_id)
+    except Recipe.DoesNotExist:
+        return []
+    if not recipe.image or (image_name and recipe.image.name != image_name):
+        return []
+
+    specs = {
+        name: spec for name, spec in settings.RECIPE_IMAGE_RENDITIONS.items()
+        if features.check(FORMATS[spec['format']][1])
+    }
+    if not specs:
+        return []
+    largest = max(
+            (spec['size'] for spec in specs.values()),
+            key=lambda size: size[0] * size[1]
+    )
+
+    renditions = []
+    with recipe.image.open('rb') as image_file, \
+            Image.open(image_file) as original:
+        # Let JPEG decode at the smallest scale still larger than needed
+        original.draft('RGB', largest)
+        original.load()
+        for name, spec in specs.items():
+            content = render(
+                    original,
+                    spec['size'],
+                    spec['format'],
+                    spec.get('quality', 85)
+            )
+            rendition = RecipeImageRendition(recipe=recipe, name=name)
+            rendition.image.save(
+                    f"{name}.{FORMATS[spec['format']][0]}",
+                    ContentFile(content),
+                    save=False
+            )
+            renditions.append(rendition)
+
+    with transaction.atomic():
+        current = Recipe.objects.filter(pk=recipe_id, image=recipe.image.name)
+        if current.exists():
+            delete_renditions(recipe)
+            RecipeImageRendition.objects.bulk_create(renditions)
+            bump_versions(recipe.user_id, 'recipes')
+            return renditions
+
+    # The image was replaced while the renditions were being generated
+    for rendition in renditions:
+        rendition.image.delete(save=False)
+
+    return []
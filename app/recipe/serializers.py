@@ -1,9 +1,99 @@
+from decimal import Decimal
+
+from PIL import Image
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import CharField, Q, Value, prefetch_related_objects
+from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+from rest_framework.settings import api_settings
+
+from core.models import Tag, Ingredient, Recipe, RecipeImageRendition
+from core.versions import bump_versions, deferred_bumps
+
+
+def normalize_name(name):
+    """Strip a tag or ingredient name and collapse its inner whitespace"""
+    return ' '.join(name.split())
+
+
+def name_key(name):
+    """
+    Return the key of a normalized name, names differing only by case
+    are the same tag or ingredient
+    """
+    return name.casefold()
+
+
+def database_name_keys(names):
+    """
+    Return `{name: key}` of names keyed the way the database compares
+    them in its unique name indexes and `iexact` lookups: with UPPER(),
+    which only folds ASCII letters on SQLite
+    """
+    names = list(dict.fromkeys(names))
+    keys = {}
+    with connection.cursor() as cursor:
+        # Batches below the SQLite variables limit
+        for start in range(0, len(names), 500):
+            batch = names[start:start + 500]
+            cursor.execute(
+                    'SELECT ' + ', '.join(['UPPER(%s)'] * len(batch)),
+                    batch
+            )
+            keys.update(zip(batch, cursor.fetchone()))
+
+    return keys
+
+
+def unique_names(names):
+    """Return the normalized names with distinct keys, first spelling first"""
+    unique = {}
+    for name in names:
+        name = normalize_name(name)
+        unique.setdefault(name_key(name), name)
+
+    return list(unique.values())
+
+
+def filter_names(queryset, names):
+    """
+    Filter tags or ingredients to the ones named like names, ignoring
+    case
+    """
+    condition = Q()
+    for name in names:
+        condition |= Q(name__iexact=name)
+
+    return queryset.filter(condition) if names else queryset.none()
+
 
-from core.models import Tag, Ingredient, Recipe
+class SparseFieldsMixin:
+    """
+    Serializer mixin dropping the fields missing from the `sparse_fields`
+    set of the context, filled from the `fields` and `exclude` query
+    parameters
+    """
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        sparse_fields = self.context.get('sparse_fields')
+        if sparse_fields is not None:
+            for name in set(self.fields) - sparse_fields:
+                self.fields.pop(name)
 
-class TagSerializer(serializers.ModelSerializer):
+
+class RecipeAttrSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """Base serializer for user owned recipe attributes"""
+
+    def validate_name(self, name):
+        return normalize_name(name)
+
+
+class TagSerializer(RecipeAttrSerializer):
     """Serializes tag objects"""
     class Meta:
         model = Tag
@@ -11,7 +101,15 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class TagCountSerializer(TagSerializer):
+    """Serializes tag objects with the number of recipes using them"""
+    recipe_count = serializers.IntegerField(read_only=True)
+
+    class Meta(TagSerializer.Meta):
+        fields = TagSerializer.Meta.fields + ['recipe_count']
+
+
+class IngredientSerializer(RecipeAttrSerializer):
     """Serializes ingredients objects"""
     class Meta:
         model = Ingredient
@@ -19,21 +117,286 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class IngredientCountSerializer(IngredientSerializer):
+    """Serializes ingredient objects with the number of recipes using them"""
+    recipe_count = serializers.IntegerField(read_only=True)
+
+    class Meta(IngredientSerializer.Meta):
+        fields = IngredientSerializer.Meta.fields + ['recipe_count']
+
+
+class RecipeAttrNamesSerializer(serializers.Serializer):
+    """Validates a list of tag or ingredient names to get or create"""
+    names = serializers.ListField(
+            child=serializers.CharField(max_length=255),
+            allow_empty=False
+    )
+
+    def validate_names(self, names):
+        """Return the normalized names of distinct keys in their input order"""
+        if len(names) > settings.RECIPE_API_MAX_BULK_SIZE:
+            message = _('Ensure this list has no more than {max_size} names.')
+            raise serializers.ValidationError(
+                    message.format(max_size=settings.RECIPE_API_MAX_BULK_SIZE)
+            )
+
+        return unique_names(names)
+
+
+class AutocompleteSerializer(serializers.Serializer):
+    """Validates the query parameters of name autocompletion"""
+    q = serializers.CharField(max_length=100)
+    limit = serializers.IntegerField(min_value=1, default=10)
+    fuzzy = serializers.BooleanField(default=False)
+
+    def validate_q(self, value):
+        """Normalize the query like the names it is matched against"""
+        return normalize_name(value)
+
+    def validate_limit(self, value):
+        """Cap the number of matches at `AUTOCOMPLETE['MAX_LIMIT']`"""
+        return min(value, settings.AUTOCOMPLETE['MAX_LIMIT'])
+
+
+class UserPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Primary key field limited to the objects of the request user"""
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        """Validate lists with a single query instead of one per item"""
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+
+        return BatchedManyRelatedField(**list_kwargs)
+
+    def get_queryset(self):
+        return super().get_queryset().filter(user=self.context['request'].user)
+
+
+class BatchedManyRelatedField(serializers.ManyRelatedField):
+    """
+    Fetches every object of a primary key list with one `IN` query and
+    reports all the missing ones at once. The fetched objects are what
+    the serializer then passes to the many to many `set()`.
+    """
+
+    def to_internal_value(self, data):
+        pks = self.to_pks(data)
+        objects = self.get_objects(pks)
+        missing = [pk for pk in pks if pk not in objects]
+        if missing:
+            message = self.child_relation.error_messages['does_not_exist']
+            raise serializers.ValidationError([
+                message.format(pk_value=pk) for pk in missing
+            ], code='does_not_exist')
+
+        return [objects[pk] for pk in pks]
+
+    def to_pks(self, data):
+        """Return the unique primary keys of a list in their input order"""
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        child = self.child_relation
+        pk_field = child.get_queryset().model._meta.pk
+        pks = []
+        for item in data:
+            if isinstance(item, bool):
+                child.fail('incorrect_type', data_type=type(item).__name__)
+            try:
+                pks.append(pk_field.to_python(item))
+            except DjangoValidationError:
+                child.fail('incorrect_type', data_type=type(item).__name__)
+
+        return list(dict.fromkeys(pks))
+
+    def get_objects(self, pks):
+        """
+        Return a `{pk: object}` map of the given primary keys, reusing the
+        objects preloaded by a list serializer for the whole batch
+        """
+        preloaded = self.context.get('preloaded_related_objects', {})
+        if self.field_name in preloaded:
+            return preloaded[self.field_name]
+
+        return self.child_relation.get_queryset().in_bulk(pks)
+
+
+RECIPE_RELATIONS = ('tags', 'ingredients')
+
+
+def insert_recipe_relations(recipe_relations):
+    """
+    Insert the through rows of new recipes with one query per relation.
+    Takes `(recipe, {relation name: related objects})` pairs, the recipes
+    must not have any related object yet.
+    """
+    recipe_relations = list(recipe_relations)
+    for name in RECIPE_RELATIONS:
+        field = Recipe._meta.get_field(name)
+        through = field.remote_field.through
+        through.objects.bulk_create([
+            through(**{
+                f'{field.m2m_field_name()}_id': recipe.pk,
+                f'{field.m2m_reverse_field_name()}_id': related.pk,
+            })
+            for recipe, relations in recipe_relations
+            for related in relations.get(name, [])
+        ])
+
+
+class RecipeBulkListSerializer(serializers.ListSerializer):
+    """
+    Validates and creates a batch of recipes. The tags and ingredients of
+    the whole batch are fetched with one query per relation and every
+    row is written inside a single transaction.
+
+    Invalid items do not fail the validation of the list: only the valid
+    items are validated data and `item_errors` lists the errors of the
+    others, so that callers can reject or keep a partially valid batch.
+    """
+
+    def to_internal_value(self, data):
+        self.item_errors = []
+        if not isinstance(data, list) or not data:
+            return super().to_internal_value(data)
+        if len(data) > settings.RECIPE_API_MAX_BULK_SIZE:
+            message = _(
+                'Ensure this list has no more than {max_size} recipes.'
+            )
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [
+                    message.format(max_size=settings.RECIPE_API_MAX_BULK_SIZE)
+                ]
+            }, code='max_length')
+
+        self._preload_related_objects(data)
+        validated_data = []
+        for index, item in enumerate(data):
+            try:
+                validated_data.append(self.child.run_validation(item))
+            except serializers.ValidationError as exc:
+                self.item_errors.append({'index': index, 'errors': exc.detail})
+
+        return validated_data
+
+    def _preload_related_objects(self, data):
+        """Fetch the related objects referenced anywhere in the batch"""
+        preloaded = {}
+        for name in RECIPE_RELATIONS:
+            field = self.child.fields[name]
+            pks = set()
+            for item in data:
+                try:
+                    pks.update(field.to_pks(item[name]))
+                except (KeyError, TypeError, serializers.ValidationError):
+                    continue
+            preloaded[name] = field.child_relation.get_queryset().in_bulk(pks)
+
+        self.context['preloaded_related_objects'] = preloaded
+
+    def create(self, validated_data):
+        """Insert every recipe and relation of the batch"""
+        recipe_relations = []
+        for attrs in validated_data:
+            relations = {
+                name: attrs.pop(name)
+                for name in RECIPE_RELATIONS if name in attrs
+            }
+            recipe_relations.append((Recipe(**attrs), relations))
+        recipes = [recipe for recipe, relations in recipe_relations]
+
+        with transaction.atomic(), deferred_bumps():
+            if connection.features.can_return_ids_from_bulk_insert:
+                Recipe.objects.bulk_create(recipes)
+            else:
+                # Only some backends report the ids of bulk inserted rows
+                for recipe in recipes:
+                    recipe.save(force_insert=True)
+            insert_recipe_relations(recipe_relations)
+            # Bulk inserts send no signals to bump the version
+            bump_versions(recipes[0].user_id, 'recipes')
+        prefetch_related_objects(recipes, *RECIPE_RELATIONS, 'renditions')
+
+        return recipes
+
+
+class RenditionsField(serializers.Field):
+    """Read only `{name: url}` map of the generated renditions of an image"""
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, renditions):
+        request = self.context.get('request')
+        urls = {}
+        for rendition in renditions.all():
+            url = rendition.image.url
+            if request:
+                url = request.build_absolute_uri(url)
+            urls[rendition.name] = url
+
+        return urls
+
+
+class RecipeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializes recipe objects"""
-    ingredients = serializers.PrimaryKeyRelatedField(
+    ingredients = UserPrimaryKeyRelatedField(
             many=True,
             queryset=Ingredient.objects.all()
     )
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = UserPrimaryKeyRelatedField(
             many=True,
             queryset=Tag.objects.all()
     )
+    renditions = RenditionsField()
 
     class Meta:
         model = Recipe
-        fields = ['id', 'title', 'ingredients', 'tags', 'time_minutes', 'price', 'link']
+        fields = [
+            'id', 'title', 'ingredients', 'tags', 'time_minutes', 'price',
+            'link', 'renditions',
+        ]
         read_only_fields = ['id']
+        list_serializer_class = RecipeBulkListSerializer
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Relations listed in the `expand` set of the context are nested
+        for name in self.context.get('expand', ()):
+            if name in self.fields:
+                self.fields[name] = EXPANDED_SERIALIZERS[name](
+                        many=True,
+                        read_only=True
+                )
+
+    def create(self, validated_data):
+        """Create a recipe, inserting its relations without diffing them"""
+        relations = {
+            name: validated_data.pop(name)
+            for name in RECIPE_RELATIONS if name in validated_data
+        }
+        with transaction.atomic():
+            recipe = Recipe.objects.create(**validated_data)
+            insert_recipe_relations([(recipe, relations)])
+
+        return recipe
+
+    def update(self, instance, validated_data):
+        """Update a recipe and its relations along with its data version"""
+        with transaction.atomic():
+            return super().update(instance, validated_data)
+
+
+EXPANDED_SERIALIZERS = {
+    'tags': TagSerializer,
+    'ingredients': IngredientSerializer,
+}
 
 
 class RecipeDetailSerializer(RecipeSerializer):
@@ -42,9 +405,314 @@ class RecipeDetailSerializer(RecipeSerializer):
     tags = TagSerializer(many=True, read_only=True)
 
 
+class RecipeRowListSerializer(serializers.ListSerializer):
+    """
+    Renders a page of `values()` rows of recipes with one query for the
+    tag and ingredient ids of the whole page, one per relation expanded
+    to nested objects and one for the renditions
+    """
+
+    def to_representation(self, rows):
+        rows = list(rows)
+        fields = self.child.rendered_fields()
+        expand = self.context.get('expand', set())
+        recipe_ids = [row['id'] for row in rows]
+        related = self.related_ids(recipe_ids, [
+            name for name in RECIPE_RELATIONS
+            if name in fields and name not in expand
+        ])
+        for name in RECIPE_RELATIONS:
+            if name in fields and name in expand:
+                related.update(self.related_objects(recipe_ids, name))
+        renditions = {}
+        if 'renditions' in fields:
+            renditions = self.rendition_urls(recipe_ids)
+
+        return [
+            self.child.render_row(row, fields, related, renditions)
+            for row in rows
+        ]
+
+    def related_ids(self, recipe_ids, relations):
+        """Return `{(relation, recipe id): [related ids]}` of some relations"""
+        querysets = []
+        for name in relations:
+            field = Recipe._meta.get_field(name)
+            querysets.append(
+                field.remote_field.through.objects.filter(**{
+                    f'{field.m2m_field_name()}__in': recipe_ids,
+                }).annotate(
+                    relation=Value(name, output_field=CharField())
+                ).values_list(
+                    'relation',
+                    f'{field.m2m_field_name()}_id',
+                    f'{field.m2m_reverse_field_name()}_id'
+                )
+            )
+        if not querysets or not recipe_ids:
+            return {}
+
+        related = {}
+        rows = querysets[0].union(*querysets[1:], all=True)
+        for relation, recipe_id, related_id in rows:
+            related.setdefault((relation, recipe_id), []).append(related_id)
+        for related_ids in related.values():
+            related_ids.sort()
+
+        return related
+
+    def related_objects(self, recipe_ids, name):
+        """
+        Return `{(relation, recipe id): [{'id', 'name'}]}` of one relation
+        """
+        field = Recipe._meta.get_field(name)
+        related_id = f'{field.m2m_reverse_field_name()}_id'
+        rows = field.remote_field.through.objects.filter(**{
+            f'{field.m2m_field_name()}__in': recipe_ids,
+        }).order_by(related_id).values_list(
+            f'{field.m2m_field_name()}_id',
+            related_id,
+            f'{field.m2m_reverse_field_name()}__name'
+        )
+
+        related = {}
+        for recipe_id, pk, related_name in rows:
+            related.setdefault((name, recipe_id), []).append(
+                    {'id': pk, 'name': related_name}
+            )
+
+        return related
+
+    def rendition_urls(self, recipe_ids):
+        """Return `{recipe id: {name: url}}` of the renditions of recipes"""
+        request = self.context.get('request')
+        storage = RecipeImageRendition._meta.get_field('image').storage
+        renditions = RecipeImageRendition.objects.filter(
+                recipe_id__in=recipe_ids
+        ).order_by('id').values_list('recipe_id', 'name', 'image')
+
+        urls = {}
+        for recipe_id, name, image in renditions:
+            url = storage.url(image)
+            if request:
+                url = request.build_absolute_uri(url)
+            urls.setdefault(recipe_id, {})[name] = url
+
+        return urls
+
+
+class RecipeRowSerializer(serializers.BaseSerializer):
+    """
+    Read only fast path of `RecipeSerializer` for list pages, rendering
+    `values()` rows to the same JSON without binding a field per value
+    """
+    price_exponent = Decimal(1).scaleb(
+            -Recipe._meta.get_field('price').decimal_places
+    )
+
+    class Meta:
+        list_serializer_class = RecipeRowListSerializer
+
+    @property
+    def fields(self):
+        """
+        Return the field names of `RecipeSerializer`, for sparse fieldsets
+        """
+        return RecipeSerializer.Meta.fields
+
+    @classmethod
+    def columns(cls, sparse_fields=None):
+        """Return the recipe columns to read for the rendered fields"""
+        return ['id'] + [
+            name for name in ('title', 'time_minutes', 'price', 'link')
+            if sparse_fields is None or name in sparse_fields
+        ]
+
+    def rendered_fields(self):
+        """Return the names of the rendered fields in their output order"""
+        sparse_fields = self.context.get('sparse_fields')
+
+        return [
+            name for name in RecipeSerializer.Meta.fields
+            if sparse_fields is None or name in sparse_fields
+        ]
+
+    def render_row(self, row, fields, related, renditions):
+        data = {}
+        for name in fields:
+            if name in RECIPE_RELATIONS:
+                data[name] = related.get((name, row['id']), [])
+            elif name == 'renditions':
+                data[name] = renditions.get(row['id'], {})
+            elif name == 'price':
+                data[name] = self.render_price(row[name])
+            else:
+                data[name] = row[name]
+
+        return data
+
+    def render_price(self, price):
+        """Render a price exactly like `serializers.DecimalField`"""
+        price = price.quantize(self.price_exponent)
+
+        if api_settings.COERCE_DECIMAL_TO_STRING:
+            return '{:f}'.format(price)
+
+        return price
+
+    def to_representation(self, row):
+        rows = type(self)(many=True, context=self.context)
+
+        return rows.to_representation([row])[0]
+
+
+class HeaderImageField(serializers.ImageField):
+    """
+    Image field validating the format and dimensions read from the image
+    header, without decoding the pixel data of the whole image
+    """
+    default_error_messages = {
+        'invalid_format': _(
+            'Unsupported image format, expected one of {formats}.'
+        ),
+        'too_many_pixels': _(
+            'Ensure the image has at most {max_pixels} pixels.'
+        ),
+    }
+    # Pillow reports the multi-picture JPEGs of many phone cameras as MPO,
+    # their first picture is a plain JPEG
+    format_aliases = {'MPO': 'JPEG'}
+
+    def to_internal_value(self, data):
+        file_object = serializers.FileField.to_internal_value(self, data)
+        try:
+            with Image.open(file_object) as image:
+                image_format, (width, height) = image.format, image.size
+            image_format = self.format_aliases.get(image_format, image_format)
+        except Image.DecompressionBombError:
+            self.fail(
+                    'too_many_pixels',
+                    max_pixels=settings.RECIPE_IMAGE_MAX_PIXELS
+            )
+        except Exception:
+            self.fail('invalid_image')
+        finally:
+            file_object.seek(0)
+
+        if image_format not in settings.RECIPE_IMAGE_FORMATS:
+            self.fail(
+                    'invalid_format',
+                    formats=', '.join(settings.RECIPE_IMAGE_FORMATS)
+            )
+        if width * height > settings.RECIPE_IMAGE_MAX_PIXELS:
+            self.fail(
+                    'too_many_pixels',
+                    max_pixels=settings.RECIPE_IMAGE_MAX_PIXELS
+            )
+        file_object.content_type = Image.MIME.get(image_format)
+
+        return file_object
+
+
 class RecipeImageSerializer(serializers.ModelSerializer):
     """Serializer for uploading images to recipes"""
+    image = HeaderImageField(allow_null=True, required=False)
+    renditions = RenditionsField()
+
     class Meta:
         model = Recipe
-        fields = ['id', 'image']
+        fields = ['id', 'image', 'renditions']
         read_only_fields = ['id']
+
+
+class IdListField(serializers.Field):
+    """Parses a bounded comma separated list of ids, e.g. `?tags=1,2,3`"""
+    default_error_messages = {
+        'invalid': _('Expected a comma separated list of ids.'),
+        'max_length': _('Ensure this list has no more than {max_length} ids.'),
+    }
+
+    def __init__(self, max_length=100, **kwargs):
+        self.max_length = max_length
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        """Return the unique ids in ascending order"""
+        values = [
+            value.strip() for value in str(data).split(',') if value.strip()
+        ]
+        if not all(value.isdigit() for value in values):
+            self.fail('invalid')
+        ids = sorted({int(value) for value in values})
+        if len(ids) > self.max_length:
+            self.fail('max_length', max_length=self.max_length)
+
+        return ids
+
+    def to_representation(self, value):
+        return ','.join(str(pk) for pk in value)
+
+
+class NameListField(serializers.Field):
+    """
+    Parses a comma separated list of choices, e.g.
+    `?expand=tags,ingredients`
+    """
+    default_error_messages = {
+        'invalid_choice': _(
+            'Unknown values: {unknown}. Expected some of {choices}.'
+        ),
+    }
+
+    def __init__(self, choices, **kwargs):
+        self.choices = list(choices)
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        """Return the set of listed choices"""
+        values = {
+            value.strip() for value in str(data).split(',') if value.strip()
+        }
+        unknown = values - set(self.choices)
+        if unknown:
+            self.fail(
+                    'invalid_choice',
+                    unknown=', '.join(sorted(unknown)),
+                    choices=', '.join(self.choices)
+            )
+
+        return values
+
+    def to_representation(self, value):
+        return ','.join(sorted(value))
+
+
+class RecipeExpandSerializer(serializers.Serializer):
+    """Validates the relations of recipes to render as nested objects"""
+    expand = NameListField(choices=RECIPE_RELATIONS)
+
+
+class RecipeExportSerializer(serializers.Serializer):
+    """Validates the query parameters of recipe exports"""
+    NDJSON = 'ndjson'
+    CSV = 'csv'
+
+    type = serializers.ChoiceField(choices=[NDJSON, CSV], default=NDJSON)
+
+
+class RecipeFilterSerializer(serializers.Serializer):
+    """Validates the query parameters used to filter recipes"""
+    MATCH_ANY = 'any'
+    MATCH_ALL = 'all'
+
+    tags = IdListField(required=False)
+    ingredients = IdListField(required=False)
+    match = serializers.ChoiceField(
+            choices=[MATCH_ANY, MATCH_ALL],
+            default=MATCH_ANY
+    )
+    search = serializers.CharField(
+            required=False,
+            allow_blank=True,
+            max_length=200
+    )
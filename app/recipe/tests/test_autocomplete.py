@@ -0,0 +1,152 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import Tag, Ingredient
+
+from ..autocomplete import (
+        NameIndex, get_autocomplete_cache, similarity, trigrams
+)
+
+
+TAGS_AUTOCOMPLETE_URL = reverse('recipe:tag-autocomplete')
+INGREDIENTS_AUTOCOMPLETE_URL = reverse('recipe:ingredient-autocomplete')
+
+NAMES = [
+    'Salt', 'salsa', 'Salmon', 'Sugar', 'Sea salt', 'Salt flakes', 'Tomato',
+]
+
+
+class NameIndexTests(TestCase):
+    """Test the in-memory name index of hot users"""
+
+    def setUp(self):
+        self.index = NameIndex(enumerate(NAMES))
+
+    def test_complete_prefix_alphabetically(self):
+        """Test prefix matches are case-insensitive and alphabetical"""
+        self.assertEqual(
+                [name for pk, name in self.index.complete('SAL', 10)],
+                ['Salmon', 'salsa', 'Salt', 'Salt flakes']
+        )
+        self.assertEqual(
+                self.index.complete('sal', 2),
+                [(2, 'Salmon'), (1, 'salsa')]
+        )
+        self.assertEqual(self.index.complete('pepper', 10), [])
+
+    def test_fuzzy_ranks_by_similarity(self):
+        """Test fuzzy matches tolerate typos and rank by similarity"""
+        self.assertEqual(self.index.fuzzy('tomatoe', 10, 0.3), [(6, 'Tomato')])
+        self.assertEqual(
+                [name for pk, name in self.index.fuzzy('salt', 3, 0.3)],
+                ['Salt', 'Sea salt', 'Salt flakes']
+        )
+
+    def test_similarity_matches_pg_trgm(self):
+        """Test trigrams are computed like pg_trgm's similarity()"""
+        self.assertEqual(trigrams('Cat'), {'  c', ' ca', 'cat', 'at '})
+        self.assertAlmostEqual(
+                similarity(trigrams('word'), trigrams('two words')),
+                4 / 11
+        )
+
+
+class AutocompleteApiTests(TestCase):
+    """Test autocompleting tag and ingredient names through the API"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+                'tester@example.com',
+                'TestPassword'
+        )
+        self.client.force_authenticate(self.user)
+        for name in NAMES:
+            Ingredient.objects.create(user=self.user, name=name)
+        get_autocomplete_cache().clear()
+
+    def autocomplete(self, url=INGREDIENTS_AUTOCOMPLETE_URL, **params):
+        """Autocomplete names and return the matched names"""
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        return [match['name'] for match in response.data]
+
+    def test_prefix_matches(self):
+        """Test names starting with the query are returned, up to limit"""
+        self.assertEqual(
+                self.autocomplete(q='sal'),
+                ['Salmon', 'salsa', 'Salt', 'Salt flakes']
+        )
+        self.assertEqual(
+                self.autocomplete(q='sal', limit=2),
+                ['Salmon', 'salsa']
+        )
+        self.assertEqual(self.autocomplete(q='sal%'), [])
+
+    def test_fuzzy_matches(self):
+        """Test fuzzy queries tolerate typos"""
+        self.assertEqual(
+                self.autocomplete(q='tomatoe', fuzzy='true'),
+                ['Tomato']
+        )
+
+    def test_limited_to_user_and_model(self):
+        """Test only the names of the user and of the endpoint's model match"""
+        other_user = get_user_model().objects.create_user(
+                'other@example.com',
+                'TestPassword'
+        )
+        Ingredient.objects.create(user=other_user, name='Saffron')
+        Tag.objects.create(user=self.user, name='Salad')
+
+        self.assertEqual(self.autocomplete(q='saf'), [])
+        self.assertEqual(
+                self.autocomplete(TAGS_AUTOCOMPLETE_URL, q='sal'),
+                ['Salad']
+        )
+
+    def test_invalid_query(self):
+        """Test the query is required and the limit capped"""
+        response = self.client.get(INGREDIENTS_AUTOCOMPLETE_URL)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        with override_settings(
+                AUTOCOMPLETE={**settings.AUTOCOMPLETE, 'MAX_LIMIT': 1}
+        ):
+            self.assertEqual(self.autocomplete(q='s', limit=10), ['Salmon'])
+
+    def test_hot_users_answered_from_memory(self):
+        """Test frequent users are answered without querying the names"""
+        for _ in range(3):
+            self.autocomplete(q='sa')
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.autocomplete(q='salm'), ['Salmon'])
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                    self.autocomplete(q='tomatoe', fuzzy='true'),
+                    ['Tomato']
+            )
+
+    def test_hot_users_see_new_names(self):
+        """Test new names are autocompleted once the user is cached"""
+        for _ in range(3):
+            self.autocomplete(q='sa')
+
+        self.client.post(
+                reverse('recipe:ingredient-list'),
+                {'name': 'Saffron'}
+        )
+
+        self.assertEqual(self.autocomplete(q='saf'), ['Saffron'])
+
+    def test_cold_users_query_count(self):
+        """Test infrequent users are answered with one indexed query"""
+        with self.assertNumQueries(1):
+            self.autocomplete(q='sal')
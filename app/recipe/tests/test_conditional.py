@@ -0,0 +1,181 @@
+import tempfile
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import Recipe, Tag, Ingredient
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+RECIPES_BULK_URL = reverse('recipe:recipe-bulk')
+TAGS_URL = reverse('recipe:tag-list')
+TAGS_BULK_URL = reverse('recipe:tag-bulk')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+def detail_url(recipe_id):
+    """Return recipe detail URL"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+class ConditionalGetTests(TestCase):
+    """Test answering conditional requests from the user data versions"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+                'tester@example.com',
+                'TestPassword'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.ingredient = Ingredient.objects.create(
+                user=self.user,
+                name='Salt'
+        )
+        self.recipe = Recipe.objects.create(
+                user=self.user,
+                title='Sample recipe',
+                time_minutes=10,
+                price=5.00
+        )
+        self.recipe.tags.add(self.tag)
+
+    def assertNotModified(self, url, etag, params=None):
+        """Assert a conditional request for url is answered with 304"""
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def assertModified(self, url, etag, params=None):
+        """Assert a conditional request for url is answered with the data"""
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_unchanged_data_not_modified(self):
+        """Test lists and details are answered with 304 while unchanged"""
+        urls = (
+            RECIPES_URL, detail_url(self.recipe.id), TAGS_URL, INGREDIENTS_URL
+        )
+        for url in urls:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+            self.assertNotModified(url, response['ETag'])
+            response = self.client.get(
+                    url,
+                    HTTP_IF_NONE_MATCH=f'"other", W/{response["ETag"]}'
+            )
+            self.assertEqual(
+                    response.status_code,
+                    status.HTTP_304_NOT_MODIFIED
+            )
+
+    def test_missing_actions_not_routed(self):
+        """Test tags and ingredients still have no detail route"""
+        for url in (
+            f'{TAGS_URL}{self.tag.id}/',
+            f'{INGREDIENTS_URL}{self.ingredient.id}/',
+        ):
+            self.assertEqual(
+                    self.client.get(url).status_code,
+                    status.HTTP_404_NOT_FOUND
+            )
+
+    def test_etag_depends_on_query(self):
+        """Test the ETag differs between query parameters and users"""
+        etag = self.client.get(TAGS_URL)['ETag']
+        self.assertModified(TAGS_URL, etag, {'assigned_only': 1})
+
+        other_user = get_user_model().objects.create_user(
+                'other@example.com',
+                'TestPassword'
+        )
+        self.client.force_authenticate(other_user)
+        self.assertModified(TAGS_URL, etag)
+
+    def test_recipe_changes_modify_recipes(self):
+        """Test creating, updating and deleting recipes changes their ETag"""
+        changes = [
+            lambda: self.client.post(RECIPES_URL, {
+                'title': 'Soup', 'time_minutes': 5, 'price': 2.00,
+                'tags': [self.tag.id], 'ingredients': [],
+            }, format='json'),
+            lambda: self.client.patch(
+                    detail_url(self.recipe.id), {'tags': []}, format='json'
+            ),
+            lambda: self.client.post(RECIPES_BULK_URL, [{
+                'title': 'Stew', 'time_minutes': 5, 'price': 2.00,
+                'tags': [], 'ingredients': [self.ingredient.id],
+            }], format='json'),
+            lambda: self.client.delete(detail_url(self.recipe.id)),
+        ]
+        for change in changes:
+            etag = self.client.get(RECIPES_URL)['ETag']
+            tags_etag = self.client.get(TAGS_URL)['ETag']
+            response = change()
+            self.assertLess(response.status_code, 300)
+
+            self.assertModified(RECIPES_URL, etag)
+            # Tag usage depends on recipes
+            self.assertModified(TAGS_URL, tags_etag)
+
+    def test_tag_changes_modify_tags_and_recipes(self):
+        """Test creating tags changes the tag and recipe ETags only"""
+        for change in (
+            lambda: self.client.post(TAGS_URL, {'name': 'Quick'}),
+            lambda: self.client.post(
+                    TAGS_BULK_URL, {'names': ['Spicy']}, format='json'
+            ),
+        ):
+            etags = {
+                url: self.client.get(url)['ETag']
+                for url in (RECIPES_URL, TAGS_URL, INGREDIENTS_URL)
+            }
+            response = change()
+            self.assertLess(response.status_code, 300)
+
+            self.assertModified(TAGS_URL, etags[TAGS_URL])
+            self.assertModified(RECIPES_URL, etags[RECIPES_URL])
+            self.assertNotModified(INGREDIENTS_URL, etags[INGREDIENTS_URL])
+
+    def test_upload_image_modifies_recipe(self):
+        """Test uploading an image changes the recipe ETag"""
+        url = detail_url(self.recipe.id)
+        etag = self.client.get(url)['ETag']
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            Image.new('RGB', (10, 10)).save(ntf, format='JPEG')
+            ntf.seek(0)
+            self.client.post(
+                    reverse(
+                            'recipe:recipe-upload-image',
+                            args=[self.recipe.id]
+                    ),
+                    {'image': ntf},
+                    format='multipart'
+            )
+        self.recipe.refresh_from_db()
+        self.recipe.image.delete()
+
+        self.assertModified(url, etag)
+
+    @override_settings(
+        DATA_VERSION_CACHE={'CACHE_ALIAS': 'default', 'TTL': 60}
+    )
+    def test_cached_versions_invalidated_on_change(self):
+        """Test changes invalidate the versions cached for the user"""
+        cache.clear()
+        etag = self.client.get(RECIPES_URL)['ETag']
+        self.assertNotModified(RECIPES_URL, etag)
+
+        self.client.patch(detail_url(self.recipe.id), {'title': 'Renamed'})
+
+        self.assertModified(RECIPES_URL, etag)
@@ -0,0 +1,90 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import Recipe, Tag, Ingredient
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class RecipeExpandTests(TestCase):
+    """Test expanding the relations of listed recipes to nested objects"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+                'tester@example.com',
+                'TestPassword'
+        )
+        self.client.force_authenticate(self.user)
+        self.tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ('Vegan', 'Quick')
+        ]
+        self.ingredient = Ingredient.objects.create(
+                user=self.user,
+                name='Salt'
+        )
+
+    def create_recipes(self, count):
+        """Create recipes using every tag and the ingredient"""
+        for i in range(count):
+            recipe = Recipe.objects.create(
+                    user=self.user,
+                    title=f'Recipe{i}',
+                    time_minutes=10,
+                    price=5.00
+            )
+            recipe.tags.add(*reversed(self.tags))
+            recipe.ingredients.add(self.ingredient)
+
+    def test_expand_tags(self):
+        """Test expanded tags are nested, other relations stay primary keys"""
+        self.create_recipes(1)
+
+        response = self.client.get(RECIPES_URL, {'expand': 'tags'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        recipe = response.data['results'][0]
+        self.assertEqual(
+                recipe['tags'],
+                [{'id': tag.id, 'name': tag.name} for tag in self.tags]
+        )
+        self.assertEqual(recipe['ingredients'], [self.ingredient.id])
+
+    def test_expand_unknown_relation(self):
+        """Test expanding an unknown relation is rejected"""
+        response = self.client.get(RECIPES_URL, {'expand': 'tags,owner'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('expand', response.data)
+
+    def test_expand_query_count_is_constant(self):
+        """
+        Test each expanded relation costs one query whatever the page size
+        """
+        for count in (1, 10):
+            self.create_recipes(count)
+            # Data versions, recipe page, tags, ingredients and renditions
+            with self.assertNumQueries(5):
+                response = self.client.get(
+                        RECIPES_URL,
+                        {'expand': 'tags,ingredients'}
+                )
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_expand_matches_serializer(self):
+        """Test both list paths render expanded relations the same"""
+        self.create_recipes(3)
+        params = {'expand': 'ingredients,tags', 'exclude': 'link'}
+        responses = []
+        for fast_list in (True, False):
+            with override_settings(RECIPE_API_FAST_LIST=fast_list):
+                responses.append(self.client.get(RECIPES_URL, params).content)
+
+        self.assertEqual(responses[0], responses[1])
@@ -0,0 +1,136 @@
+import csv
+import io
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import Recipe, Tag, Ingredient
+
+
+EXPORT_URL = reverse('recipe:recipe-export')
+
+
+class RecipeExportTests(TestCase):
+    """Test streaming the recipe library of a user"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+                'tester@example.com',
+                'TestPassword'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Vegan; quick')
+        self.ingredients = [
+            Ingredient.objects.create(user=self.user, name=name)
+            for name in ('Salt', 'Crème')
+        ]
+        self.recipes = []
+        for i in range(5):
+            recipe = Recipe.objects.create(
+                    user=self.user,
+                    title=f'Recipe, {i}',
+                    time_minutes=10 + i,
+                    price=5.5
+            )
+            recipe.tags.add(self.tag)
+            recipe.ingredients.add(*reversed(self.ingredients[:i % 3]))
+            self.recipes.append(recipe)
+
+    def expected_records(self):
+        """Return the exported records of the recipes of the user"""
+        return [
+            {
+                'id': recipe.id,
+                'title': recipe.title,
+                'time_minutes': recipe.time_minutes,
+                'price': '5.50',
+                'link': '',
+                'tags': ['Vegan; quick'],
+                'ingredients': [
+                    ingredient.name for ingredient in self.ingredients[:i % 3]
+                ],
+            }
+            for i, recipe in enumerate(self.recipes)
+        ]
+
+    def test_export_ndjson(self):
+        """Test the recipes of the user are streamed one JSON line each"""
+        other_user = get_user_model().objects.create_user(
+                'other@example.com',
+                'TestPassword'
+        )
+        Recipe.objects.create(
+                user=other_user,
+                title='Other',
+                time_minutes=1,
+                price=1
+        )
+
+        response = self.client.get(EXPORT_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        content = b''.join(response.streaming_content).decode()
+        self.assertEqual(
+                [json.loads(line) for line in content.splitlines()],
+                self.expected_records()
+        )
+
+    def test_export_csv(self):
+        """Test CSV exports keep names with separators intact"""
+        response = self.client.get(EXPORT_URL, {'type': 'csv'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('recipes.csv', response['Content-Disposition'])
+        content = b''.join(response.streaming_content).decode()
+        records = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual(
+                [
+                    dict(
+                        record,
+                        id=int(record['id']),
+                        time_minutes=int(record['time_minutes']),
+                        tags=json.loads(record['tags']),
+                        ingredients=json.loads(record['ingredients'])
+                    )
+                    for record in records
+                ],
+                self.expected_records()
+        )
+
+    def test_export_filtered(self):
+        """Test exports apply the filters of the recipe list"""
+        response = self.client.get(
+                EXPORT_URL,
+                {'ingredients': self.ingredients[1].id}
+        )
+
+        content = b''.join(response.streaming_content).decode()
+        self.assertEqual(
+                [json.loads(line)['id'] for line in content.splitlines()],
+                [self.recipes[2].id]
+        )
+
+    def test_export_unknown_type(self):
+        """Test unknown export types are rejected"""
+        response = self.client.get(EXPORT_URL, {'type': 'xml'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(RECIPE_EXPORT_CHUNK_SIZE=2)
+    def test_export_reads_recipes_in_chunks(self):
+        """Test the relations are read with one query per relation and chunk"""
+        response = self.client.get(EXPORT_URL)
+
+        # Recipes, then tags and ingredients of each of the 3 chunks
+        with self.assertNumQueries(1 + 3 * 2):
+            lines = list(response.streaming_content)
+
+        self.assertEqual(len(lines), 5)
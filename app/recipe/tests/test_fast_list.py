@@ -0,0 +1,99 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import Recipe, RecipeImageRendition, Tag, Ingredient
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class FastRecipeListTests(TestCase):
+    """
+    Test the values() fast path renders recipe lists like RecipeSerializer
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+                'tester@example.com',
+                'TestPassword'
+        )
+        self.client.force_authenticate(self.user)
+        tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ('Vegan', 'Dessert', 'Quick')
+        ]
+        ingredients = [
+            Ingredient.objects.create(user=self.user, name=name)
+            for name in ('Salt', 'Sugar', 'Fish')
+        ]
+        prices = [
+            Decimal(price) for price in ('5.00', '12.50', '0.99', '100.10')
+        ]
+        for i, price in enumerate(prices):
+            recipe = Recipe.objects.create(
+                    user=self.user,
+                    title=f'Fish salad {i}' if i % 2 else f'Cake {i}',
+                    time_minutes=10 + i,
+                    price=price,
+                    link=f'https://example.com/{i}' if i % 2 else ''
+            )
+            # Added out of id order, both paths must sort the related ids
+            recipe.tags.add(*reversed(tags[:i + 1]))
+            recipe.ingredients.add(*reversed(ingredients[i % 2:]))
+            for name in ('medium', 'thumbnail')[:i]:
+                RecipeImageRendition.objects.create(
+                        recipe=recipe,
+                        name=name,
+                        image=f'uploads/recipe/{recipe.id}/{name}.jpg',
+                        width=10,
+                        height=10
+                )
+
+    def assertSameContent(self, params=None, url=RECIPES_URL):
+        """Assert both list paths render the same bytes"""
+        responses = []
+        for fast_list in (True, False):
+            with override_settings(RECIPE_API_FAST_LIST=fast_list):
+                response = self.client.get(url, params or {})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            responses.append(response.content)
+
+        self.assertEqual(responses[0], responses[1])
+
+        return response
+
+    def test_list_matches_serializer(self):
+        """Test a recipe page renders the same as through RecipeSerializer"""
+        response = self.assertSameContent()
+
+        self.assertEqual(len(response.data['results']), 4)
+        self.assertEqual(response.data['results'][0]['price'], '100.10')
+
+    def test_unpaginated_list_matches_serializer(self):
+        """
+        Test an unpaginated list renders the same as through
+        RecipeSerializer
+        """
+        self.assertSameContent({'paginate': 'false'})
+
+    def test_sparse_list_matches_serializer(self):
+        """Test selected and excluded fields render the same"""
+        self.assertSameContent({'fields': 'id,price,tags,renditions'})
+        self.assertSameContent({'exclude': 'ingredients,link'})
+
+    def test_searched_list_matches_serializer(self):
+        """Test ranked search results render in the same order"""
+        self.assertSameContent({'search': 'fish'})
+
+    def test_cursor_pages_match_serializer(self):
+        """Test later pages render the same"""
+        response = self.assertSameContent({'page_size': 2})
+
+        self.assertSameContent(url=response.data['next'])
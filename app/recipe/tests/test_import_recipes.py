@@ -0,0 +1,239 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import DataVersion, Recipe, RecipeImport, Tag, Ingredient
+
+from ..imports import RecipeImporter
+
+
+EXPORT_URL = reverse('recipe:recipe-export')
+
+
+def sample_record(i, **params):
+    """Return an importable recipe record"""
+    record = {
+        'title': f'Recipe {i}',
+        'time_minutes': 10 + i,
+        'price': '5.50',
+        'link': '',
+        'tags': ['Vegan'],
+        'ingredients': ['Salt', f'Spice {i % 2}'],
+    }
+    record.update(params)
+
+    return record
+
+
+class ImportRecipesTests(TestCase):
+    """Test the import_recipes management command"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+                'tester@example.com',
+                'TestPassword'
+        )
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_dump(self, name, content):
+        """Write a dump file and return its path"""
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w', encoding='utf-8') as dump:
+            dump.write(content)
+
+        return path
+
+    def write_ndjson(self, records):
+        return self.write_dump(
+                'recipes.ndjson',
+                ''.join(json.dumps(record) + '\n' for record in records)
+        )
+
+    def import_recipes(self, path, *args):
+        """Run the command and return its error output"""
+        stderr = StringIO()
+        call_command('import_recipes', path, '--user', self.user.email, *args,
+                     stdout=StringIO(), stderr=stderr)
+
+        return stderr.getvalue()
+
+    def test_import_ndjson(self):
+        """Test recipes are imported with their tags and ingredients"""
+        versions = DataVersion.objects.get(user=self.user)
+        path = self.write_ndjson([sample_record(i) for i in range(5)])
+
+        self.import_recipes(path, '--batch-size', '2')
+
+        recipes = Recipe.objects.filter(user=self.user).order_by('id')
+        self.assertEqual(
+                [recipe.title for recipe in recipes],
+                [f'Recipe {i}' for i in range(5)]
+        )
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+        ingredients = Ingredient.objects.filter(user=self.user)
+        self.assertEqual(
+                sorted(ingredients.values_list('name', flat=True)),
+                ['Salt', 'Spice 0', 'Spice 1']
+        )
+        for i, recipe in enumerate(recipes):
+            self.assertEqual(list(recipe.tags.all()), [self.tag])
+            self.assertEqual(
+                    sorted(recipe.ingredients.values_list('name', flat=True)),
+                    ['Salt', f'Spice {i % 2}']
+            )
+        versions.refresh_from_db()
+        self.assertEqual(versions.recipes, 3)
+
+    def test_import_export(self):
+        """Test CSV exports of the recipe API can be imported"""
+        recipe = Recipe.objects.create(
+                user=self.user,
+                title='Soup, "hot"',
+                time_minutes=5,
+                price=2
+        )
+        recipe.tags.add(self.tag)
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get(EXPORT_URL, {'type': 'csv'})
+        path = self.write_dump(
+                'export.csv',
+                b''.join(response.streaming_content).decode()
+        )
+
+        self.import_recipes(path)
+
+        imported = Recipe.objects.filter(user=self.user).exclude(
+                id=recipe.id
+        ).get()
+        self.assertEqual(
+                (imported.title, imported.price),
+                (recipe.title, recipe.price)
+        )
+        self.assertEqual(list(imported.tags.all()), [self.tag])
+
+    def test_invalid_records_are_skipped(self):
+        """Test invalid records are reported and the others imported"""
+        path = self.write_dump('recipes.ndjson', '\n'.join([
+            json.dumps(sample_record(0)),
+            '{"title": ',
+            json.dumps(sample_record(2, price='1000')),
+            json.dumps(sample_record(3, tags=['  '])),
+            json.dumps(sample_record(4)),
+        ]))
+
+        errors = self.import_recipes(path)
+
+        self.assertEqual(
+                [line.split(':')[0] for line in errors.splitlines()],
+                ['Record 2', 'Record 3', 'Record 4']
+        )
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 2)
+        progress = RecipeImport.objects.get(user=self.user)
+        self.assertEqual(progress.records_read, 5)
+
+    def test_resume_interrupted_import(self):
+        """Test resuming an import only inserts the uncommitted batches"""
+        path = self.write_ndjson([sample_record(i) for i in range(5)])
+        import_batch = RecipeImporter.import_batch
+        calls = []
+
+        def interrupted_batch(importer, records):
+            calls.append(records)
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+            return import_batch(importer, records)
+
+        with patch.object(RecipeImporter, 'import_batch', interrupted_batch):
+            with self.assertRaises(KeyboardInterrupt):
+                self.import_recipes(path, '--batch-size', '2')
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 2)
+        with self.assertRaises(CommandError):
+            self.import_recipes(path)
+
+        self.import_recipes(path, '--batch-size', '2', '--resume')
+
+        recipes = Recipe.objects.filter(user=self.user).order_by('id')
+        self.assertEqual(
+                list(recipes.values_list('title', flat=True)),
+                [f'Recipe {i}' for i in range(5)]
+        )
+        progress = RecipeImport.objects.get(user=self.user)
+        self.assertEqual(
+                (
+                    progress.records_read,
+                    progress.recipes_created,
+                    progress.finished,
+                ),
+                (5, 5, True)
+        )
+
+    def test_import_twice(self):
+        """Test a finished import is only repeated with --restart"""
+        path = self.write_ndjson([sample_record(0)])
+        self.import_recipes(path)
+
+        with self.assertRaises(CommandError):
+            self.import_recipes(path, '--resume')
+        self.import_recipes(path, '--restart')
+
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 2)
+
+    def test_names_ignore_case(self):
+        """Test imported names differing only by case reuse the same tag"""
+        path = self.write_ndjson([sample_record(0, tags=['VEGAN', 'vegan'])])
+
+        self.import_recipes(path)
+
+        recipe = Recipe.objects.get(user=self.user)
+        self.assertEqual(list(recipe.tags.all()), [self.tag])
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+
+    def test_deleted_ids_not_reused(self):
+        """Test imported recipes never take the id of a deleted recipe"""
+        path = self.write_ndjson([sample_record(0), sample_record(1)])
+        self.import_recipes(path)
+        deleted = Recipe.objects.filter(user=self.user).latest('id')
+        deleted_id = deleted.id
+        deleted.delete()
+
+        self.import_recipes(path, '--restart')
+
+        self.assertFalse(Recipe.objects.filter(id=deleted_id).exists())
+        created = Recipe.objects.filter(user=self.user, id__gt=deleted_id)
+        self.assertEqual(created.count(), 2)
+
+
+class CopyStatementTests(TestCase):
+    """Test the PostgreSQL COPY statements of recipe imports"""
+
+    def test_empty_strings_not_null(self):
+        """Test empty links are copied as empty strings, not NULL"""
+        user = get_user_model().objects.create_user('tester@example.com')
+        record = sample_record(0)
+        importer = RecipeImporter(user, use_copy=True)
+
+        sql, buffer = importer.copy_statement(
+                Recipe,
+                ['id', 'user_id', 'title', 'time_minutes', 'price', 'link'],
+                [(1, user.pk, record['title'], record['time_minutes'],
+                  record['price'], record['link'])]
+        )
+
+        self.assertTrue(sql.startswith('COPY "core_recipe" ('))
+        self.assertIn('FORCE_NOT_NULL ("title", "link")', sql)
+        self.assertEqual(buffer.read(), f'1,{user.pk},Recipe 0,10,5.50,\r\n')
@@ -45,7 +45,7 @@ class PrivateIngredientsAPITest(TestCase):
         serializer = IngredientSerializer(all_ingredients, many=True)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data['results'], serializer.data)
 
     def test_ingredients_limited_to_authenticated_user(self):
         """Test that returned ingredients for authenticated user"""
@@ -57,11 +57,11 @@ class PrivateIngredientsAPITest(TestCase):
         response = self.client.get(INGREDIENTS_URL)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(response.data['results']), 2)
 
     def test_create_ingredient_successful(self):
         """Test creating a new ingredient"""
-        ingredient_payload = {'name': 'Salt'}
+        ingredient_payload = {'name': 'Pepper'}
         response = self.client.post(INGREDIENTS_URL, ingredient_payload)
         ingredient_exists = Ingredient.objects.filter(
                 user=self.user,
@@ -93,5 +93,44 @@ class PrivateIngredientsAPITest(TestCase):
         serializer1 = IngredientSerializer(self.ingredient_1)
         serializer2 = IngredientSerializer(self.ingredient_2)
 
-        self.assertIn(serializer1.data, response.data)
-        self.assertNotIn(serializer2.data, response.data)
+        self.assertIn(serializer1.data, response.data['results'])
+        self.assertNotIn(serializer2.data, response.data['results'])
+
+    def test_retrieve_ingredients_assigned_unique(self):
+        """Test filtering ingredients by assigned returns unique items"""
+        for title in ('Eggs benedict', 'Coriander eggs on toast'):
+            recipe = Recipe.objects.create(
+                    title=title,
+                    time_minutes=30,
+                    price=12.00,
+                    user=self.user
+            )
+            recipe.ingredients.add(self.ingredient_1)
+
+        response = self.client.get(INGREDIENTS_URL, {'assigned_only': 1})
+
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_retrieve_ingredients_with_counts(self):
+        """
+        Test ingredients are annotated with the number of recipes using
+        them
+        """
+        recipe = Recipe.objects.create(
+                title='Kale salad',
+                time_minutes=10,
+                price=4.00,
+                user=self.user
+        )
+        recipe.ingredients.add(self.ingredient_1, self.ingredient_2)
+
+        response = self.client.get(INGREDIENTS_URL, {'with_counts': 1})
+
+        counts = {
+            item['id']: item['recipe_count']
+            for item in response.data['results']
+        }
+        self.assertEqual(
+                counts,
+                {self.ingredient_1.id: 1, self.ingredient_2.id: 1}
+        )
@@ -0,0 +1,100 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import Recipe, Tag
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def sample_recipe(user, **params):
+    """Create and return a sample recipe"""
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': 5.00,
+    }
+    defaults.update(params)
+
+    return Recipe.objects.create(user=user, **defaults)
+
+
+@override_settings(RECIPE_API_PAGE_SIZE=2, RECIPE_API_MAX_PAGE_SIZE=3)
+class CursorPaginationTests(TestCase):
+    """Test keyset pagination of the recipe API list endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+                'tester@example.com',
+                'TestPassword'
+        )
+        self.client.force_authenticate(self.user)
+
+    def _walk(self, url, params=None):
+        """Follow next links and return the ids of every page"""
+        pages = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append([item['id'] for item in response.data['results']])
+            if not response.data['next']:
+                return pages
+            response = self.client.get(response.data['next'])
+
+    def test_recipes_paginated_newest_first(self):
+        """Test walking every page returns each recipe exactly once"""
+        recipes = [
+            sample_recipe(self.user, title=f'Recipe{i}') for i in range(5)
+        ]
+
+        pages = self._walk(RECIPES_URL)
+
+        expected = [recipe.id for recipe in reversed(recipes)]
+        self.assertEqual(pages, [expected[0:2], expected[2:4], expected[4:]])
+
+    def test_tags_paginated_by_name(self):
+        """Test walking every page returns tags in descending name order"""
+        tags = [
+            Tag.objects.create(user=self.user, name=name) for name in 'ACEBD'
+        ]
+
+        pages = self._walk(TAGS_URL)
+
+        ids = [tag_id for page in pages for tag_id in page]
+        tags.sort(key=lambda tag: tag.name, reverse=True)
+        self.assertEqual(ids, [tag.id for tag in tags])
+
+    def test_page_size_capped(self):
+        """Test the requested page size cannot exceed the configured cap"""
+        for i in range(5):
+            sample_recipe(self.user)
+
+        response = self.client.get(RECIPES_URL, {'page_size': 100})
+
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_pagination_opt_out(self):
+        """Test clients can ask for the whole unpaginated list"""
+        for i in range(5):
+            sample_recipe(self.user)
+
+        response = self.client.get(RECIPES_URL, {'paginate': 'false'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 5)
+
+    def test_later_page_query_count(self):
+        """Test fetching a later page costs the same as the first one"""
+        for i in range(6):
+            sample_recipe(self.user)
+        response = self.client.get(RECIPES_URL)
+        response = self.client.get(response.data['next'])
+
+        with self.assertNumQueries(4):
+            self.client.get(response.data['next'])
@@ -0,0 +1,240 @@
+import tempfile
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import Recipe, Tag, Ingredient
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+TAGS_BULK_URL = reverse('recipe:tag-bulk')
+INGREDIENTS_BULK_URL = reverse('recipe:ingredient-bulk')
+ME_URL = reverse('users:me')
+
+
+def detail_url(recipe_id):
+    """Return recipe detail URL"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def image_upload_url(recipe_id):
+    """Return URL for recipe image upload"""
+    return reverse('recipe:recipe-upload-image', args=[recipe_id])
+
+
+def sample_recipe(user, tags=(), ingredients=(), **params):
+    """Create and return a sample recipe with the given relations"""
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': 5.00,
+    }
+    defaults.update(params)
+    recipe = Recipe.objects.create(user=user, **defaults)
+    recipe.tags.set(tags)
+    recipe.ingredients.set(ingredients)
+
+    return recipe
+
+
+class EndpointQueryCountTests(TestCase):
+    """
+    Pin the number of SQL queries issued by every endpoint.
+    The token authentication cache is warm, so no count includes the
+    token lookup.
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+                'tester@example.com',
+                'TestPassword'
+        )
+        token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.tags = [
+            Tag.objects.create(user=self.user, name=f'Tag{i}')
+            for i in range(3)
+        ]
+        self.ingredients = [
+            Ingredient.objects.create(user=self.user, name=f'Ingredient{i}')
+            for i in range(3)
+        ]
+        self.client.get(ME_URL)
+
+    def _create_recipes(self, count):
+        """Create recipes that all use every sample tag and ingredient"""
+        return [
+            sample_recipe(
+                    self.user, self.tags, self.ingredients, title=f'Recipe{i}'
+            )
+            for i in range(count)
+        ]
+
+    def test_list_recipes_query_count_is_constant(self):
+        """Test listing recipes does not issue a query per recipe"""
+        for count in (1, 10):
+            self._create_recipes(count)
+            with self.assertNumQueries(4):
+                response = self.client.get(RECIPES_URL)
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(RECIPE_API_FAST_LIST=False)
+    def test_list_recipes_serializer_path_query_count(self):
+        """
+        Test listing recipes through RecipeSerializer prefetches each
+        relation
+        """
+        self._create_recipes(10)
+        with self.assertNumQueries(5):
+            response = self.client.get(RECIPES_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_recipes_filtered_query_count(self):
+        """Test filtering recipes by tags and ingredients"""
+        self._create_recipes(5)
+        params = {
+            'tags': f'{self.tags[0].id}',
+            'ingredients': f'{self.ingredients[0].id}',
+        }
+        with self.assertNumQueries(4):
+            response = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_retrieve_recipe_query_count(self):
+        """Test retrieving a recipe with nested relations"""
+        recipe = self._create_recipes(1)[0]
+        with self.assertNumQueries(5):
+            response = self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['tags']), 3)
+        self.assertEqual(len(response.data['ingredients']), 3)
+
+    def test_create_recipe_query_count(self):
+        """Test creating a recipe with tags and ingredients"""
+        payload = {
+            'title': 'Chocolate cheesecake',
+            'tags': [tag.id for tag in self.tags],
+            'ingredients': [ingredient.id for ingredient in self.ingredients],
+            'time_minutes': 30,
+            'price': 5.00,
+        }
+        with self.assertNumQueries(11):
+            response = self.client.post(RECIPES_URL, payload)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_partial_update_recipe_query_count(self):
+        """Test updating a recipe with patch"""
+        recipe = self._create_recipes(1)[0]
+        payload = {'title': 'Chicken tikka'}
+        with self.assertNumQueries(8):
+            response = self.client.patch(detail_url(recipe.id), payload)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_delete_recipe_query_count(self):
+        """Test deleting a recipe"""
+        recipe = self._create_recipes(1)[0]
+        with self.assertNumQueries(6):
+            response = self.client.delete(detail_url(recipe.id))
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+    def test_upload_image_query_count(self):
+        """Test uploading an image to a recipe"""
+        recipe = self._create_recipes(1)[0]
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            Image.new('RGB', (10, 10)).save(ntf, format='JPEG')
+            ntf.seek(0)
+            with self.assertNumQueries(5):
+                response = self.client.post(
+                        image_upload_url(recipe.id),
+                        {'image': ntf},
+                        format='multipart'
+                )
+        recipe.refresh_from_db()
+        recipe.image.delete()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_tags_and_ingredients_query_count(self):
+        """Test listing tags and ingredients"""
+        self._create_recipes(5)
+        for url in (TAGS_URL, INGREDIENTS_URL):
+            with self.assertNumQueries(2):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+            with self.assertNumQueries(2):
+                response = self.client.get(url, {'assigned_only': 1})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+            with self.assertNumQueries(2):
+                response = self.client.get(url, {'with_counts': 1})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_create_tag_and_ingredient_query_count(self):
+        """Test creating a tag and an ingredient"""
+        for url in (TAGS_URL, INGREDIENTS_URL):
+            with self.assertNumQueries(4):
+                response = self.client.post(url, {'name': 'Vegan'})
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_bulk_get_or_create_tags_and_ingredients_query_count(self):
+        """Test resolving names costs the same however many are given"""
+        for url in (TAGS_BULK_URL, INGREDIENTS_BULK_URL):
+            names = [f'Name{i}' for i in range(50)]
+            # Insert, data versions, keys of the names and lookup, within a
+            # savepoint of the test transaction
+            with self.assertNumQueries(6):
+                response = self.client.post(
+                        url,
+                        {'names': names},
+                        format='json'
+                )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_conditional_list_query_count(self):
+        """Test unchanged lists are answered from the data versions only"""
+        self._create_recipes(5)
+        for url in (RECIPES_URL, TAGS_URL, INGREDIENTS_URL):
+            etag = self.client.get(url)['ETag']
+            with self.assertNumQueries(1):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(
+                    response.status_code,
+                    status.HTTP_304_NOT_MODIFIED
+            )
+
+    @override_settings(
+        DATA_VERSION_CACHE={'CACHE_ALIAS': 'default', 'TTL': 60}
+    )
+    def test_conditional_list_query_count_with_cache(self):
+        """Test unchanged lists need no query once the versions are cached"""
+        self._create_recipes(5)
+        etag = self.client.get(RECIPES_URL)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_retrieve_me_query_count(self):
+        """Test retrieving the authenticated user profile"""
+        with self.assertNumQueries(0):
+            response = self.client.get(ME_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
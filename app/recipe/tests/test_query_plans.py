@@ -0,0 +1,152 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+def explain(sql):
+    """Return the query plan of an executed SQL statement as text"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # Tiny test tables are always cheaper to scan sequentially
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(f'EXPLAIN {sql}')
+        else:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        rows = cursor.fetchall()
+
+    # SQLite reports the plan in the last column of each row
+    return '\n'.join(str(row[-1]) for row in rows)
+
+
+def unique_index(table, constraint):
+    """Return the name of the index backing a unique constraint"""
+    if connection.vendor == 'sqlite':
+        # Created inline with the table, so SQLite names it itself
+        return f'sqlite_autoindex_{table}_'
+
+    return constraint
+
+
+def search_index():
+    """Return how the plan names the full-text index of recipe titles"""
+    if connection.vendor == 'sqlite':
+        # FTS5 tables answer MATCH constraints through their own index
+        return 'core_recipe_search VIRTUAL TABLE INDEX'
+
+    return 'core_recipe_search_vector_idx'
+
+
+def prefix_index(table):
+    """Return the name of the case-insensitive prefix index of a table"""
+    if connection.vendor == 'sqlite':
+        return f'{table}_user_nocase_name_idx'
+
+    return f'{table}_user_upper_name_idx'
+
+
+class EndpointQueryPlanTests(TestCase):
+    """Test the hot per-user queries of each endpoint use their indexes"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+                'tester@example.com',
+                'TestPassword'
+        )
+        self.client.force_authenticate(self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        recipe = Recipe.objects.create(
+                user=self.user,
+                title='Sample recipe',
+                time_minutes=10,
+                price=5.00
+        )
+        recipe.tags.add(tag)
+        recipe.ingredients.add(ingredient)
+        self.tag = tag
+        self.ingredient = ingredient
+
+    def assertIndexUsed(self, url, params, table, index):
+        """Assert the query of an endpoint reading from table uses index"""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, params)
+        statements = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('SELECT')
+            and f'FROM "{table}"' in query['sql']
+        ]
+
+        self.assertTrue(statements, f'No query reads from {table}')
+        plan = explain(statements[0])
+        self.assertIn(index, plan)
+
+    def test_list_tags_uses_user_name_index(self):
+        """Test listing tags uses the unique (user, name) index"""
+        self.assertIndexUsed(
+                TAGS_URL, {},
+                'core_tag',
+                unique_index('core_tag', 'core_tag_unique_user_name')
+        )
+
+    def test_list_ingredients_uses_user_name_index(self):
+        """Test listing ingredients uses the unique (user, name) index"""
+        self.assertIndexUsed(
+                INGREDIENTS_URL, {},
+                'core_ingredient',
+                unique_index(
+                        'core_ingredient',
+                        'core_ingredient_unique_user_name'
+                )
+        )
+
+    def test_list_recipes_uses_user_id_index(self):
+        """Test listing recipes uses the (user, id) index"""
+        self.assertIndexUsed(
+                RECIPES_URL, {},
+                'core_recipe', 'core_recipe_user_id_idx'
+        )
+
+    def test_filter_recipes_by_tags_uses_reverse_index(self):
+        """Test filtering recipes by tags reads the (tag, recipe) index"""
+        self.assertIndexUsed(
+                RECIPES_URL, {'tags': self.tag.id},
+                'core_recipe', 'core_recipe_tags_tag_id_recipe_id_idx'
+        )
+
+    def test_filter_recipes_by_ingredients_uses_reverse_index(self):
+        """
+        Test filtering recipes by ingredients reads the (ingredient,
+        recipe) index
+        """
+        self.assertIndexUsed(
+                RECIPES_URL,
+                {'ingredients': self.ingredient.id, 'match': 'all'},
+                'core_recipe',
+                'core_recipe_ingredients_ingredient_id_recipe_id_idx'
+        )
+
+    def test_search_recipes_uses_full_text_index(self):
+        """Test searching recipes reads the full-text index"""
+        self.assertIndexUsed(
+                RECIPES_URL, {'search': 'sample'},
+                'core_recipe', search_index()
+        )
+
+    def test_autocomplete_uses_prefix_index(self):
+        """Test autocompleting names reads the case-insensitive prefix index"""
+        self.assertIndexUsed(
+                reverse('recipe:ingredient-autocomplete'), {'q': 'sa'},
+                'core_ingredient', prefix_index('core_ingredient')
+        )
@@ -1,10 +1,15 @@
 import tempfile
 import os
+import shutil
+import stat
+from unittest.mock import patch
 
-from PIL import Image
+from PIL import Image, ImageFile
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework.test import APIClient
@@ -16,6 +21,7 @@ from ..serializers import RecipeSerializer, RecipeDetailSerializer
 
 
 RECIPES_URL = reverse('recipe:recipe-list')
+RECIPES_BULK_URL = reverse('recipe:recipe-bulk')
 
 
 def image_upload_url(recipe_id):
@@ -85,7 +91,7 @@ class PrivateRecipeAPITests(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data['results'], serializer.data)
 
     def test_recipes_limited_to_user(self):
         """Test retrieving recipes for user"""
@@ -102,8 +108,8 @@ class PrivateRecipeAPITests(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'], serializer.data)
 
     def test_view_recipe_detail(self):
         """Test viewing a recipe detail"""
@@ -169,6 +175,40 @@ class PrivateRecipeAPITests(TestCase):
         self.assertIn(ingredients1, ingredients)
         self.assertIn(ingredients2, ingredients)
 
+    def test_create_recipe_with_other_user_tag(self):
+        """Test tags of other users cannot be assigned to a recipe"""
+        user2 = get_user_model().objects.create_user(
+                'tester2@example.com',
+                'TestPassword'
+        )
+        tag = sample_tag(user=user2)
+        payload = {
+            'title': 'Avocado lime cheesecake',
+            'tags': [tag.id],
+            'time_minutes': 60,
+            'price': 20.00
+        }
+        response = self.client.post(RECIPES_URL, payload)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_create_recipe_reports_every_missing_ingredient(self):
+        """Test all unknown ingredient ids are reported at once"""
+        ingredient = sample_ingredients(user=self.user)
+        payload = {
+            'title': 'Thai prawn red curry',
+            'ingredients': [ingredient.id, 998, 999],
+            'time_minutes': 20,
+            'price': 7.00
+        }
+        response = self.client.post(RECIPES_URL, payload)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(response.data['ingredients']), 2)
+        self.assertIn('998', response.data['ingredients'][0])
+        self.assertIn('999', response.data['ingredients'][1])
+
     def test_partial_update_recipe(self):
         """Test updating a recipe with patch"""
         recipe = sample_recipe(user=self.user)
@@ -218,9 +258,9 @@ class PrivateRecipeAPITests(TestCase):
         serializer2 = RecipeSerializer(recipe2)
         serializer3 = RecipeSerializer(recipe3)
 
-        self.assertIn(serializer1.data, response.data)
-        self.assertIn(serializer2.data, response.data)
-        self.assertNotIn(serializer3.data, response.data)
+        self.assertIn(serializer1.data, response.data['results'])
+        self.assertIn(serializer2.data, response.data['results'])
+        self.assertNotIn(serializer3.data, response.data['results'])
 
     def test_filter_recipes_by_ingredients(self):
         """Test returning recipes with specific ingredients"""
@@ -238,15 +278,170 @@ class PrivateRecipeAPITests(TestCase):
         serializer2 = RecipeSerializer(recipe2)
         serializer3 = RecipeSerializer(recipe3)
 
-        self.assertIn(serializer1.data, response.data)
-        self.assertIn(serializer2.data, response.data)
-        self.assertNotIn(serializer3.data, response.data)
+        self.assertIn(serializer1.data, response.data['results'])
+        self.assertIn(serializer2.data, response.data['results'])
+        self.assertNotIn(serializer3.data, response.data['results'])
+
+    def test_filter_recipes_matching_several_tags_not_duplicated(self):
+        """Test a recipe matching several requested tags is returned once"""
+        recipe = sample_recipe(user=self.user)
+        tag1 = sample_tag(self.user, name='Tag1')
+        tag2 = sample_tag(self.user, name='Tag2')
+        recipe.tags.add(tag1, tag2)
+
+        response = self.client.get(
+                RECIPES_URL,
+                {'tags': f'{tag1.id},{tag2.id}'}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_filter_recipes_matching_all_tags(self):
+        """Test match=all only returns recipes having every requested tag"""
+        recipe1 = sample_recipe(user=self.user, title='Recipe1')
+        recipe2 = sample_recipe(user=self.user, title='Recipe2')
+        tag1 = sample_tag(self.user, name='Tag1')
+        tag2 = sample_tag(self.user, name='Tag2')
+        recipe1.tags.add(tag1, tag2)
+        recipe2.tags.add(tag1)
+
+        response = self.client.get(
+                RECIPES_URL,
+                {'tags': f'{tag1.id},{tag2.id},{tag1.id}', 'match': 'all'}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+                response.data['results'],
+                [RecipeSerializer(recipe1).data]
+        )
+
+    def test_filter_recipes_invalid_params(self):
+        """Test invalid filter parameters are rejected with a bad request"""
+        invalid_params = [
+            {'tags': '1,abc'},
+            {'ingredients': '-1'},
+            {'tags': ','.join(str(i) for i in range(1, 102))},
+            {'tags': '1', 'match': 'some'},
+        ]
+        for params in invalid_params:
+            response = self.client.get(RECIPES_URL, params)
+
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RecipeSearchTests(TestCase):
+    """Test searching recipes by title"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+                'tester@example.com',
+                'TestPassword'
+        )
+        self.client.force_authenticate(self.user)
+
+    def search(self, query, **params):
+        """Search recipes and return the titles of the results in order"""
+        response = self.client.get(RECIPES_URL, {'search': query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        return [recipe['title'] for recipe in response.data['results']]
+
+    def test_search_matches_every_word(self):
+        """Test only recipes containing every searched word are returned"""
+        sample_recipe(self.user, title='Tomato soup')
+        sample_recipe(self.user, title='Tomato salad')
+        sample_recipe(self.user, title='Onion soup')
+
+        self.assertEqual(self.search('tomato soup'), ['Tomato soup'])
+        self.assertEqual(self.search('SOUP'), ['Onion soup', 'Tomato soup'])
+
+    def test_search_stems_words(self):
+        """Test words match their other forms"""
+        sample_recipe(self.user, title='Baked potatoes')
+
+        self.assertEqual(self.search('potato bake'), ['Baked potatoes'])
+
+    def test_search_ranks_by_relevance(self):
+        """Test better matches come first, whatever their age"""
+        sample_recipe(self.user, title='Curry curry curry')
+        sample_recipe(
+                self.user,
+                title='Chicken with a curry sauce and rice on the side'
+        )
+
+        self.assertEqual(self.search('curry')[0], 'Curry curry curry')
+
+    def test_search_pages_in_relevance_order(self):
+        """Test paging through a search returns every result once"""
+        for i in range(5):
+            title = ' '.join(['Stew'] * (i + 1) + ['with', 'beans'])
+            sample_recipe(self.user, title=title)
+        sample_recipe(self.user, title='Salad')
+
+        titles = []
+        response = self.client.get(
+                RECIPES_URL,
+                {'search': 'stew', 'page_size': 2}
+        )
+        while True:
+            titles += [recipe['title'] for recipe in response.data['results']]
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+
+        self.assertEqual(titles, self.search('stew', page_size=10))
+        self.assertEqual(len(titles), 5)
+
+    def test_search_combined_with_filters(self):
+        """Test searches only return recipes matching the other filters"""
+        tag = sample_tag(self.user, name='Vegan')
+        vegan = sample_recipe(self.user, title='Lentil soup')
+        vegan.tags.add(tag)
+        sample_recipe(self.user, title='Chicken soup')
+
+        self.assertEqual(self.search('soup', tags=tag.id), ['Lentil soup'])
+
+    def test_search_follows_title_changes(self):
+        """Test the search index is kept up to date with recipe titles"""
+        recipe = sample_recipe(self.user, title='Pancakes')
+        recipe.title = 'Waffles'
+        recipe.save()
+
+        self.assertEqual(self.search('pancakes'), [])
+        self.assertEqual(self.search('waffles'), ['Waffles'])
+
+    def test_search_other_users_recipes_excluded(self):
+        """Test searches only return the recipes of the user"""
+        other_user = get_user_model().objects.create_user(
+                'other@example.com',
+                'TestPassword'
+        )
+        sample_recipe(other_user, title='Secret soup')
+
+        self.assertEqual(self.search('soup'), [])
+
+    def test_search_operators_taken_literally(self):
+        """Test search syntax in the query is not interpreted"""
+        sample_recipe(self.user, title='Fish and chips')
+
+        self.assertEqual(self.search('fish OR "salad'), [])
+        self.assertEqual(self.search('fish chips*'), ['Fish and chips'])
 
 
 class RecipeImageUploadTests(TestCase):
     """Test uploading images to specific recipe through the recipe API"""
 
     def setUp(self):
+        # Uploads are stored in a directory of each test, removed after it
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media_settings = override_settings(MEDIA_ROOT=media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
         self.client = APIClient()
         self.user = get_user_model().objects.create_user(
                 'tester@example.com',
@@ -255,9 +450,6 @@ class RecipeImageUploadTests(TestCase):
         self.client.force_authenticate(self.user)
         self.recipe = sample_recipe(self.user)
 
-    def tearDown(self):
-        self.recipe.image.delete()
-
     def test_upload_image_to_recipe(self):
         """
         Test uploading an image to recipe
@@ -276,9 +468,186 @@ class RecipeImageUploadTests(TestCase):
         self.assertIn('image', response.data)
         self.assertTrue(os.path.exists(self.recipe.image.path))
 
+    def test_uploaded_image_readable(self):
+        """Test stored images are readable by the web server serving them"""
+        self.upload(Image.new('RGB', (10, 10)))
+
+        self.recipe.refresh_from_db()
+        mode = stat.S_IMODE(os.stat(self.recipe.image.path).st_mode)
+        self.assertEqual(mode, 0o644)
+
     def test_upload_image_bad_request(self):
         """Test uploading an invalid image"""
         url = image_upload_url(self.recipe.id)
         response = self.client.post(url, {'image': 'not image'}, format='multipart')
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def upload(self, image, image_format='JPEG', **params):
+        """Upload an image to the recipe and return the response"""
+        with tempfile.NamedTemporaryFile(suffix='.img') as ntf:
+            image.save(ntf, format=image_format, **params)
+            ntf.seek(0)
+            return self.client.post(
+                    image_upload_url(self.recipe.id),
+                    {'image': ntf},
+                    format='multipart'
+            )
+
+    def test_upload_image_validated_from_header(self):
+        """Test uploaded images are validated without decoding their pixels"""
+        decoded = AssertionError('decoded')
+        with patch.object(ImageFile.ImageFile, 'load', side_effect=decoded):
+            response = self.upload(Image.new('RGB', (10, 10)))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(RECIPE_IMAGE_MAX_UPLOAD_SIZE=1024)
+    def test_upload_image_too_large(self):
+        """Test uploads are aborted past the maximum upload size"""
+        noise = Image.frombytes('RGB', (64, 64), os.urandom(64 * 64 * 3))
+        response = self.upload(noise, 'PNG')
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(
+                response.status_code,
+                status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
+        self.assertFalse(self.recipe.image)
+
+    @override_settings(RECIPE_IMAGE_MAX_PIXELS=50)
+    def test_upload_image_too_many_pixels(self):
+        """Test images with too many pixels are rejected before decoding"""
+        response = self.upload(Image.new('RGB', (10, 10)))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('image', response.data)
+
+    def test_upload_multi_picture_jpeg(self):
+        """Test multi-picture JPEGs of phone cameras are accepted as JPEG"""
+        second = Image.new('RGB', (10, 10), 'red')
+        response = self.upload(
+                Image.new('RGB', (10, 10)),
+                'MPO',
+                save_all=True,
+                append_images=[second]
+        )
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(os.path.exists(self.recipe.image.path))
+
+    def test_upload_image_unsupported_format(self):
+        """
+        Test images in formats other than RECIPE_IMAGE_FORMATS are rejected
+        """
+        response = self.upload(Image.new('RGB', (10, 10)), 'GIF')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('image', response.data)
+
+
+class RecipeBulkCreateTests(TestCase):
+    """Test creating many recipes with a single request"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+                'tester@example.com',
+                'TestPassword'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = sample_tag(user=self.user)
+        self.ingredient = sample_ingredients(user=self.user)
+
+    def _payload(self, count, **params):
+        """Return a list of valid recipe payloads"""
+        payload = []
+        for i in range(count):
+            recipe = {
+                'title': f'Recipe{i}',
+                'tags': [self.tag.id],
+                'ingredients': [self.ingredient.id],
+                'time_minutes': 10,
+                'price': '5.00',
+            }
+            recipe.update(params)
+            payload.append(recipe)
+
+        return payload
+
+    def test_bulk_create_recipes(self):
+        """Test creating a list of recipes with their relations"""
+        response = self.client.post(
+                RECIPES_BULK_URL,
+                self._payload(3),
+                format='json'
+        )
+
+        recipes = Recipe.objects.filter(user=self.user).order_by('id')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['errors'], [])
+        self.assertEqual(
+                response.data['created'],
+                RecipeSerializer(recipes, many=True).data
+        )
+        for recipe in recipes:
+            self.assertEqual(list(recipe.tags.all()), [self.tag])
+            self.assertEqual(list(recipe.ingredients.all()), [self.ingredient])
+
+    def test_bulk_create_query_count_is_constant(self):
+        """Test related objects are validated once for the whole batch"""
+        with CaptureQueriesContext(connection) as small_batch:
+            self.client.post(RECIPES_BULK_URL, self._payload(2), format='json')
+        with CaptureQueriesContext(connection) as large_batch:
+            self.client.post(
+                    RECIPES_BULK_URL,
+                    self._payload(10),
+                    format='json'
+            )
+
+        recipe_inserts = 8
+        if connection.features.can_return_ids_from_bulk_insert:
+            recipe_inserts = 0
+        self.assertEqual(len(large_batch), len(small_batch) + recipe_inserts)
+
+    def test_bulk_create_invalid_item_rejects_batch(self):
+        """Test one invalid recipe rejects the whole list by default"""
+        payload = self._payload(2) + [{'title': 'No time', 'tags': [999]}]
+
+        response = self.client.post(RECIPES_BULK_URL, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+                [error['index'] for error in response.data['errors']],
+                [2]
+        )
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_create_partial(self):
+        """Test valid recipes are kept when partial success is allowed"""
+        payload = self._payload(1) + [{'title': 'No time'}] + self._payload(1)
+
+        response = self.client.post(
+                f'{RECIPES_BULK_URL}?allow_partial=true',
+                payload,
+                format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data['created']), 2)
+        self.assertEqual(response.data['errors'][0]['index'], 1)
+        self.assertIn('time_minutes', response.data['errors'][0]['errors'])
+        self.assertEqual(Recipe.objects.count(), 2)
+
+    @override_settings(RECIPE_API_MAX_BULK_SIZE=2)
+    def test_bulk_create_size_limited(self):
+        """Test lists larger than the configured maximum are rejected"""
+        response = self.client.post(
+                RECIPES_BULK_URL,
+                self._payload(3),
+                format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Recipe.objects.exists())
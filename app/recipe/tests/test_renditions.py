@@ -0,0 +1,157 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import Recipe, RecipeImageRendition
+
+from ..renditions import generate_renditions, submit_renditions
+
+
+RENDITIONS = {
+    'thumbnail': {'size': (20, 20), 'format': 'JPEG'},
+    'medium': {'size': (50, 50), 'format': 'PNG'},
+}
+
+
+def sample_image(size=(100, 60), image_format='JPEG'):
+    """Return an uploaded image file of the given size"""
+    with tempfile.TemporaryFile() as image_file:
+        image = Image.new('RGB', size, color='red')
+        image.save(image_file, format=image_format)
+        image_file.seek(0)
+        return SimpleUploadedFile(
+                'image.jpg',
+                image_file.read(),
+                content_type='image/jpeg'
+        )
+
+
+@override_settings(RECIPE_IMAGE_RENDITIONS=RENDITIONS)
+class RecipeRenditionTests(TestCase):
+    """Test generating resized renditions of recipe images"""
+
+    def setUp(self):
+        # Images are stored in a directory of each test, removed after it
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media_settings = override_settings(MEDIA_ROOT=media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+                'tester@example.com',
+                'TestPassword'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+                user=self.user,
+                title='Sample recipe',
+                time_minutes=10,
+                price=5.00,
+                image=sample_image()
+        )
+
+    def test_generate_renditions(self):
+        """Test every configured rendition fits in its size"""
+        renditions = generate_renditions(self.recipe.id)
+
+        sizes = {
+            rendition.name: (rendition.width, rendition.height)
+            for rendition in renditions
+        }
+        self.assertEqual(sizes, {'thumbnail': (20, 12), 'medium': (50, 30)})
+        medium = RecipeImageRendition.objects.get(
+                recipe=self.recipe,
+                name='medium'
+        )
+        with Image.open(medium.image.path) as image:
+            self.assertEqual(image.format, 'PNG')
+
+    def test_generate_renditions_of_replaced_image(self):
+        """Test renditions queued for a replaced image are not generated"""
+        renditions = generate_renditions(
+                self.recipe.id,
+                image_name='uploads/recipe/old.jpg'
+        )
+
+        self.assertEqual(renditions, [])
+        self.assertFalse(RecipeImageRendition.objects.exists())
+
+    def test_renditions_listed_when_ready(self):
+        """Test the recipe API lists the rendition urls once generated"""
+        url = reverse('recipe:recipe-detail', args=[self.recipe.id])
+        response = self.client.get(url)
+        self.assertEqual(response.data['renditions'], {})
+
+        generate_renditions(self.recipe.id)
+        response = self.client.get(url)
+
+        renditions = response.data['renditions']
+        self.assertEqual(set(renditions), {'thumbnail', 'medium'})
+        self.assertTrue(
+                renditions['thumbnail'].startswith('http://testserver/')
+        )
+
+    @patch('recipe.renditions.submit_renditions')
+    @patch(
+        'django.db.transaction.on_commit',
+        side_effect=lambda callback: callback()
+    )
+    def test_upload_queues_renditions(self, on_commit, submit):
+        """Test uploading an image drops old renditions and queues new ones"""
+        generate_renditions(self.recipe.id)
+        url = reverse('recipe:recipe-upload-image', args=[self.recipe.id])
+
+        response = self.client.post(
+                url,
+                {'image': sample_image()},
+                format='multipart'
+        )
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['renditions'], {})
+        submit.assert_called_once_with(self.recipe.id, self.recipe.image.name)
+
+    @override_settings(RECIPE_IMAGE_QUEUE_SIZE=0)
+    @patch('recipe.renditions._slots', None)
+    @patch('recipe.renditions._executor', None)
+    def test_full_queue_rejects_jobs(self):
+        """Test jobs are rejected instead of queued without bound"""
+        with self.assertLogs('recipe.renditions', 'INFO') as logs:
+            submitted = submit_renditions(
+                    self.recipe.id,
+                    self.recipe.image.name
+            )
+
+        self.assertFalse(submitted)
+        self.assertEqual(
+                logs.output,
+                [
+                    'WARNING:recipe.renditions:'
+                    f'Rendition queue full, skipping recipe {self.recipe.id}'
+                ]
+        )
+
+    def test_generate_missing_renditions_command(self):
+        """
+        Test the command generates the renditions of every image missing
+        some
+        """
+        call_command('generate_recipe_renditions', stdout=StringIO())
+
+        renditions = RecipeImageRendition.objects.filter(recipe=self.recipe)
+        self.assertEqual(renditions.count(), 2)
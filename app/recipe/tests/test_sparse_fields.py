@@ -0,0 +1,120 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import Recipe, Tag, Ingredient
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def detail_url(recipe_id):
+    """Return recipe detail URL"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+class SparseFieldsetTests(TestCase):
+    """Test selecting the fields rendered by the recipe API"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+                'tester@example.com',
+                'TestPassword'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.ingredient = Ingredient.objects.create(
+                user=self.user,
+                name='Salt'
+        )
+        for i in range(3):
+            recipe = Recipe.objects.create(
+                    user=self.user,
+                    title=f'Recipe{i}',
+                    time_minutes=10,
+                    price=5.00
+            )
+            recipe.tags.add(self.tag)
+            recipe.ingredients.add(self.ingredient)
+
+    def get(self, url, params):
+        """Return the response and the recipe queries of a request"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        return response, [
+            query['sql'] for query in queries
+            if 'core_dataversion' not in query['sql']
+        ]
+
+    def test_list_selected_fields(self):
+        """Test a titles only list is one query reading only those columns"""
+        response, queries = self.get(RECIPES_URL, {'fields': 'id,title'})
+
+        self.assertEqual(
+                [recipe for recipe in response.data['results']],
+                [{'id': recipe.id, 'title': recipe.title}
+                 for recipe in Recipe.objects.order_by('-id')]
+        )
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('price', queries[0])
+
+    def test_list_excluded_fields(self):
+        """Test excluded relations are not prefetched"""
+        response, queries = self.get(
+                RECIPES_URL,
+                {'exclude': 'ingredients,renditions,link'}
+        )
+
+        self.assertEqual(
+                set(response.data['results'][0]),
+                {'id', 'title', 'tags', 'time_minutes', 'price'}
+        )
+        self.assertEqual(response.data['results'][0]['tags'], [self.tag.id])
+        self.assertEqual(len(queries), 2)
+        self.assertFalse(
+                any('core_recipe_ingredients' in query for query in queries)
+        )
+
+    def test_retrieve_selected_fields(self):
+        """Test selecting the fields of a recipe detail"""
+        recipe = Recipe.objects.first()
+        response, queries = self.get(
+                detail_url(recipe.id),
+                {'fields': 'title,tags'}
+        )
+
+        self.assertEqual(response.data, {
+            'title': recipe.title,
+            'tags': [{'id': self.tag.id, 'name': self.tag.name}],
+        })
+        self.assertEqual(len(queries), 2)
+
+    def test_unknown_fields_rejected(self):
+        """Test selecting fields the serializer does not have fails"""
+        for params in ({'fields': 'title,secret'}, {'exclude': 'user'}):
+            response = self.client.get(RECIPES_URL, params)
+
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_tags_selected_fields_paginate(self):
+        """Test tag lists keep paginating by name with sparse fields"""
+        Tag.objects.create(user=self.user, name='Quick')
+        response, queries = self.get(
+                TAGS_URL,
+                {'fields': 'id', 'page_size': 1}
+        )
+        self.assertEqual(response.data['results'], [{'id': self.tag.id}])
+
+        response, queries = self.get(response.data['next'], {})
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(set(response.data['results'][0]), {'id'})
+        self.assertEqual(len(queries), 1)
@@ -1,3 +1,5 @@
+from unittest.mock import patch
+
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.test import TestCase
@@ -10,6 +12,7 @@ from ..serializers import TagSerializer
 
 
 TAGS_URL = reverse('recipe:tag-list')
+TAGS_BULK_URL = reverse('recipe:tag-bulk')
 
 
 class PublicTagAPITests(TestCase):
@@ -45,7 +48,7 @@ class PrivateTagAPITests(TestCase):
         serializer = TagSerializer(tags, many=True)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data['results'], serializer.data)
 
     def test_tags_limited_to_authenticated_user(self):
         """Test that tags returned are for the authenticated user"""
@@ -58,8 +61,11 @@ class PrivateTagAPITests(TestCase):
         response = self.client.get(TAGS_URL)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['name'], main_user_tag.name)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(
+                response.data['results'][0]['name'],
+                main_user_tag.name
+        )
 
     def test_create_tag_successful(self):
         """Test creating a new tag"""
@@ -96,5 +102,128 @@ class PrivateTagAPITests(TestCase):
         serializer1 = TagSerializer(tag1)
         serializer2 = TagSerializer(tag2)
 
-        self.assertIn(serializer1.data, response.data)
-        self.assertNotIn(serializer2.data, response.data)
+        self.assertIn(serializer1.data, response.data['results'])
+        self.assertNotIn(serializer2.data, response.data['results'])
+
+    def test_retrieve_tags_assigned_unique(self):
+        """Test filtering tags by assigned returns unique items"""
+        tag = Tag.objects.create(user=self.user, name='Breakfast')
+        Tag.objects.create(user=self.user, name='Lunch')
+        for title in ('Pancakes', 'Porridge'):
+            recipe = Recipe.objects.create(
+                    title=title,
+                    time_minutes=5,
+                    price=3.00,
+                    user=self.user
+            )
+            recipe.tags.add(tag)
+
+        response = self.client.get(TAGS_URL, {'assigned_only': 1})
+
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_retrieve_tags_with_counts(self):
+        """Test tags are annotated with the number of recipes using them"""
+        tag1 = Tag.objects.create(user=self.user, name='Breakfast')
+        tag2 = Tag.objects.create(user=self.user, name='Lunch')
+        for title in ('Pancakes', 'Porridge'):
+            recipe = Recipe.objects.create(
+                    title=title,
+                    time_minutes=5,
+                    price=3.00,
+                    user=self.user
+            )
+            recipe.tags.add(tag1)
+
+        response = self.client.get(TAGS_URL, {'with_counts': 1})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'], [
+            {'id': tag2.id, 'name': tag2.name, 'recipe_count': 0},
+            {'id': tag1.id, 'name': tag1.name, 'recipe_count': 2},
+        ])
+
+        response = self.client.get(
+                TAGS_URL,
+                {'with_counts': 1, 'assigned_only': 1}
+        )
+
+        self.assertEqual(response.data['results'], [
+            {'id': tag1.id, 'name': tag1.name, 'recipe_count': 2},
+        ])
+
+    def test_create_tag_normalizes_name(self):
+        """Test tag names are stripped and their whitespace collapsed"""
+        response = self.client.post(TAGS_URL, {'name': '  Comfort   Food '})
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['name'], 'Comfort Food')
+
+    def test_create_duplicate_tag(self):
+        """Test a user cannot create two tags with the same name"""
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        response = self.client.post(TAGS_URL, {'name': 'Vegan'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+
+    def test_bulk_get_or_create_tags(self):
+        """Test existing tags are reused and missing ones created"""
+        existing = Tag.objects.create(user=self.user, name='Vegan')
+        another_user = get_user_model().objects.create_user(
+                'another_tester@example.com',
+                'TestPassword'
+        )
+        Tag.objects.create(user=another_user, name='Dessert')
+        payload = {'names': ['Dessert', ' Vegan', 'Dessert ', 'Quick  lunch']}
+
+        response = self.client.post(TAGS_BULK_URL, payload, format='json')
+
+        tags = Tag.objects.filter(user=self.user)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+                [tag['name'] for tag in response.data],
+                ['Dessert', 'Vegan', 'Quick lunch']
+        )
+        self.assertEqual(response.data[1]['id'], existing.id)
+        self.assertEqual(tags.count(), 3)
+
+    def test_tag_names_ignore_case(self):
+        """Test names differing only by case are the same tag"""
+        existing = Tag.objects.create(user=self.user, name='Vegan')
+
+        response = self.client.post(TAGS_URL, {'name': 'vegan'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        payload = {'names': ['VEGAN', 'Quick lunch', 'quick LUNCH']}
+        response = self.client.post(TAGS_BULK_URL, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+                [(tag['id'], tag['name']) for tag in response.data],
+                [
+                    (existing.id, 'Vegan'),
+                    (response.data[1]['id'], 'Quick lunch'),
+                ]
+        )
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+
+    def test_bulk_get_or_create_tags_invalid(self):
+        """Test an empty list of names is rejected"""
+        response = self.client.post(
+                TAGS_BULK_URL,
+                {'names': []},
+                format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_unmatched_names_rejected(self):
+        """Test names the database matches to no tag are a bad request"""
+        payload = {'names': ['Vegan']}
+        with patch('django.db.models.QuerySet.bulk_create'):
+            response = self.client.post(TAGS_BULK_URL, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('names', response.data)
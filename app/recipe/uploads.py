@@ -0,0 +1,61 @@
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.parsers import MultiPartParser
+
+
+# Room left for the multipart boundaries and headers around the file
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = _('Uploaded file is too large.')
+    default_code = 'upload_too_large'
+
+    def __init__(self, max_size):
+        super().__init__(
+                _('Ensure the uploaded file is at most {max_size} bytes.')
+                .format(max_size=max_size)
+        )
+
+
+class LimitedTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """
+    Spools uploaded files to disk chunk by chunk, whatever their size, and
+    aborts the upload as soon as a file goes past `max_size` bytes.
+    """
+
+    def __init__(self, max_size, request=None):
+        super().__init__(request)
+        self.max_size = max_size
+
+    def handle_raw_input(self, input_data, META, content_length, boundary,
+                         encoding=None):
+        # Reject uploads announcing a larger body before reading any of it
+        if content_length > self.max_size + MULTIPART_OVERHEAD:
+            raise UploadTooLarge(self.max_size)
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > self.max_size:
+            self.file.close()
+            raise UploadTooLarge(self.max_size)
+
+        return super().receive_data_chunk(raw_data, start)
+
+
+class ImageUploadParser(MultiPartParser):
+    """Multipart parser limiting uploads to `RECIPE_IMAGE_MAX_UPLOAD_SIZE`"""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = parser_context['request']
+        request.upload_handlers = [
+            LimitedTemporaryFileUploadHandler(
+                    settings.RECIPE_IMAGE_MAX_UPLOAD_SIZE,
+                    request
+            )
+        ]
+
+        return super().parse(stream, media_type, parser_context)
@@ -1,78 +1,333 @@
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, OuterRef, Prefetch, Q
+from django.db.models.functions import Upper
+from django.http import StreamingHttpResponse
+from django.utils.translation import gettext as _
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework import viewsets, mixins, status
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 
-from core.models import Tag, Ingredient, Recipe
+from core.authentication import CachedTokenAuthentication
+from core.instrumentation import SerializationTimingMixin
+from core.models import Tag, Ingredient, Recipe, RecipeImageRendition
+from core.search import search_recipes
+from core.versions import bump_versions
 
+from .autocomplete import autocomplete
+from .conditional import ConditionalGetMixin
+from .export import EXPORT_FORMATS, export_records
+from .fieldsets import SparseFieldsetMixin
+from .pagination import RecipeAttrCursorPagination, RecipeCursorPagination
+from .renditions import schedule_renditions
 from .serializers import (
-    TagSerializer, IngredientSerializer, RecipeSerializer, RecipeDetailSerializer,
-    RecipeImageSerializer,
+    TagSerializer, IngredientSerializer, RecipeSerializer,
+    RecipeDetailSerializer, RecipeImageSerializer, RecipeFilterSerializer,
+    TagCountSerializer, IngredientCountSerializer, RecipeAttrNamesSerializer,
+    AutocompleteSerializer, RecipeRowSerializer, RecipeExpandSerializer,
+    RecipeExportSerializer, database_name_keys, filter_names,
 )
+from .uploads import ImageUploadParser
 
 
-class BaseRecipeAttrViewSet(mixins.ListModelMixin,
+class BaseRecipeAttrViewSet(SerializationTimingMixin,
+                            ConditionalGetMixin,
+                            SparseFieldsetMixin,
+                            mixins.ListModelMixin,
                             mixins.CreateModelMixin,
                             viewsets.GenericViewSet):
     """Base viewset for user owned recipe attributes"""
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
+    pagination_class = RecipeAttrCursorPagination
+
+    # Name of the Recipe many to many field pointing to this model
+    recipe_relation = None
 
     def get_queryset(self):
         """Return objects for the current authenticated user only"""
         assigned_only = bool(self.request.query_params.get('assigned_only'))
-        queryset = self.queryset
-        if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
+        with_counts = bool(self.request.query_params.get('with_counts'))
+        queryset = self.queryset.filter(user=self.request.user)
+        if with_counts:
+            # One grouped query counting the user's recipes using each object
+            queryset = queryset.annotate(recipe_count=Count(
+                    'recipe',
+                    filter=Q(recipe__user=self.request.user)
+            ))
+            if assigned_only:
+                queryset = queryset.filter(recipe_count__gt=0)
+        elif assigned_only:
+            queryset = queryset.annotate(
+                    assigned=Exists(self._user_recipe_links())
+            ).filter(assigned=True)
+        columns = self.sparse_columns(queryset, required=['name'])
+        if columns is not None:
+            queryset = queryset.only(*columns)
+
+        return queryset.order_by('-name', 'id')
+
+    def _user_recipe_links(self):
+        """
+        Return the through rows linking the outer object to the user's
+        recipes
+        """
+        field = Recipe._meta.get_field(self.recipe_relation)
 
-        return queryset.filter(user=self.request.user).order_by('-name')
+        return field.remote_field.through.objects.filter(**{
+            field.m2m_reverse_field_name(): OuterRef('pk'),
+            f'{field.m2m_field_name()}__user': self.request.user,
+        })
+
+    def get_serializer_class(self):
+        """Return the serializer including usage counts when requested"""
+        with_counts = self.request.query_params.get('with_counts')
+        if self.action == 'list' and with_counts:
+            return self.count_serializer_class
+
+        return self.serializer_class
 
     def perform_create(self, serializer):
-        """Create a new object"""
-        serializer.save(user=self.request.user)
+        """Create a new object, rejecting names the user already has"""
+        try:
+            with transaction.atomic():
+                serializer.save(user=self.request.user)
+        except IntegrityError:
+            model_name = self.queryset.model._meta.verbose_name.capitalize()
+            raise ValidationError({
+                'name': [_('%(model_name)s with this name already exists.') % {
+                    'model_name': model_name,
+                }]
+            })
+
+    @action(methods=['POST'], detail=False, url_path='bulk')
+    def bulk(self, request):
+        """
+        Return the objects of a list of names in their input order,
+        creating the missing ones. Names already taken, in any case and
+        even by a concurrent request, are ignored by the insert and then
+        fetched.
+        """
+        serializer = RecipeAttrNamesSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        names = serializer.validated_data['names']
+
+        model = self.queryset.model
+        with transaction.atomic():
+            model.objects.bulk_create(
+                    [model(user=request.user, name=name) for name in names],
+                    ignore_conflicts=True
+            )
+            bump_versions(request.user.pk, self.recipe_relation)
+            # Matched back to names the way the database compared them
+            keys = database_name_keys(names)
+            queryset = filter_names(
+                    self.queryset.filter(user=request.user),
+                    names
+            ).annotate(name_key=Upper('name'))
+            objects = {obj.name_key: obj for obj in queryset}
+            unmatched = [name for name in names if keys[name] not in objects]
+            if unmatched:
+                raise ValidationError({'names': [
+                    _('No object could be created or found for %(name)s.') % {
+                        'name': name,
+                    }
+                    for name in unmatched
+                ]})
+        serializer = self.get_serializer(
+                [objects[keys[name]] for name in names],
+                many=True
+        )
+
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @action(methods=['GET'], detail=False)
+    def autocomplete(self, request):
+        """
+        Return the top `limit` objects whose name starts with `q`, or
+        resembles it with `fuzzy=true`, without paginating them
+        """
+        serializer = AutocompleteSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        matches = autocomplete(
+                self.queryset.filter(user=request.user),
+                request.user.pk,
+                self.recipe_relation,
+                serializer.validated_data['q'],
+                serializer.validated_data['limit'],
+                fuzzy=serializer.validated_data['fuzzy']
+        )
+
+        return Response([{'id': pk, 'name': name} for pk, name in matches])
 
 
 class TagViewSet(BaseRecipeAttrViewSet):
     """Manage tags in the database"""
     serializer_class = TagSerializer
+    count_serializer_class = TagCountSerializer
     queryset = Tag.objects.all()
+    recipe_relation = 'tags'
+    etag_versions = ('tags', 'recipes')
 
 
 class IngredientsViewSet(BaseRecipeAttrViewSet):
     """Manage ingredients in the database"""
     serializer_class = IngredientSerializer
+    count_serializer_class = IngredientCountSerializer
     queryset = Ingredient.objects.all()
+    recipe_relation = 'ingredients'
+    etag_versions = ('ingredients', 'recipes')
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(SerializationTimingMixin,
+                    ConditionalGetMixin,
+                    SparseFieldsetMixin,
+                    viewsets.ModelViewSet):
     """Manage recipes in the database"""
     serializer_class = RecipeSerializer
     queryset = Recipe.objects.all()
+    etag_versions = ('recipes', 'tags', 'ingredients')
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication]
-
-    def _params_to_ints(self, qs):
-        """Convert a list of string IDs to a list of integers"""
-        return [int(str_id) for str_id in qs.split(',')]
+    authentication_classes = [CachedTokenAuthentication]
+    pagination_class = RecipeCursorPagination
 
     def get_queryset(self):
         """Retrieve the recipes of the authenticated user"""
-        tags = self.request.query_params.get('tags')
-        ingredients = self.request.query_params.get('ingredients')
-        queryset = self.queryset
-        if tags:
-            tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
-        if ingredients:
-            ingredient_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
-
-        return queryset.filter(user=self.request.user)
+        queryset = self._filter_recipes(self.queryset)
+        queryset = self._shape_queryset(queryset)
+        ordering = ('-id',)
+        if 'search_rank' in queryset.query.annotations:
+            ordering = ('-search_rank', '-id')
+
+        return queryset.filter(user=self.request.user).order_by(*ordering)
+
+    def _filter_recipes(self, queryset):
+        """
+        Filter recipes by the `tags`, `ingredients` and `search` query
+        parameters, searches rank their results by relevance
+        """
+        filters = RecipeFilterSerializer(data=self.request.query_params)
+        filters.is_valid(raise_exception=True)
+        if filters.validated_data.get('search'):
+            queryset = search_recipes(
+                    queryset,
+                    filters.validated_data['search']
+            )
+
+        match = filters.validated_data['match']
+        match_all = match == RecipeFilterSerializer.MATCH_ALL
+        for relation in ('tags', 'ingredients'):
+            related_ids = filters.validated_data.get(relation)
+            if related_ids:
+                recipe_ids = self._recipe_ids_related_to(
+                        relation, related_ids, match_all
+                )
+                queryset = queryset.filter(id__in=recipe_ids)
+
+        return queryset
+
+    def _recipe_ids_related_to(self, relation, related_ids, match_all):
+        """
+        Return a subquery of the ids of recipes using any (or all) of the
+        related objects. It only reads the M2M through table, so it is
+        planned as a semi-join and never duplicates recipe rows.
+        """
+        field = Recipe._meta.get_field(relation)
+        recipe_ids = field.remote_field.through.objects.filter(**{
+            f'{field.m2m_reverse_field_name()}__in': related_ids
+        }).values(field.m2m_field_name())
+        if match_all:
+            recipe_ids = recipe_ids.annotate(
+                    matches=Count('id')
+            ).filter(matches=len(related_ids)).values(field.m2m_field_name())
+
+        return recipe_ids
+
+    def _shape_queryset(self, queryset):
+        """Load only what the serializer of the current action needs"""
+        if self.uses_row_serializer():
+            columns = RecipeRowSerializer.columns(self.get_sparse_fields())
+            if 'search_rank' in queryset.query.annotations:
+                # Read by the cursor pagination
+                columns.append('search_rank')
+            return queryset.values(*columns)
+        elif self.action in ('list', 'retrieve'):
+            columns = self.sparse_columns(queryset)
+            if columns is None:
+                queryset = queryset.defer('image')
+            else:
+                queryset = queryset.only(*columns)
+            # RecipeSerializer only renders primary keys of the relations
+            # which are not expanded
+            expand = self.get_expanded_relations()
+            related_columns = {
+                name: ['id', 'name']
+                if self.action == 'retrieve' or name in expand else ['id']
+                for name in ('tags', 'ingredients')
+            }
+            prefetches = {
+                'tags': Prefetch(
+                        'tags',
+                        queryset=Tag.objects.only(
+                                *related_columns['tags']
+                        ).order_by('id')
+                ),
+                'ingredients': Prefetch(
+                        'ingredients',
+                        queryset=Ingredient.objects.only(
+                                *related_columns['ingredients']
+                        ).order_by('id')
+                ),
+                'renditions': Prefetch(
+                        'renditions',
+                        queryset=RecipeImageRendition.objects.order_by('id')
+                ),
+            }
+            return queryset.prefetch_related(*[
+                prefetch for name, prefetch in prefetches.items()
+                if self.wants_field(name)
+            ])
+        elif self.action == 'upload_image':
+            return queryset.only('id', 'user', 'image')
+
+        return queryset
+
+    def get_expanded_relations(self):
+        """
+        Return the relations listed by the `expand` query parameter of the
+        list action, rendered as nested objects instead of primary keys
+        """
+        if not hasattr(self, '_expanded_relations'):
+            self._expanded_relations = set()
+            if self.action == 'list' and 'expand' in self.request.query_params:
+                filters = RecipeExpandSerializer(
+                        data=self.request.query_params
+                )
+                filters.is_valid(raise_exception=True)
+                self._expanded_relations = filters.validated_data['expand']
+
+        return self._expanded_relations
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['expand'] = self.get_expanded_relations()
+
+        return context
+
+    def uses_row_serializer(self):
+        """
+        Return whether the action renders `values()` rows, see
+        RECIPE_API_FAST_LIST
+        """
+        return self.action == 'list' and settings.RECIPE_API_FAST_LIST
 
     def get_serializer_class(self):
         """Return appropriate serializer class"""
-        if self.action == 'retrieve':
+        if self.uses_row_serializer():
+            return RecipeRowSerializer
+        elif self.action == 'retrieve':
             return RecipeDetailSerializer
         elif self.action == 'upload_image':
             return RecipeImageSerializer
@@ -83,9 +338,70 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """Create a new recipe"""
         serializer.save(user=self.request.user)
 
-    @action(methods=['POST'], detail=True, url_path='upload-image')
+    @action(methods=['POST'], detail=False, url_path='bulk')
+    def bulk(self, request):
+        """
+        Create a list of recipes at once. Any invalid recipe rejects the
+        whole list unless `?allow_partial=true` is given.
+        """
+        allow_partial = request.query_params.get(
+                'allow_partial', ''
+        ).lower() in ('1', 'true')
+        serializer = self.get_serializer(
+                data=request.data,
+                many=True,
+                allow_empty=False
+        )
+        serializer.is_valid(raise_exception=True)
+        if not serializer.validated_data \
+                or (serializer.item_errors and not allow_partial):
+            return Response(
+                    {'created': [], 'errors': serializer.item_errors},
+                    status=status.HTTP_400_BAD_REQUEST
+            )
+
+        serializer.save(user=request.user)
+        return Response(
+                {'created': serializer.data, 'errors': serializer.item_errors},
+                status=status.HTTP_201_CREATED
+        )
+
+    @action(methods=['GET'], detail=False)
+    def export(self, request):
+        """
+        Stream every recipe matching the list filters as NDJSON, or as CSV
+        with `?type=csv`, oldest first. Recipes are read in chunks of
+        `RECIPE_EXPORT_CHUNK_SIZE` while the response is sent.
+        """
+        params = RecipeExportSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        export_format = params.validated_data['type']
+        lines, content_type, extension = EXPORT_FORMATS[export_format]
+
+        records = export_records(
+                self.get_queryset().order_by('id'),
+                settings.RECIPE_EXPORT_CHUNK_SIZE
+        )
+        response = StreamingHttpResponse(
+                lines(records),
+                content_type=content_type
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="recipes.{extension}"'
+        )
+
+        return response
+
+    @action(
+            methods=['POST'], detail=True, url_path='upload-image',
+            parser_classes=[ImageUploadParser]
+    )
     def upload_image(self, request, pk=None):
-        """Upload an image to a recipe"""
+        """
+        Upload an image to a recipe, its renditions are generated in the
+        background and listed in `renditions` once ready. The image is
+        spooled to disk and rejected past `RECIPE_IMAGE_MAX_UPLOAD_SIZE`.
+        """
         recipe = self.get_object()
         serializer = self.get_serializer(
                 recipe,
@@ -93,7 +409,8 @@ class RecipeViewSet(viewsets.ModelViewSet):
         )
 
         if serializer.is_valid():
-            serializer.save()
+            recipe = serializer.save()
+            schedule_renditions(recipe)
             return Response(serializer.data, status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)